@@ -1,10 +1,17 @@
 
 # 価格変動の過去データ /historical/BTC_USDT/daily_15m/BTC_USDT_daily_15m_2025-02-10.parquet
+# 月次に圧縮済みのデータ /historical/BTC_USDT/monthly_15m/BTC_USDT_monthly_15m_2025-02.parquet
 S3_FOLDER_HIST = "historical"
 
+# 教師データに使用するマーケット
+DATASET_MARKETS = ['ETH/JPY', 'BTC/JPY', 'BTC/USDT']
+
 # モデルデータ ml_models/staging/model.json
 S3_FOLDER_MODEL = "ml_models"
 
+# 特徴量の状態・キャッシュ features/indicator_state_btc_jpy_1440m.json
+S3_FOLDER_FEATURE = "features"
+
 # 取引データ trade/btc_usdt_2024-01-01_to_2025-02-20.json
 S3_FOLDER_TRADE = "trade"
 
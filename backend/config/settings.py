@@ -1,4 +1,5 @@
 import os
+import tempfile
 import config.environment
 import pandas as pd
 
@@ -10,6 +11,39 @@ class BaseSettings:
     AWS_REGION = os.getenv("AWS_REGION", "ap-northeast-1")
     S3_BUCKET = os.getenv("S3_BUCKET")
 
+    # 過去データ取得の並列数
+    DATA_FETCH_MAX_WORKERS = int(os.getenv("DATA_FETCH_MAX_WORKERS", "10"))
+    # 取引所ごとの同時リクエスト数の上限
+    EXCHANGE_MAX_CONCURRENCY = int(os.getenv("EXCHANGE_MAX_CONCURRENCY", "4"))
+
+    # S3 オブジェクトのローカルディスクキャッシュ (0 で無効)
+    S3_CACHE_DIR = os.getenv("S3_CACHE_DIR", os.path.join(tempfile.gettempdir(), "s3_cache"))
+    S3_CACHE_MAX_BYTES = int(os.getenv("S3_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+    # S3 クライアントのコネクションプール、一括取得/保存の並列数、リトライ回数 (adaptive)
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+    S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "32"))
+    S3_MAX_RETRIES = int(os.getenv("S3_MAX_RETRIES", "5"))
+    # Parquet の row group の行数 (列・期間を指定した読み込みで読み飛ばせる単位)
+    PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "8192"))
+    # create_features の結果を入力データのハッシュで S3 にキャッシュする
+    FEATURE_CACHE_ENABLED = os.getenv("FEATURE_CACHE_ENABLED", "True").lower() == "true"
+    # 特徴量キャッシュの保持日数 (保存時にこれより古いものを削除。0 で削除しない)
+    FEATURE_CACHE_TTL_DAYS = int(os.getenv("FEATURE_CACHE_TTL_DAYS", "7"))
+    # LogZScalerProcessor を逐次更新できるスケーラー (npz で保存) にする。チャンクの行数 (並列に統計量を計算)
+    SCALER_INCREMENTAL = os.getenv("SCALER_INCREMENTAL", "False").lower() == "true"
+    SCALER_CHUNK_SIZE = int(os.getenv("SCALER_CHUNK_SIZE", "100000"))
+    # 読み込み済みのスケーラー・モデルをプロセス内に保持する数 (0 で無効)
+    ARTIFACT_CACHE_MAX_ITEMS = int(os.getenv("ARTIFACT_CACHE_MAX_ITEMS", "16"))
+    # モデルの保存時の圧縮 ("zstd" で zstandard を使用。読み込み時は自動判定)
+    MODEL_COMPRESSION = os.getenv("MODEL_COMPRESSION", "").lower()
+    MODEL_COMPRESSION_LEVEL = int(os.getenv("MODEL_COMPRESSION_LEVEL", "3"))
+    # (ターゲット × モデル) の並列学習のプロセス数 (0 で CPU コア数)、1ジョブのスレッド数 (0 でコア数 / プロセス数)
+    TRAINING_MAX_WORKERS = int(os.getenv("TRAINING_MAX_WORKERS", "0"))
+    TRAINING_THREADS_PER_JOB = int(os.getenv("TRAINING_THREADS_PER_JOB", "0"))
+    # 昇格時にモデルを ONNX に変換して保存する / 推論に使うバックエンド ("native" or "onnx": onnxruntime のみで推論)
+    ONNX_EXPORT_ON_PROMOTE = os.getenv("ONNX_EXPORT_ON_PROMOTE", "False").lower() == "true"
+    INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "native").lower()
+
     BYBIT_API_KEY = os.getenv("BYBIT_API_KEY")
     BYBIT_API_SECRET = os.getenv("BYBIT_API_SECRET")
     BYBIT_BASE_URL = os.getenv("BYBIT_BASE_URL")
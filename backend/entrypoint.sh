@@ -15,6 +15,10 @@ elif [ "$TASK_MODE" == "auto_trade" ]; then
     echo "Running batch auto_trade..."
     export PYTHONPATH="/app"
     exec python tasks/auto_trade.py
+elif [ "$TASK_MODE" == "compact_historical" ]; then
+    echo "Running batch compact_historical..."
+    export PYTHONPATH="/app"
+    exec python tasks/compact_historical.py
 else
     echo "TASK_MODE not set. Defaulting to API mode."
     exec uvicorn main:app --host 0.0.0.0 --port 8000
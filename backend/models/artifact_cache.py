@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from config.settings import settings
+
+class ArtifactCache:
+    """
+    読み込み済み (デシリアライズ済み) のスケーラー・モデルをプロセス内で共有する LRU キャッシュ
+    キーは (stage, 対象, モデルの種類, バージョン or ETag)。バージョンのディレクトリは上書きされないため
+    バージョンが同じなら同じ内容で、従来のステージフォルダは ETag で変更を検知する
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, artifact):
+        if self.max_items <= 0 or artifact is None:
+            return artifact
+        with self.lock:
+            self.items[key] = artifact
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+        return artifact
+
+    def get_or_load(self, key, loader):
+        """ キャッシュに無ければ loader() で読み込んで保持する (None は保持しない) """
+        artifact = self.get(key)
+        if artifact is None:
+            artifact = self.put(key, loader())
+        return artifact
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+@lru_cache
+def get_artifact_cache() -> ArtifactCache:
+    """ArtifactCache のシングルトンインスタンスを取得"""
+    return ArtifactCache(settings.ARTIFACT_CACHE_MAX_ITEMS)
@@ -1,10 +1,13 @@
+import math
+import time
+import threading
 from datetime import datetime, timedelta, timezone
 import pandas as pd
 from utils.s3_helper import get_s3_helper
 from models.exchanges.binance_fetcher import BinanceFetcher
+from models.partition_index import PartitionIndex
 from dateutil.relativedelta import relativedelta
 from config.settings import settings
-from utils.date_helper import get_days_ago
 from config.config_manager import get_config_manager
 from config import constants
 
@@ -12,7 +15,7 @@ class CryptoTrainingDataset:
 
     def __init__(self):
         self.config_data = get_config_manager().get_config()
-        self.markets= ['ETH/JPY', 'BTC/JPY', 'BTC/USDT']
+        self.markets= list(constants.DATASET_MARKETS)
         self.interval_min = self.config_data.get("training_timeframe")  # 足の間隔
 
         self.created_at: datetime = datetime.now(timezone.utc)
@@ -23,31 +26,285 @@ class CryptoTrainingDataset:
         self.data: pd.DataFrame = pd.DataFrame()
         self.fetcher = BinanceFetcher()
         self.s3 = get_s3_helper()
+        self.max_workers = settings.DATA_FETCH_MAX_WORKERS
+        self.fetch_stats = {}
+        self._stats_lock = threading.Lock()
+        self.partition_indexes = {}
+        self._index_lock = threading.Lock()
 
     def get_data(self):
-        """ 教師データをロード or 収集 & 統合 """
-        self.data = None#self.load_processed()
+        """
+        教師データをロード or 収集 & 統合
+        処理済みデータ (markets, timeframe ごとのローリングスナップショット) を読み込み、
+        最終日時 (high-water mark) 以降の日だけを取得して末尾に追加する
+        """
+        # スナップショットは学習期間 (training_period_months) のローリングウィンドウで保持する
+        # (start_date をそれより前にした場合は、その日から保持する)
+        retention_start = min(self.end_date - relativedelta(months=self.config_data.get("training_period_months")), self.start_date)
+        snapshot = self.load_processed()
+        loaded_range = self._snapshot_range(snapshot)
 
-        if self.data is None or self.data.empty:
-            for symbol in self.markets:
-                collected_data = pd.DataFrame()
-                current_date = self.start_date
-                while current_date <= self.end_date:
-                    df_ohlcv = self.fetch_ohlcv( symbol, current_date )
-                    collected_data = pd.concat([collected_data, df_ohlcv], ignore_index=True)
-                    current_date += timedelta(days=1)
-                self.aggregate(symbol, collected_data)
-            self.save_processed()
+        if snapshot is None or snapshot.empty or snapshot["timestamp"].min() > self._day_start(retention_start):
+            # スナップショットが無い or 必要な期間を含まない場合は全期間を再構築
+            snapshot = self._collect(retention_start, self.end_date)
+            loaded_range = None
+        else:
+            high_water_mark = snapshot["timestamp"].max()
+            tail_start = datetime.combine(high_water_mark.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+            if tail_start <= self.end_date:
+                tail = self._collect(tail_start, self.end_date)
+                snapshot = pd.concat([snapshot, tail], ignore_index=True)
+                snapshot = snapshot.drop_duplicates(subset="timestamp", keep="last").sort_values("timestamp", ignore_index=True)
+
+        if snapshot is None or snapshot.empty:
+            self.data = pd.DataFrame()
+            return self.data
+
+        # 保持期間外の先頭を削除し、確定済みの日 (当日より前) のみ保存
+        today = self._day_start(self.created_at)
+        snapshot = snapshot[snapshot["timestamp"] >= self._day_start(retention_start)].reset_index(drop=True)
+        completed = snapshot[snapshot["timestamp"] < today]
+        if self._snapshot_range(completed) != loaded_range:
+            self.save_processed(completed)
+
+        period_end = self._day_start(self.end_date) + pd.Timedelta(days=1)
+        mask = (snapshot["timestamp"] >= self._day_start(self.start_date)) & (snapshot["timestamp"] < period_end)
+        self.data = snapshot[mask].reset_index(drop=True)
+
+        return self.data
+
+    def get_inference_data(self, lookback_bars):
+        """
+        推論モード: end_date までの直近 lookback_bars 本を含む日だけを読み込む
+        (FeatureDatasetModel.required_lookback の本数を指定する)
+        """
+        days = math.ceil(lookback_bars * self.interval_min / (24 * 60))
+        self.start_date = self.end_date - timedelta(days=days)
+        return self.load_columns()
 
+    def load_columns(self, columns=None):
+        """
+        start_date 〜 end_date の指定列のみを取得 (参照用。スナップショットは更新しない)
+        処理済みデータからは必要な列・期間の row group だけを読み、未保存の末尾 (当日など) は取得して追加する
+        :param columns: 取得する列 (省略時は全列)
+        """
+        if columns is not None:
+            columns = ["timestamp", *[c for c in columns if c != "timestamp"]]
+        period_end = self._day_start(self.end_date) + pd.Timedelta(days=1)
+        filters = self.s3.timestamp_filters(self._day_start(self.start_date), period_end)
+        snapshot = self.load_processed(columns=columns, filters=filters)
+        if snapshot is None or snapshot.empty:
+            data = self.get_data()
+            return data[columns] if columns is not None and not data.empty else data
+
+        high_water_mark = snapshot["timestamp"].max()
+        tail_start = datetime.combine(high_water_mark.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        if tail_start <= self.end_date:
+            tail = self._collect(tail_start, self.end_date)
+            if tail is not None and not tail.empty:
+                snapshot = pd.concat([snapshot, tail if columns is None else tail[columns]], ignore_index=True)
+        self.data = snapshot[snapshot["timestamp"] < period_end].reset_index(drop=True)
         return self.data
 
-    def fetch_ohlcv(self, symbol, date):
-        file_key = self.historical_data_path(symbol, self.interval_min, date)
-        df = self.s3.load_parquet_from_s3(file_key)
-        if df.empty:
-            df = self.fetcher.fetch_daily_ohlcv(symbol, self.interval_min, get_days_ago(date))
-            self.s3.save_parquet_to_s3(df, file_key)
-        return df
+    def _collect(self, start_date, end_date):
+        """ 指定期間の日次パーティションを取得し、マーケットを統合した DataFrame を返す """
+        self.data = None
+        partitions = self.fetch_partitions(self.markets, start_date, end_date)
+        for symbol in self.markets:
+            self.aggregate(symbol, partitions[symbol])
+        return self.data
+
+    @staticmethod
+    def _snapshot_range(snapshot):
+        """ スナップショットの (先頭日時, 最終日時, 行数)。変更の有無の判定に使用 """
+        if snapshot is None or snapshot.empty:
+            return None
+        return snapshot["timestamp"].min(), snapshot["timestamp"].max(), len(snapshot)
+
+    @staticmethod
+    def _day_start(date: datetime) -> pd.Timestamp:
+        """ 日付の 00:00 (UTC, naive) を返す (OHLCV の timestamp 列と比較するため) """
+        date = pd.Timestamp(date)
+        if date.tzinfo is not None:
+            date = date.tz_convert("UTC").tz_localize(None)
+        return date.normalize()
+
+    def fetch_partitions(self, markets, start_date, end_date):
+        """
+        全マーケットのパーティションを S3Helper.load_many_parquet で並列に取得し、
+        マーケットごとに最後に一度だけ結合する
+        圧縮済みの月は月次ファイルを1回で読み (期間の一部だけの月は必要な行だけを範囲 GET で読む)、それ以外 (当月など) は日次ファイルを読む
+        日次ファイルはパーティションインデックスにある日だけを読み、無い日は Binance から取得する
+        :return: { symbol: DataFrame }
+        """
+        dates = []
+        current_date = start_date
+        while current_date <= end_date:
+            dates.append(current_date)
+            current_date += timedelta(days=1)
+
+        tasks = []
+        missing = {}
+        for symbol in markets:
+            compacted = self.load_monthly_manifest(symbol).get("months", {})
+            index = self.get_partition_index(symbol)
+            for month, month_dates in self._group_by_month(dates):
+                if month in compacted and month < self.created_at.strftime("%Y-%m"):
+                    tasks.append((symbol, month_dates[0], month_dates))
+                    continue
+                for date in month_dates:
+                    if not index.contains(date):
+                        missing.setdefault(symbol, []).append((len(tasks), date))
+                    tasks.append((symbol, date, None))
+
+        self.fetch_stats = {"partitions": len(tasks), "hits": 0, "misses": 0, "hit_sec": 0.0, "miss_sec": 0.0}
+        started = time.perf_counter()
+        missing_indexes = {i for symbol_missing in missing.values() for i, _ in symbol_missing}
+        frames = [pd.DataFrame()] * len(tasks)
+        reads = {}
+        for i in range(len(tasks)):
+            if i not in missing_indexes:
+                reads.setdefault(self._task_filters(*tasks[i]), []).append(i)
+        for filters, indexes in reads.items():
+            keys = [self._task_path(*tasks[i]) for i in indexes]
+            loaded = self.s3.load_many_parquet(keys, immutable=True, max_workers=self.max_workers, filters=list(filters) if filters else None)
+            for i, df in zip(indexes, loaded):
+                frames[i] = df
+                if not df.empty:
+                    self._record_fetch(True, 0.0)
+        self.fetch_stats["hit_sec"] = time.perf_counter() - started
+
+        # インデックスにあるが読めなかった日 (削除済みなど) も取得対象に加える
+        for i, ((symbol, date, month_dates), df) in enumerate(zip(tasks, frames)):
+            if month_dates is None and df.empty and i not in missing_indexes:
+                missing.setdefault(symbol, []).append((i, date))
+        for symbol_missing in missing.values():
+            symbol_missing.sort(key=lambda item: item[0])
+
+        # インデックスに無い日は、連続する日ごとにまとめて Binance から取得
+        runs = [run for symbol_missing in missing.values() for run in self._contiguous_runs(symbol_missing)]
+        backfilled = self._backfill([(tasks[run[0][0]][0], [date for _, date in run]) for run in runs])
+        for run, partitions in zip(runs, backfilled):
+            for i, date in run:
+                frames[i] = partitions.get(date.strftime("%Y-%m-%d"), pd.DataFrame())
+        self.save_partition_indexes()
+        self.fetch_stats["fetch_sec"] = time.perf_counter() - started
+
+        collected = {symbol: [] for symbol in markets}
+        for (symbol, _, _), df in zip(tasks, frames):
+            if df is not None and not df.empty:
+                collected[symbol].append(df)
+
+        result = {}
+        for symbol, dfs in collected.items():
+            result[symbol] = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+
+        stats = self.fetch_stats
+        print(
+            f"Fetched {stats['partitions']} partitions in {stats['fetch_sec']:.2f}s "
+            f"(hit: {stats['hits']} / {stats['hit_sec']:.2f}s, miss: {stats['misses']} / {stats['miss_sec']:.2f}s, "
+            f"workers: {self.max_workers})"
+        )
+        return result
+
+    @staticmethod
+    def _group_by_month(dates):
+        """ 日付のリストを [(YYYY-MM, [日付, ...]), ...] に分割 """
+        groups = {}
+        for date in dates:
+            groups.setdefault(date.strftime("%Y-%m"), []).append(date)
+        return list(groups.items())
+
+    @staticmethod
+    def _contiguous_runs(indexed_dates):
+        """ [(index, 日付), ...] を連続する日付のまとまりに分割 """
+        runs = []
+        for item in indexed_dates:
+            if runs and item[1] - runs[-1][-1][1] == timedelta(days=1):
+                runs[-1].append(item)
+            else:
+                runs.append([item])
+        return runs
+
+    def _task_path(self, symbol, date, month_dates=None):
+        if month_dates is None:
+            return self.historical_data_path(symbol, self.interval_min, date)
+        return self.monthly_data_path(symbol, self.interval_min, month_dates[0])
+
+    def _task_filters(self, symbol, date, month_dates=None):
+        """
+        月次ファイルのうち期間の一部だけを読む月は、その日の行だけを読む行フィルタ (tuple)
+        日次ファイルと月全体を読む月は None (ファイル全体を読み、ローカルキャッシュを使う)
+        """
+        if month_dates is None:
+            return None
+        period_start = self._day_start(month_dates[0])
+        period_end = self._day_start(month_dates[-1]) + pd.Timedelta(days=1)
+        if period_start.day == 1 and period_end.day == 1:
+            return None
+        return tuple(self.s3.timestamp_filters(period_start, period_end))
+
+    def load_monthly_manifest(self, symbol):
+        """ 月次圧縮済みファイルのマニフェストをロード (無い場合は空) """
+        return self.s3.load_json_from_s3(self.monthly_manifest_path(symbol, self.interval_min)) or {}
+
+    def _backfill(self, runs):
+        """
+        連続する日付の範囲 [(symbol, [日付, ...]), ...] を BinanceFetcher.fetch_range_many で並行して取得し、
+        日次パーティションとして保存
+        :return: 入力順の { "YYYY-MM-DD": DataFrame } のリスト
+        """
+        if not runs:
+            return []
+        started = time.perf_counter()
+        now = pd.Timestamp(datetime.now(timezone.utc)).tz_localize(None)
+        requests = [
+            (symbol, self.interval_min, self._day_start(dates[0]), min(self._day_start(dates[-1]) + pd.Timedelta(days=1), now))
+            for symbol, dates in runs
+        ]
+        frames = self.fetcher.fetch_range_many(requests)
+
+        # 日次パーティションは一度保存したら更新しない (不変) ため、確定していない当日分は保存しない
+        today = now.strftime("%Y-%m-%d")
+        results = [self.fetcher.split_daily(df) for df in frames]
+        saves = [
+            (partition, self.historical_data_path(symbol, self.interval_min, day))
+            for (symbol, _), partitions in zip(runs, results)
+            for day, partition in partitions.items()
+            if day < today
+        ]
+        self.s3.save_many(saves, max_workers=self.max_workers)
+        for (symbol, _), partitions in zip(runs, results):
+            self.get_partition_index(symbol).add(day for day in partitions if day < today)
+
+        missed = sum(len(dates) for _, dates in runs)
+        for _ in range(missed):
+            self._record_fetch(False, (time.perf_counter() - started) / missed)
+        return results
+
+    def get_partition_index(self, symbol):
+        """ マーケットごとのパーティションインデックス (初回のみ S3 からロード) """
+        with self._index_lock:
+            if symbol not in self.partition_indexes:
+                self.partition_indexes[symbol] = PartitionIndex(symbol, self.interval_min).load()
+            return self.partition_indexes[symbol]
+
+    def save_partition_indexes(self):
+        """ 追記のあったパーティションインデックスを S3 に保存 """
+        for index in self.partition_indexes.values():
+            index.save()
+
+    def _record_fetch(self, hit: bool, elapsed: float):
+        """ パーティション取得のヒット/ミス件数と所要時間を集計 """
+        with self._stats_lock:
+            if not self.fetch_stats:
+                return
+            if hit:
+                self.fetch_stats["hits"] += 1
+                self.fetch_stats["hit_sec"] += elapsed
+            else:
+                self.fetch_stats["misses"] += 1
+                self.fetch_stats["miss_sec"] += elapsed
 
     def aggregate(self, symbol: str, additional_data: pd.DataFrame):
         """ 既存のデータに追加のデータを統合 """
@@ -61,18 +318,22 @@ class CryptoTrainingDataset:
             #merged_df = pd.merge(self.data, additional_data, on="timestamp", how="outer", indicator=True)
         return self.data
 
-    def load_processed(self):
-        """ S3 から教師データをロード """
-        s3_path = f"{constants.S3_FOLDER_HIST}/processed/{self.start_date}_{self.end_date}_{self.interval_min}.parquet"
-        self.data = self.s3.load_parquet_from_s3(s3_path)
-        #self.data = pd.DataFrame()
-        return self.data
+    def load_processed(self, columns=None, filters=None):
+        """ S3 から処理済みの教師データ (スナップショット) をロード (列・期間の指定が可能) """
+        return self.s3.load_parquet_from_s3(self.processed_data_path(), columns=columns, filters=filters)
+
+    def save_processed(self, snapshot: pd.DataFrame):
+        """ 処理済みの教師データ (スナップショット) を S3 に保存 """
+        if snapshot is not None and not snapshot.empty:
+            self.s3.save_parquet_to_s3(snapshot, self.processed_data_path())
 
-    def save_processed(self):
-        """ 教師データを S3 に保存 """
-        if self.data is not None and not self.data.empty:
-            s3_path = f"{constants.S3_FOLDER_HIST}/processed/{self.start_date}_{self.end_date}_{self.interval_min}.parquet"
-            self.s3.save_parquet_to_s3(self.data, s3_path)
+    def processed_data_path(self):
+        """
+        処理済みデータの S3 ファイルパスを生成 (期間を含めず markets, timeframe ごとに1ファイル)
+        s3_folder/processed/ETH_JPY-BTC_JPY-BTC_USDT_1440m.parquet
+        """
+        markets = "-".join(symbol.replace("/", "_") for symbol in self.markets)
+        return f"{constants.S3_FOLDER_HIST}/processed/{markets}_{self.interval_min}m.parquet"
 
     @staticmethod
     def historical_data_path(symbol: str, timeframe: str, date: str):
@@ -90,3 +351,24 @@ class CryptoTrainingDataset:
         timeframe = f"daily_{timeframe}m"
         return f"{constants.S3_FOLDER_HIST}/{symbol}/{timeframe}/{symbol}_{timeframe}_{date}.parquet"
 
+    @staticmethod
+    def monthly_data_path(symbol: str, timeframe: str, month):
+        """
+        月次に圧縮した過去データの S3 ファイルパスを生成
+        s3_folder/BTC_USDT/monthly_15m/BTC_USDT_monthly_15m_2025-02.parquet
+        :param month: "YYYY-MM" の形式の年月 (datetime の場合はその月)
+        """
+        if isinstance(month, datetime):
+            month = month.strftime("%Y-%m")
+        symbol = symbol.replace("/", "_")
+        timeframe = f"monthly_{timeframe}m"
+        return f"{constants.S3_FOLDER_HIST}/{symbol}/{timeframe}/{symbol}_{timeframe}_{month}.parquet"
+
+    @staticmethod
+    def monthly_manifest_path(symbol: str, timeframe: str):
+        """
+        月次圧縮済みファイルのマニフェストの S3 ファイルパスを生成
+        s3_folder/BTC_USDT/monthly_15m/manifest.json
+        """
+        symbol = symbol.replace("/", "_")
+        return f"{constants.S3_FOLDER_HIST}/{symbol}/monthly_{timeframe}m/manifest.json"
@@ -1,4 +1,3 @@
-import yfinance as yf
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 import pandas as pd
@@ -23,6 +22,7 @@ class EconomicData():
         period = (pd.Timestamp(datetime.now().date()) - start_date).days
         df_list = []
 
+        import yfinance as yf  # 起動時間を抑えるため、取得時に import
         for key, ticker in indicators.items():
             stock = yf.Ticker(ticker)
             hist = stock.history(period=f"{period}d")
@@ -1,29 +1,57 @@
+import copy
+import importlib
 import numpy as np
 import pandas as pd
-from models.ml.random_forest_model import RandomForestModel
-from models.ml.xgboost_model import XGBoostModel
-from models.ml.lightgbm_model import LightGBMModel
-from models.ml.lstm_model import LSTMModel
-from models.ml.dense_model import DenseModel
-from models.hyperparameter_optimizer import HyperparameterOptimizer
-from models.ml.lgbm_classifier_model import LgbmClassifierModel
+from models.model_registry import ModelRegistry
+from models.artifact_cache import get_artifact_cache
+from utils.s3_helper import get_s3_helper
+
+# モデル名 → "モジュール:クラス"。TensorFlow などは使うモデルを作るときに初めて import する
+MODEL_CLASSES = {
+    "lgbm_classifier": "models.ml.lgbm_classifier_model:LgbmClassifierModel",
+    "dense": "models.ml.dense_model:DenseModel",
+    "random_forest": "models.ml.random_forest_model:RandomForestModel",
+    "xgboost": "models.ml.xgboost_model:XGBoostModel",
+    "lightgbm": "models.ml.lightgbm_model:LightGBMModel",
+    "lstm": "models.ml.lstm_model:LSTMModel",
+}
+
+
+def get_model_class(name):
+    module_name, class_name = MODEL_CLASSES[name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_model(name, **kwargs):
+    """ モデル名からインスタンスを作成 """
+    return get_model_class(name)(**kwargs)
+
 
 class EnsembleModel:
-    def __init__(self, stage="staging", sequence_length=3 ):
-        """ 各モデルを初期化（S3 からロードできる場合はロード） """
+    def __init__(self, stage="staging", sequence_length=3, version=None):
+        """
+        各モデルを初期化（S3 からロードできる場合はロード）
+        :param version: モデルのバージョン (省略時は stage のポインタを参照。学習時は新しいバージョンを発行)
+        """
         self.stage = stage
-        self.models = {
-            "lgbm_classifier": LgbmClassifierModel(),
-            "dense": DenseModel(),
-#            "random_forest": RandomForestModel(),
-#            "xgboost": XGBoostModel(),
-#            "lightgbm": LightGBMModel(),
-#            "lstm": LSTMModel(sequence_length=sequence_length),
+        self.version = version
+        self.registry = ModelRegistry()
+        self.model_path = None
+        # モデル名 → コンストラクタの引数 (並列学習のワーカーでも同じ引数で作成する)
+        self.model_kwargs = {
+            "lgbm_classifier": {},
+            "dense": {},
+#            "random_forest": {},
+#            "xgboost": {},
+#            "lightgbm": {},
+#            "lstm": {"sequence_length": sequence_length},
         }
+        self.models = {name: create_model(name, **kwargs) for name, kwargs in self.model_kwargs.items()}
 
 
     def train(self, X_train, y_train, y_name=None):
-        """各モデルを学習"""
+        """各モデルを学習し、バージョンのディレクトリに保存"""
+        self.prepare_version()
 
         print("=== Train Data Summary ===")
         print("Shape:", X_train.shape)
@@ -35,16 +63,55 @@ class EnsembleModel:
 
         for name, model in self.models.items():
             print(f"Training {name} for {y_name}...")
+#            from models.hyperparameter_optimizer import HyperparameterOptimizer
 #            optimizer = HyperparameterOptimizer(model, X_train, y_train)
 #            best_params = optimizer.optimize(n_trials=5)
 #            model.set_hyperparams(best_params)
 
             model.train(X_train, y_train)
-            model.save_to_s3(self.stage, y_name)
+            model.save_to_s3(self.get_model_path(), y_name)
 
     def load_model(self, y_name):
+        """
+        各モデルを読み込む
+        読み込み済みのものはプロセス内のキャッシュ (ArtifactCache) から使い、残りは並列にダウンロードしてから読み込む
+        """
+        cache = get_artifact_cache()
+        model_path = self.get_model_path()
+        missing = []
         for name, model in self.models.items():
-            model.load_from_s3(self.stage, y_name)
+            s3_key = model.get_s3_key(model_path, y_name)
+            version = self.registry.artifact_version(model_path, s3_key)
+            # 内容を識別できない (ETag が取れない) ものはキャッシュしない
+            key = (self.stage, y_name, name, version) if version else None
+            cached = cache.get(key) if key else None
+            if cached is not None:
+                self.models[name] = cached
+            else:
+                missing.append((name, key, s3_key))
+
+        # キャッシュ中のインスタンスを書き換えないよう、複製に読み込む (ファイルを介さずメモリ上で変換)
+        loaded = {name: copy.copy(self.models[name]) for name, _, _ in missing}
+        contents = get_s3_helper().load_many_bytes([s3_key for _, _, s3_key in missing])
+        for (name, key, _), data in zip(missing, contents):
+            if data is not None:
+                loaded[name].import_bytes(data)
+            elif not loaded[name].load_from_s3(model_path, y_name):  # 従来のファイル名で保存されたモデル
+                continue
+            self.models[name] = cache.put(key, loaded[name]) if key else loaded[name]
+
+    def prepare_version(self):
+        """ 学習前に保存先のバージョンを決める """
+        if self.version is None:
+            # 公開中のバージョンを上書きしないよう、新しいバージョンに保存する
+            self.version = self.registry.create_version()
+            self.model_path = None
+
+    def get_model_path(self):
+        """ モデルの S3 プレフィックス (ステージのポインタは最初の1回だけ解決) """
+        if self.model_path is None:
+            self.model_path = self.registry.model_path(self.stage, self.version)
+        return self.model_path
 
     def predict(self, X_test):
         """各モデルの予測結果を統合（平均）"""
@@ -0,0 +1,103 @@
+import os
+import multiprocessing
+from io import BytesIO
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from threadpoolctl import threadpool_limits
+from models.ensemble_model import create_model
+from models.ml.ml_model_base import compress_model_bytes
+from config.settings import settings
+from utils.s3_helper import get_s3_helper
+
+# ネイティブライブラリのスレッド数 (ワーカーの起動前に親プロセスで設定し、ワーカーの環境変数として引き継ぐ)
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS",
+]
+
+
+class ParallelEnsembleTrainer:
+    """
+    (ターゲット × アンサンブルのモデル) の学習をプロセスプールで並列に実行する
+    - 各ジョブのスレッド数を制限し (LightGBM の n_jobs, TF の intra-op スレッドなど)、コア数をジョブで分け合う
+    - 学習済みモデルはバイト列で親プロセスに戻し、全ジョブの完了後にまとめて S3 に保存する
+    - 並列数が 1 以下の場合は EnsembleModel.train で順に学習する
+    """
+
+    def __init__(self, max_workers=None, threads_per_job=None):
+        self.max_workers = max_workers if max_workers is not None else settings.TRAINING_MAX_WORKERS
+        self.threads_per_job = threads_per_job if threads_per_job is not None else settings.TRAINING_THREADS_PER_JOB
+        self.s3 = get_s3_helper()
+
+    def train(self, targets, on_progress=None):
+        """
+        :param targets: { y_name: (EnsembleModel, X_train, y_train) }
+        :param on_progress: ジョブの完了ごとに on_progress(完了数, ジョブ数, y_name, モデル名) を呼ぶ
+            (順に学習する場合はターゲットごとに、モデル名は None)
+        学習後の各 EnsembleModel はそのまま predict に使える
+        """
+        on_progress = on_progress or (lambda done, total, y_name, name: None)
+        jobs = [(y_name, name) for y_name, (ensemble, _, _) in targets.items() for name in ensemble.models]
+        workers = min(self.max_workers or os.cpu_count() or 1, len(jobs))
+        if workers <= 1:
+            done = 0
+            for y_name, (ensemble, X_train, y_train) in targets.items():
+                ensemble.train(X_train, y_train, y_name)
+                done += len(ensemble.models)
+                on_progress(done, len(jobs), y_name, None)
+            return
+
+        threads = self.threads_per_job or max(1, (os.cpu_count() or 1) // workers)
+        print(f"Training {len(jobs)} jobs with {workers} processes x {threads} threads")
+        # initializer では遅い (引数の unpickle で numpy などが import され、BLAS が環境変数を読み込み済み) ため、
+        # spawn の前に設定してワーカーの起動時から有効にする
+        with _thread_env(threads), ProcessPoolExecutor(
+            max_workers=workers,
+            # fork ではライブラリのスレッドプールの状態を引き継ぐため spawn で起動する
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = {}
+            for y_name, name in jobs:
+                ensemble, X_train, y_train = targets[y_name]
+                ensemble.prepare_version()
+                kwargs = ensemble.model_kwargs.get(name, {})
+                futures[executor.submit(_train_member, name, kwargs, X_train, y_train, threads)] = (y_name, name)
+            results = {}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                on_progress(len(results), len(jobs), *futures[future])
+
+        uploads = []
+        for (y_name, name), data in results.items():
+            ensemble = targets[y_name][0]
+            model = ensemble.models[name]
+            model.import_bytes(data)
+            uploads.append((BytesIO(compress_model_bytes(data)), model.get_s3_key(ensemble.get_model_path(), y_name)))
+        self.s3.save_many(uploads)
+
+
+@contextmanager
+def _thread_env(threads):
+    """ THREAD_ENV_VARS を一時的に設定する (spawn したプロセスは起動時の環境変数を引き継ぐ) """
+    saved = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    os.environ.update({name: str(threads) for name in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _train_member(name, kwargs, X_train, y_train, threads):
+    """ ワーカープロセスで1つのモデルを学習し、バイト列を返す """
+    # 学習するモデルのライブラリだけを読み込む (LightGBM のワーカーで TensorFlow を import しない)
+    model = create_model(name, **kwargs)
+    model.set_thread_limit(threads)
+    print(f"Training {name} (pid={os.getpid()})...")
+    # 読み込み済みの BLAS / OpenMP のスレッドプールも実行時に制限する
+    with threadpool_limits(limits=threads):
+        model.train(X_train, y_train)
+    return model._export_bytes()
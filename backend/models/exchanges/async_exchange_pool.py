@@ -0,0 +1,73 @@
+import asyncio
+import atexit
+import threading
+import ccxt.async_support as ccxt_async
+from functools import lru_cache
+from config.settings import settings
+
+class AsyncExchangePool:
+    """
+    ccxt の非同期クライアントを共有イベントループ上で管理する
+    - イベントループは専用スレッドで常駐し、同期コードからは run() で結果を待つ
+    - 取引所ごとにクライアントを1つだけ生成し、セマフォで同時リクエスト数を制限
+    """
+
+    def __init__(self, max_concurrency: int = None):
+        self.max_concurrency = max_concurrency or settings.EXCHANGE_MAX_CONCURRENCY
+        self.configs = {}
+        self.exchanges = {}
+        self.semaphores = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="exchange-event-loop", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def register(self, exchange_id: str, config: dict):
+        """ 取引所クライアントの設定 (API キーなど) を登録。生成済みの場合は反映されない """
+        self.configs[exchange_id] = config
+
+    def run(self, coro):
+        """ 共有イベントループ上でコルーチンを実行し、結果を同期的に返す """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def call(self, exchange_id: str, method: str, *args, **kwargs):
+        """ 取引所ごとの同時実行数の上限内で ccxt のメソッドを呼び出す """
+        exchange = self._get_exchange(exchange_id)
+        async with self._get_semaphore(exchange_id):
+            return await getattr(exchange, method)(*args, **kwargs)
+
+    async def gather(self, coros):
+        """ 複数のコルーチンを並行実行し、入力順に結果を返す """
+        return await asyncio.gather(*coros)
+
+    def close(self):
+        if self.loop.is_closed() or not self.loop.is_running():
+            return
+        try:
+            self.run(self._close_exchanges())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _get_exchange(self, exchange_id: str):
+        # クライアントはループ上で生成する (aiohttp セッションがループに紐づくため)
+        if exchange_id not in self.exchanges:
+            config = {"enableRateLimit": True, **self.configs.get(exchange_id, {})}
+            self.exchanges[exchange_id] = getattr(ccxt_async, exchange_id)(config)
+        return self.exchanges[exchange_id]
+
+    def _get_semaphore(self, exchange_id: str):
+        if exchange_id not in self.semaphores:
+            self.semaphores[exchange_id] = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphores[exchange_id]
+
+    async def _close_exchanges(self):
+        for exchange in self.exchanges.values():
+            await exchange.close()
+        self.exchanges = {}
+
+
+# シングルトン化
+@lru_cache
+def get_async_exchange_pool() -> AsyncExchangePool:
+    """AsyncExchangePool のシングルトンインスタンスを取得"""
+    return AsyncExchangePool()
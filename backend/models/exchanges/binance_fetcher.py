@@ -1,44 +1,128 @@
 import ccxt
+import asyncio
 import pandas as pd
 import boto3
 from io import BytesIO
 from datetime import datetime, timedelta, timezone
 from config.settings import settings
+from models.exchanges.async_exchange_pool import get_async_exchange_pool
 
 class BinanceFetcher:
+    """
+    Binance の OHLCV 取得
+    実体は ccxt.async_support による *_async メソッドで、同期メソッドは共有イベントループで実行する薄いラッパー
+    """
+    EXCHANGE_ID = "binance"
+    # 現物の klines API が1リクエストで返す最大本数
+    MAX_OHLCV_LIMIT = 1000
 
     def __init__(self):
-        self.binance = ccxt.binance()
-
+        # 同時リクエスト数は取引所ごとに AsyncExchangePool で制限 (ccxt の enableRateLimit も有効)
+        self.pool = get_async_exchange_pool()
 
     def fetch_ohlcv(self, symbol, interval, days, limit):
+        return self.pool.run(self.fetch_ohlcv_async(symbol, interval, days, limit))
+
+    def fetch_daily_ohlcv(self, symbol, interval_min, days):
+        """
+        ccxt を使って Binance から VITE/USDT の過去データを取得
+        """
+        return self.pool.run(self.fetch_daily_ohlcv_async(symbol, interval_min, days))
+
+    def fetch_range(self, symbol, timeframe, start, end):
+        """
+        [start, end) の期間の OHLCV を最大 limit のページ単位で取得
+        日足 540 本なら 1 リクエストで取得できる
+        :param timeframe: "15m", "1d" などの ccxt の時間軸、または分単位の int
+        :param start: 開始日時 (naive の場合は UTC とみなす)
+        :param end: 終了日時 (この日時を含まない)
+        """
+        return self.pool.run(self.fetch_range_async(symbol, timeframe, start, end))
+
+    def fetch_ohlcv_many(self, symbols, interval, days, limit):
+        """
+        複数シンボルの fetch_ohlcv を並行実行
+        :return: { symbol: DataFrame }
+        """
+        frames = self.pool.run(self.pool.gather(
+            [self.fetch_ohlcv_async(symbol, interval, days, limit) for symbol in symbols]
+        ))
+        return dict(zip(symbols, frames))
+
+    def fetch_range_many(self, requests):
+        """
+        複数の (symbol, timeframe, start, end) の fetch_range を並行実行
+        :return: 入力順の DataFrame のリスト
+        """
+        return self.pool.run(self.pool.gather(
+            [self.fetch_range_async(*request) for request in requests]
+        ))
+
+    async def fetch_ohlcv_async(self, symbol, interval, days, limit):
+        # `days` 日前の00:00を起点にデータを取得
+        since = ccxt.Exchange.parse8601((datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%dT00:00:00Z'))
+        candles = await self.pool.call(self.EXCHANGE_ID, "fetch_ohlcv", symbol, timeframe=interval, since=since, limit=limit)
+
+        return self._to_dataframe(candles)
+
+    async def fetch_daily_ohlcv_async(self, symbol, interval_min, days):
         # `days` 日前の00:00を起点にデータを取得
-        since = self.binance.parse8601((datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%dT00:00:00Z'))        
-        candles = self.binance.fetch_ohlcv(symbol, timeframe=interval, since=since, limit=limit)
+        since = ccxt.Exchange.parse8601((datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%dT00:00:00Z'))
+        limit = int(24*60 / interval_min) # 24時間分
+        timeframe = self.to_timeframe(interval_min)
+        candles = await self.pool.call(self.EXCHANGE_ID, "fetch_ohlcv", symbol, timeframe=f"{timeframe}", since=since, limit=limit)
+
+        return self._to_dataframe(candles)
+
+    async def fetch_range_async(self, symbol, timeframe, start, end):
+        if isinstance(timeframe, int):
+            timeframe = self.to_timeframe(timeframe)
+        since = self._to_milliseconds(start)
+        until = self._to_milliseconds(end)
+        page_span = ccxt.Exchange.parse_timeframe(timeframe) * 1000 * self.MAX_OHLCV_LIMIT
 
-        # DataFrame に変換
+        # ページの開始時刻は事前に決まるため、全ページを並行して取得し timestamp で重複を除く
+        pages = await asyncio.gather(*[
+            self.pool.call(self.EXCHANGE_ID, "fetch_ohlcv", symbol, timeframe=timeframe, since=page_since, limit=self.MAX_OHLCV_LIMIT)
+            for page_since in range(since, until, page_span)
+        ])
+        candles = [candle for page in pages for candle in page if candle[0] < until]
+
+        df = self._to_dataframe(candles)
+        return df.drop_duplicates(subset="timestamp", keep="last").sort_values("timestamp", ignore_index=True)
+
+    @staticmethod
+    def _to_dataframe(candles):
+        """ DataFrame に変換 """
         df = pd.DataFrame(candles, columns=["timestamp", "open", "high", "low", "close", "volume"])
         df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-
         return df
 
-    def fetch_daily_ohlcv(self, symbol, interval_min, days):
+    @staticmethod
+    def split_daily(df):
         """
-        ccxt を使って Binance から VITE/USDT の過去データを取得
+        fetch_range の結果を日次パーティション (日付ごとの DataFrame) に分割
+        :return: { "YYYY-MM-DD": DataFrame }
         """
-        # `days` 日前の00:00を起点にデータを取得
-        since = self.binance.parse8601((datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%dT00:00:00Z'))        
-        limit = int(24*60 / interval_min) # 24時間分
+        if df.empty:
+            return {}
+        days = df["timestamp"].dt.strftime("%Y-%m-%d")
+        return {day: group.reset_index(drop=True) for day, group in df.groupby(days, sort=True)}
+
+    @staticmethod
+    def to_timeframe(interval_min):
+        """ 分単位の足の間隔を ccxt の時間軸 ("15m", "4h", "1d") に変換 """
         timeframe = f"{interval_min}m"
         if interval_min >= 60 * 24:
             timeframe = f"{interval_min//60//24}d"
         elif interval_min >= 60:
             timeframe = f"{interval_min//60}h"
-        candles = self.binance.fetch_ohlcv(symbol, timeframe=f"{timeframe}", since=since, limit=limit)
+        return timeframe
 
-        # DataFrame に変換
-        df = pd.DataFrame(candles, columns=["timestamp", "open", "high", "low", "close", "volume"])
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-
-        return df
+    @staticmethod
+    def _to_milliseconds(date):
+        date = pd.Timestamp(date)
+        if date.tzinfo is None:
+            date = date.tz_localize("UTC")
+        return int(date.timestamp() * 1000)
 
@@ -1,41 +1,47 @@
-import ccxt
 import json
 from config.settings import settings
 from config.config_manager import get_config_manager
+from models.exchanges.async_exchange_pool import get_async_exchange_pool
 
 class CoinCheckAPI:
+    EXCHANGE_ID = "coincheck"
 
     def __init__(self):
-        self.client = ccxt.coincheck({
+        self.pool = get_async_exchange_pool()
+        self.pool.register(self.EXCHANGE_ID, {
             'apiKey': settings.COINCHECK_API_KEY,
             'secret': settings.COINCHECK_API_SECRET
         })
         self.config_data = get_config_manager().get_config()
         self.market = self.config_data.get("market_symbol")
 
+    def _call(self, method, *args, **kwargs):
+        """ ccxt.async_support のクライアントを共有イベントループで呼び出す """
+        return self.pool.run(self.pool.call(self.EXCHANGE_ID, method, *args, **kwargs))
+
     def get_balance(self):
-        balance = self.client.fetch_balance()
+        balance = self._call("fetch_balance")
         market_symbol = self.market.split("_")
         #return { x: float(balance["info"][x]) for x in market_symbol }
         return [ float(balance["info"][x]) for x in market_symbol ]
 
     def create_limit_order(self, side, amount, price):
         # 指値注文を出す
-        return self.client.create_order(self.market, "limit", side, amount, price)
+        return self._call("create_order", self.market, "limit", side, amount, price)
     
     def create_market_order(self, side, amount):
         # 成行注文を出す
-        return self.client.create_order(self.market, "market", side, amount)
+        return self._call("create_order", self.market, "market", side, amount)
     
     def get_trade_history(self, market):
-        trades = self.client.fetch_my_trades(market)
+        trades = self._call("fetch_my_trades", market)
         return trades
 
     def get_open_orders(self, market):
-        open_orders = self.client.fetch_open_orders(market)
+        open_orders = self._call("fetch_open_orders", market)
 
     def get_cancel_order(self, order_id, market):
-        cancel_response = self.client.cancel_order(order_id, market)
+        cancel_response = self._call("cancel_order", order_id, market)
         print(cancel_response)
 
     def get_order_book(self):
@@ -43,7 +49,7 @@ class CoinCheckAPI:
         asks: 売り注文の情報
         bids: 買い注文の情報
         """
-        response = self.client.publicGetOrderBooks()
+        response = self._call("publicGetOrderBooks")
         return response
 
     def get_exchange_rate(self, pair, order_type, amount):
@@ -53,7 +59,7 @@ class CoinCheckAPI:
         :param order_type: "buy" または "sell"
         :param amount: 交換する数量
         """
-        response = self.client.publicGetExchangeOrdersRate({'pair': pair, 'order_type': order_type, 'amount': amount})
+        response = self._call("publicGetExchangeOrdersRate", {'pair': pair, 'order_type': order_type, 'amount': amount})
         return response
 
     def get_latest_rate(self, pair):
@@ -61,12 +67,12 @@ class CoinCheckAPI:
         Coincheck の最新レートを取得
         :param pair: 取引ペア ("btc_jpy" など)
         """
-        response = self.client.publicGetRatePair({'pair': pair})
+        response = self._call("publicGetRatePair", {'pair': pair})
         return response
 
     def get_avg_cost(self):
         """過去の取引履歴から加重平均購入価格を算出"""
-        trades = self.client.fetch_my_trades(self.market)
+        trades = self._call("fetch_my_trades", self.market)
 
         total_cost = sum(trade["price"] * trade["amount"] for trade in trades)
         total_amount = sum(trade["amount"] for trade in trades)
@@ -1,4 +1,3 @@
-import yfinance as yf
 import pandas as pd
 import time
 from datetime import datetime, timedelta
@@ -35,7 +34,8 @@ class YFinanceFetcher:
             end_date = datetime(year, month + 1, 1)
         end_date = min(end_date, today)
 
-        # yfinance で取得
+        # yfinance で取得 (起動時間を抑えるため、取得時に import)
+        import yfinance as yf
         ticker = yf.Ticker(symbol)
         chunk_days = 30
         chunk_start = start_date
@@ -1,12 +1,21 @@
-import talib
 import pandas as pd
 import numpy as np
 from datetime import datetime
 from models.economic_data import EconomicData
+from models.features.feature_cache import FeatureCache
+from models.features.feature_matrix_builder import FeatureMatrixBuilder
+from models.features.feature_registry import FEATURE_REGISTRY
+from models.features.indicator_backends import default_indicator_backend
+from models.features.label_grid import LabelGrid
 from config.config_manager import get_config_manager
+from config.settings import settings
+
+# 特徴量の計算方法を変えた場合は上げる (特徴量キャッシュのキーに含まれる)
+FEATURE_CODE_VERSION = 2
 
 FEATURE_CONFIG = {
     "sma_periods": [5, 10, 15, 20, 50],  # 移動平均
+    "ma_cross_periods": None,            # 移動平均クロスの期間 (None なら sma_periods)
     "bollinger_periods": [10, 15, 20],   # ボリンジャーバンド
     "atr_periods": [5, 10, 15, 20],      # ATR
     "rsi_period": 14,                    # RSI
@@ -14,11 +23,15 @@ FEATURE_CONFIG = {
     "macd_slow": 26,                      # MACD slow period
     "macd_signal": 9,                      # MACD signal period
     "lag_days": 3,                         # 過去データのラグ数
-    "use_features": [                      # 使用する特徴量
-        "SMA", "RSI", "ATR", "BOLL", "OBV", "MACD", "STOCH"
+    "use_features": [                      # 使用する特徴量 (feature_registry に登録された名前)
+        "OHLCV", "SMA", "MA_CROSS", "CANDLE", "RSI", "ATR", "BOLL", "OBV", "MACD", "STOCH", "LAG"
     ],
     "trade_signals_threshold": 0.02,  # 売買シグナルの閾値
     "trade_signals_window": 21,    # 売買シグナルの計算ウィンドウ
+    "label_horizons": [5, 10, 15, 20, 30, 45, 60],  # create_label_grid の期間
+    "lookback_margin": 250,        # 推論時の読み込み本数の余裕 (EMA / Wilder の平滑化が初期値の影響を受けなくなるまで)
+    "dtype": "float64",            # 特徴量の型 (float32 でメモリを半減)
+    "indicator_backend": default_indicator_backend(),  # 指標の計算: "talib" または "numba" (talib 不要・全期間を融合して計算)。talib が無ければ numba
 }
 
 class FeatureDatasetModel:
@@ -26,16 +39,55 @@ class FeatureDatasetModel:
         self.config_data = get_config_manager().get_config()
         self.feature_columns = []
 
-    def create_features(self, df):
-        df = df.copy()
-        df = self._add_technical_features(df)
-        df = self._add_lag_features(df)
-        df = self._add_return_signals(df)
-        df.dropna(inplace=True)
+    def create_features(self, df, use_cache=True, features=None):
+        """
+        説明変数 X と目的変数 Y を作成
+        入力データと設定が同じ場合は、特徴量キャッシュから読み込む
+        :param features: 計算する特徴量 (省略時は FEATURE_CONFIG["use_features"])。依存先は自動で計算される
+        """
+        features = list(features or FEATURE_CONFIG["use_features"])
+        feature_config = {**FEATURE_CONFIG, "use_features": features}
+        cache = FeatureCache(self.config_data, feature_config, FEATURE_CODE_VERSION) if use_cache and settings.FEATURE_CACHE_ENABLED else None
+        if cache:
+            key = cache.make_key(df)
+            cached = cache.load(key)
+            if cached is not None:
+                self.feature_columns = list(cached[0].columns)
+                return cached
+
+        X, Y = self._create_features(df, features)
+        if cache:
+            cache.save(key, X, Y)
+        return X, Y
+
+    def required_lookback(self, features=None, margin=None):
+        """
+        最新の1行の特徴量を作るのに必要な足の本数
+        各特徴量の warmup (SMA 50, MACD 26+9, ラグなど) の最大値 + 最新の足 + 余裕
+        OBV は累積値のため読み込み期間の先頭に依存する (StreamingIndicatorEngine の状態があれば継続される)
+        :param margin: 余裕の本数 (省略時は FEATURE_CONFIG["lookback_margin"])
+        """
+        features = list(features or FEATURE_CONFIG["use_features"])
+        margin = FEATURE_CONFIG["lookback_margin"] if margin is None else margin
+        return FEATURE_REGISTRY.warmup(features, FEATURE_CONFIG) + 1 + margin
+
+    def _create_features(self, df, features):
+        market = self.config_data.get("market_symbol")
+        ohlcv = {v: np.asarray(df[f"{v}_{market}"], dtype=np.float64) for v in ["open", "high", "low", "close", "volume"]}
+
+        # 要求された特徴量の列を先に決めて確保し、依存関係の順に計算して各列に直接書き込む
+        self.feature_columns = FEATURE_REGISTRY.columns(features, market, FEATURE_CONFIG)
+        builder = FeatureMatrixBuilder(df.index, self.feature_columns, dtype=np.dtype(FEATURE_CONFIG["dtype"]))
+        FEATURE_REGISTRY.compute(features, market, ohlcv, FEATURE_CONFIG, builder)
+        buy_signal, sell_signal, target_valid = self._add_return_signals(ohlcv["close"])
+
+        # 入力データ・特徴量・目的変数のいずれかが NaN の行を除く
+        valid = builder.valid_rows() & target_valid & df.notna().all(axis=1).to_numpy()
+        rows = builder.to_row_selector(valid)
 
         # ---- 説明変数と目的変数の分割 ----
-        X = df[self.feature_columns]
-        Y = df[['buy_signal', 'sell_signal']]
+        X = builder.to_frame(rows)
+        Y = pd.DataFrame({"buy_signal": buy_signal[rows], "sell_signal": sell_signal[rows]}, index=X.index)
 
         return X, Y
 
@@ -47,140 +99,28 @@ class FeatureDatasetModel:
 
 #        return X, y_buy, y_sell
 
-    def _add_technical_features(self, df):
-        df = df.copy()
-        market = self.config_data.get("market_symbol")
-        open = df[f"open_{market}"]
-        high = df[f"high_{market}"]
-        low = df[f"low_{market}"]
-        close = df[f"close_{market}"]
-        volume = df[f"volume_{market}"]
-        self.feature_columns.extend([f"open_{market}", f"high_{market}", f"low_{market}", f"close_{market}", f"volume_{market}"])
-
-        # ---- (1) 移動平均 (SMA) ----
-        for period in FEATURE_CONFIG["sma_periods"]:
-            df[f"sma_{period}"] = talib.SMA(close, timeperiod=period)
-            self.feature_columns.append(f"sma_{period}")
-    
-        df = self._add_ma_cross_signals(df)
-        df = self._add_candle_signals(df, open, close)
-        
-        # ---- (2) ボリンジャーバンド (BOLL) ----
-        for period in FEATURE_CONFIG["bollinger_periods"]:
-            upper, middle, lower = talib.BBANDS(close, timeperiod=period)
-            df[f"bollinger_upper{period}"] = upper
-            df[f"bollinger_middle{period}"] = middle
-            df[f"bollinger_lower{period}"] = lower
-            self.feature_columns.extend([f"bollinger_upper{period}", f"bollinger_middle{period}", f"bollinger_lower{period}"])
-
-        # ---- (3) ATR (Average True Range) ----
-        for period in FEATURE_CONFIG["atr_periods"]:
-            df[f"atr{period}"] = talib.ATR(high, low, close, timeperiod=period)
-            self.feature_columns.append(f"atr{period}")
-
-        # ---- (4) RSI (Relative Strength Index) ----
-        rsi_period = FEATURE_CONFIG["rsi_period"]
-        df["RSI"] = talib.RSI(close, timeperiod=rsi_period)
-        self.feature_columns.append("RSI")
-
-        # ---- (5) OBV (On-Balance Volume) ----
-        df["OBV"] = talib.OBV(close, volume)
-        self.feature_columns.append("OBV")
-
-        # ---- (6) MACD ----
-        macd_fast = FEATURE_CONFIG["macd_fast"]
-        macd_slow = FEATURE_CONFIG["macd_slow"]
-        macd_signal = FEATURE_CONFIG["macd_signal"]
-        df["MACD"], df["MACD_signal"], df["MACD_hist"] = talib.MACD(close, fastperiod=macd_fast, slowperiod=macd_slow, signalperiod=macd_signal)
-        self.feature_columns.extend(["MACD", "MACD_signal", "MACD_hist"])
-
-        # ---- (7) ストキャスティクス (Stochastic) ----
-        df["STOCH_k"], df["STOCH_d"] = talib.STOCH(high, low, close)
-        self.feature_columns.extend(["STOCH_k", "STOCH_d"])
-
-        return df
-
-    def _add_ma_cross_signals(self, df):
-        """
-        移動平均クロス（短期が長期を上抜け → 買いシグナル候補）
-        売りシグナル：逆クロス OR 将来利回りが-閾値以下
+    def _add_return_signals(self, close):
         """
-        for period_1 in FEATURE_CONFIG["sma_periods"]:
-            for period_2 in FEATURE_CONFIG["sma_periods"]:
-                if period_1 < period_2:
-                    df_period_1 = df[f"sma_{period_1}"]
-                    df_period_2 = df[f"sma_{period_2}"]
-                    df[f"ma_cross_up_{period_1}_{period_2}"] = ((df_period_1 > df_period_2) & (df_period_1.shift(1) <= df_period_2.shift(1))).astype(int) 
-                    df[f"ma_cross_down_{period_1}_{period_2}"] = ((df_period_1 < df_period_2) & (df_period_1.shift(1) >= df_period_2.shift(1))).astype(int) 
-                    self.feature_columns.append(f"ma_cross_up_{period_1}_{period_2}")
-                    self.feature_columns.append(f"ma_cross_down_{period_1}_{period_2}")
-        return df
-
-    def _add_candle_signals(self, df, open_, close):
-        """陽線で5MAを上抜け、陰線で下抜けなどのシグナル"""
-        if "sma_5" not in df.columns:
-            return df  # 念のため
-
-        sma5 = df["sma_5"]
-
-        # 陽線で5MAを上抜け
-        df["candle_cross_up_5"] = ((close > open_) & (close > sma5) & (open_ <= sma5)).astype(int)
-
-        # 陰線で5MAを下抜け
-        df["candle_cross_down_5"] = ((close < open_) & (close < sma5) & (open_ >= sma5)).astype(int)
-
-        self.feature_columns += ["candle_cross_up_5", "candle_cross_down_5"]
-        return df
-
-    def _add_lag_features(self, df):
-
-        lagged_features = {}
-        columns = []
-        lag_days = FEATURE_CONFIG["lag_days"]
-        market = self.config_data.get("market_symbol")
+        将来リターン閾値で買い・売りシグナルを作成する。
 
-        for lag in range(1, lag_days + 1):
-            for col in [f"open_{market}", f"high_{market}", f"low_{market}", f"close_{market}", f"volume_{market}"]:
-                lagged_features[f"{col}_lag{lag}"] = df[col].shift(lag)
-                columns.append(f"{col}_lag{lag}")
-
-        df = pd.concat([df, pd.DataFrame(lagged_features)], axis=1)
-        self.feature_columns.extend(columns)
-
-        # ---- 旧目的変数 (ターゲット) ----
-        market = self.config_data.get("market_symbol")
-        close = df[f"close_{market}"]
-#        df["future_return"] = close.shift(-lag_days) / close - 1
-#        df["target"] = (df["future_return"] > 0).astype(int)  # 上昇: 1, 下降: 0
-#        df["target"] = close.shift(-lag_days)
-
-        return df
-
-
-    def _add_return_signals(self, df):
-        """
-        移動平均クロスと将来リターン閾値で買い・売りシグナルを作成する。
-        
         Returns:
-            pd.DataFrame: シグナル列 'buy_signal', 'sell_signal' を追加したDataFrame
+            (buy_signal, sell_signal, valid): シグナルの int 配列と、将来の価格が揃っている行のマスク
         """
-        df = df.copy()
-
-        market = self.config_data.get("market_symbol")
         target_buy_term = self.config_data.get("target_buy_term")
-        target_buy_rate = self.config_data.get("target_buy_rate")
         target_sell_term = self.config_data.get("target_sell_term")
-        target_sell_rate = self.config_data.get("target_sell_rate")
-        df["max_close"] = df[f"close_{market}"].rolling(target_buy_term).max().shift(-target_buy_term)
-        df["min_close"] = df[f"close_{market}"].rolling(target_sell_term).min().shift(-target_sell_term)
-        df['buy_signal'] = 0
-        df['sell_signal'] = 0
-
-        df["max_return"] = df["max_close"] / df[f"close_{market}"]
-        df["min_return"] = df["min_close"] / df[f"close_{market}"]
-        df['buy_signal'] =  (df["max_return"] > (1+target_buy_rate)).astype(int) 
-        df['sell_signal'] = (df["min_return"] < (1-target_sell_rate)).astype(int) 
-        df.loc[(df['buy_signal'] == 1) & (df['sell_signal'] == 1), ['buy_signal','sell_signal']] = 0
-        df.dropna(inplace=True)
-
-        return df
+        grid = LabelGrid(close, [target_buy_term, target_sell_term])
+        return grid.labels(
+            target_buy_term, self.config_data.get("target_buy_rate"),
+            target_sell_term, self.config_data.get("target_sell_rate"),
+        )
+
+    def create_label_grid(self, df, horizons=None):
+        """
+        複数の期間の将来の最大/最小値をまとめて計算する (閾値の検討用)
+        grid.labels(buy_term, buy_rate, sell_term, sell_rate) で任意の組み合わせのラベルを取り出せる
+        :param horizons: 期間のリスト (省略時は FEATURE_CONFIG["label_horizons"] と現在の target_*_term)
+        """
+        market = self.config_data.get("market_symbol")
+        if horizons is None:
+            horizons = FEATURE_CONFIG["label_horizons"] + [self.config_data.get("target_buy_term"), self.config_data.get("target_sell_term")]
+        return LabelGrid(np.asarray(df[f"close_{market}"], dtype=np.float64), horizons, index=df.index)
@@ -0,0 +1,75 @@
+import json
+import hashlib
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from utils.s3_helper import get_s3_helper
+from config.settings import settings
+from config import constants
+
+class FeatureCache:
+    """
+    FeatureDatasetModel.create_features の結果 (X, Y) を内容のハッシュをキーに S3 に保存する
+    features/cache/{sha256}.parquet
+    キー = 入力データ + FEATURE_CONFIG + 目的変数の設定 + 特徴量コードのバージョン
+    内容が同じなら同じキーになり上書きされないため、読み込みは immutable (ローカルキャッシュがあれば S3 に問い合わせない)
+    入力期間は毎日変わるため、保存時に FEATURE_CACHE_TTL_DAYS より古いものを削除する
+    """
+    CONFIG_KEYS = ["market_symbol", "target_buy_term", "target_buy_rate", "target_sell_term", "target_sell_rate"]
+    INDEX_COLUMN = "__row__"
+    Y_PREFIX = "__y__"
+
+    def __init__(self, config_data, feature_config, code_version):
+        self.config_data = config_data
+        self.feature_config = feature_config
+        self.code_version = code_version
+        self.s3 = get_s3_helper()
+
+    def make_key(self, df: pd.DataFrame):
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+        digest.update(json.dumps([list(map(str, df.columns)), list(map(str, df.dtypes))]).encode("utf-8"))
+        params = {
+            "feature_config": self.feature_config,
+            "config": {key: self.config_data.get(key) for key in self.CONFIG_KEYS},
+            "code_version": self.code_version,
+        }
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def load(self, key):
+        """ キャッシュ済みの (X, Y) を返す。無い場合は None """
+        df = self.s3.load_parquet_from_s3(self.get_s3_filename(key), immutable=True)
+        if df.empty:
+            return None
+        df = df.set_index(self.INDEX_COLUMN)
+        df.index.name = None
+        y_columns = [c for c in df.columns if c.startswith(self.Y_PREFIX)]
+        X = df.drop(columns=y_columns)
+        Y = df[y_columns].rename(columns=lambda c: c[len(self.Y_PREFIX):])
+        return X, Y
+
+    def save(self, key, X: pd.DataFrame, Y: pd.DataFrame):
+        df = pd.concat([X, Y.add_prefix(self.Y_PREFIX)], axis=1)
+        df.index.name = self.INDEX_COLUMN
+        self.s3.save_parquet_to_s3(df.reset_index(), self.get_s3_filename(key))
+        self.evict()
+
+    def evict(self, ttl_days=None):
+        """ 最終更新日時が ttl_days より前のキャッシュを削除 """
+        ttl_days = settings.FEATURE_CACHE_TTL_DAYS if ttl_days is None else ttl_days
+        if ttl_days <= 0:
+            return []
+        before = datetime.now(timezone.utc) - timedelta(days=ttl_days)
+        expired = self.s3.get_s3_files_modified_before(self.get_prefix(), before)
+        if expired:
+            self.s3.delete_s3_files(expired)
+            print(f"Evicted {len(expired)} feature cache files")
+        return expired
+
+    @staticmethod
+    def get_prefix():
+        return f"{constants.S3_FOLDER_FEATURE}/cache/"
+
+    @classmethod
+    def get_s3_filename(cls, key):
+        return f"{cls.get_prefix()}{key}.parquet"
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+class FeatureMatrixBuilder:
+    """
+    特徴量を1つの連続した配列 (列優先, Fortran order) に書き込むビルダー
+    - 全列分を最初に確保し (NaN で初期化)、各指標は列のスライスに直接書き込む
+    - DataFrame への変換は最後に1回だけ行い、配列はコピーしない (単一ブロック)
+    """
+
+    def __init__(self, index, columns, dtype=np.float64):
+        self.index = index
+        self.columns = list(columns)
+        self.positions = {column: i for i, column in enumerate(self.columns)}
+        self.values = np.full((len(index), len(self.columns)), np.nan, dtype=dtype, order="F")
+
+    def __getitem__(self, column):
+        """ 列のビュー (連続領域) """
+        return self.values[:, self.positions[column]]
+
+    def __setitem__(self, column, values):
+        self.values[:, self.positions[column]] = values
+
+    def valid_rows(self):
+        """ 全ての列が NaN でない行 """
+        return ~np.isnan(self.values).any(axis=1)
+
+    def to_frame(self, rows=None):
+        """
+        DataFrame に変換
+        :param rows: 抽出する行 (連続する範囲なら slice にするとコピーしない)
+        """
+        values = self.values if rows is None else self.values[rows]
+        index = self.index if rows is None else self.index[rows]
+        return pd.DataFrame(values, index=index, columns=self.columns, copy=False)
+
+    @staticmethod
+    def to_row_selector(mask):
+        """ 行のマスクを、連続していれば slice に、そうでなければ位置の配列に変換 """
+        positions = np.flatnonzero(mask)
+        if positions.size and positions[-1] - positions[0] + 1 == positions.size:
+            return slice(positions[0], positions[-1] + 1)
+        return positions
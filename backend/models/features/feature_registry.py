@@ -0,0 +1,277 @@
+import numpy as np
+from models.features.indicator_backends import create_indicators
+
+OHLCV = ["open", "high", "low", "close", "volume"]
+
+
+class Feature:
+    """
+    特徴量の定義
+    :param name: use_features で指定する名前
+    :param inputs: 使用する OHLCV の列
+    :param depends: 先に計算が必要な特徴量 (登録済みのもののみ指定可)
+    :param params: FEATURE_CONFIG からパラメータを取り出す関数
+    :param warmup: パラメータから、最初の有効な値までに必要な足の本数を返す関数 (依存先の分は含めない)
+    :param columns: (market, params) から出力する列名のリストを返す関数
+    :param compute: (market, ohlcv, deps, params, indicators) から { 列名: 配列 } を返す関数
+        deps には依存先の特徴量の計算結果 { 特徴量名: { 列名: 配列 } } が、
+        indicators には FEATURE_CONFIG["indicator_backend"] の指標計算 (indicator_backends) が渡される
+    """
+
+    def __init__(self, name, inputs, depends, params, warmup, columns, compute):
+        self.name = name
+        self.inputs = inputs
+        self.depends = depends
+        self.params = params
+        self.warmup = warmup
+        self.columns = columns
+        self.compute = compute
+
+
+class FeatureRegistry:
+    """
+    特徴量の登録と依存関係 (DAG) の解決
+    - 列の順序は登録順 (学習済みモデルの入力順を変えないため)
+    - 要求された特徴量とその依存先だけを計算し、依存先のみの特徴量は列として出力しない
+    """
+
+    def __init__(self):
+        self.features = {}
+
+    def register(self, feature: Feature):
+        unknown = [name for name in feature.depends if name not in self.features]
+        if unknown:
+            raise ValueError(f"{feature.name} の依存先が未登録です: {unknown}")
+        self.features[feature.name] = feature
+        return feature
+
+    def resolve(self, names):
+        """ 要求された特徴量と依存先を、計算順 (登録順) に並べて返す """
+        unknown = [name for name in names if name not in self.features]
+        if unknown:
+            raise ValueError(f"未登録の特徴量です: {unknown}")
+        required = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in required:
+                required.add(name)
+                stack.extend(self.features[name].depends)
+        return [feature for name, feature in self.features.items() if name in required]
+
+    def columns(self, names, market, feature_config):
+        """ 要求された特徴量の列 (登録順) """
+        names = set(names)
+        return [
+            column
+            for feature in self.resolve(names) if feature.name in names
+            for column in feature.columns(market, feature.params(feature_config))
+        ]
+
+    def warmup(self, names, feature_config):
+        """ 要求された特徴量が全て有効になるまでに必要な足の本数 (依存先の分を含む) """
+        total = {}
+        for feature in self.resolve(names):
+            own = feature.warmup(feature.params(feature_config))
+            total[feature.name] = own + max((total[d] for d in feature.depends), default=0)
+        return max(total.values(), default=0)
+
+    def features_for_columns(self, columns, market, feature_config):
+        """ 列名のリスト (学習済みモデルの入力など) から必要な特徴量名を返す """
+        columns = set(columns)
+        return [
+            name for name, feature in self.features.items()
+            if columns & set(feature.columns(market, feature.params(feature_config)))
+        ]
+
+    def compute(self, names, market, ohlcv, feature_config, builder):
+        """ 要求された特徴量を依存順に計算し、要求されたものだけ builder の列に書き込む """
+        names = set(names)
+        indicators = create_indicators(ohlcv, feature_config)
+        results = {}
+        for feature in self.resolve(names):
+            params = feature.params(feature_config)
+            deps = {name: results[name] for name in feature.depends}
+            results[feature.name] = feature.compute(market, ohlcv, deps, params, indicators)
+            if feature.name in names:
+                for column, values in results[feature.name].items():
+                    builder[column] = values
+        return results
+
+
+def _shift(values, periods):
+    shifted = np.full(len(values), np.nan)
+    shifted[periods:] = values[:-periods]
+    return shifted
+
+
+def _ma_pairs(periods):
+    return [(p1, p2) for p1 in periods for p2 in periods if p1 < p2]
+
+
+def ma_cross_periods(feature_config):
+    """ 移動平均クロスの期間 (未指定なら sma_periods) """
+    return feature_config.get("ma_cross_periods") or feature_config["sma_periods"]
+
+
+def _ma_cross(market, ohlcv, deps, params, indicators):
+    """
+    移動平均クロス（短期が長期を上抜け → 買いシグナル候補）
+    売りシグナル：逆クロス OR 将来利回りが-閾値以下
+    全ての組み合わせを1回で比較する: SMA を (時間 × 期間) の行列にまとめ、
+    組み合わせの添字で列を取り出した差の符号と、1本前の差の符号から int8 の行列を作る
+    """
+    periods = params["periods"]
+    pairs = _ma_pairs(periods)
+    if not pairs:
+        return {}
+    sma = deps["SMA"]
+    matrix = np.column_stack([
+        sma[f"sma_{p}"] if f"sma_{p}" in sma else indicators.sma(p) for p in periods
+    ])
+    position = {p: i for i, p in enumerate(periods)}
+    short = np.array([position[p1] for p1, _ in pairs])
+    long = np.array([position[p2] for _, p2 in pairs])
+
+    # NaN との比較は False になるため、期間が揃うまでと先頭行は 0
+    diff = matrix[:, short] - matrix[:, long]
+    block = np.zeros((len(diff), 2 * len(pairs)), dtype=np.int8)
+    block[1:, 0::2] = (diff[1:] > 0) & (diff[:-1] <= 0)
+    block[1:, 1::2] = (diff[1:] < 0) & (diff[:-1] >= 0)
+
+    columns = [c for p1, p2 in pairs for c in (f"ma_cross_up_{p1}_{p2}", f"ma_cross_down_{p1}_{p2}")]
+    return {column: block[:, i] for i, column in enumerate(columns)}
+
+
+def _candle(market, ohlcv, deps, params, indicators):
+    """陽線で5MAを上抜け、陰線で下抜けなどのシグナル"""
+    open_, close = ohlcv["open"], ohlcv["close"]
+    sma5 = deps["SMA"].get("sma_5")
+    if sma5 is None:
+        return {}  # 念のため
+    return {
+        # 陽線で5MAを上抜け
+        "candle_cross_up_5": (close > open_) & (close > sma5) & (open_ <= sma5),
+        # 陰線で5MAを下抜け
+        "candle_cross_down_5": (close < open_) & (close < sma5) & (open_ >= sma5),
+    }
+
+
+def _bbands(market, ohlcv, deps, params, indicators):
+    result = {}
+    for period in params["periods"]:
+        upper, middle, lower = indicators.bbands(period)
+        result[f"bollinger_upper{period}"] = upper
+        result[f"bollinger_middle{period}"] = middle
+        result[f"bollinger_lower{period}"] = lower
+    return result
+
+
+def _macd(market, ohlcv, deps, params, indicators):
+    macd, signal, hist = indicators.macd(params["fast"], params["slow"], params["signal"])
+    return {"MACD": macd, "MACD_signal": signal, "MACD_hist": hist}
+
+
+def _stoch(market, ohlcv, deps, params, indicators):
+    k, d = indicators.stoch()
+    return {"STOCH_k": k, "STOCH_d": d}
+
+
+def _lag(market, ohlcv, deps, params, indicators):
+    # 先頭の lag 行は NaN
+    return {
+        f"{v}_{market}_lag{lag}": _shift(ohlcv[v], lag)
+        for lag in range(1, params["lag_days"] + 1)
+        for v in OHLCV
+    }
+
+
+FEATURE_REGISTRY = FeatureRegistry()
+
+FEATURE_REGISTRY.register(Feature(
+    "OHLCV", inputs=OHLCV, depends=[],
+    params=lambda config: {},
+    warmup=lambda params: 0,
+    columns=lambda market, params: [f"{v}_{market}" for v in OHLCV],
+    compute=lambda market, ohlcv, deps, params, indicators: {f"{v}_{market}": ohlcv[v] for v in OHLCV},
+))
+# ---- (1) 移動平均 (SMA) ----
+FEATURE_REGISTRY.register(Feature(
+    "SMA", inputs=["close"], depends=[],
+    params=lambda config: {"periods": config["sma_periods"]},
+    warmup=lambda params: max(params["periods"]) - 1,
+    columns=lambda market, params: [f"sma_{p}" for p in params["periods"]],
+    compute=lambda market, ohlcv, deps, params, indicators: {f"sma_{p}": indicators.sma(p) for p in params["periods"]},
+))
+FEATURE_REGISTRY.register(Feature(
+    "MA_CROSS", inputs=[], depends=["SMA"],
+    params=lambda config: {"periods": ma_cross_periods(config), "sma_periods": config["sma_periods"]},
+    # sma_periods より長い期間は SMA の warmup に含まれないため、その差の分を加える
+    warmup=lambda params: 1 + max(0, max(params["periods"], default=0) - max(params["sma_periods"])),
+    columns=lambda market, params: [c for p1, p2 in _ma_pairs(params["periods"]) for c in (f"ma_cross_up_{p1}_{p2}", f"ma_cross_down_{p1}_{p2}")],
+    compute=_ma_cross,
+))
+FEATURE_REGISTRY.register(Feature(
+    "CANDLE", inputs=["open", "close"], depends=["SMA"],
+    params=lambda config: {"periods": config["sma_periods"]},
+    warmup=lambda params: 0,
+    columns=lambda market, params: ["candle_cross_up_5", "candle_cross_down_5"] if 5 in params["periods"] else [],
+    compute=_candle,
+))
+# ---- (2) ボリンジャーバンド (BOLL) ----
+FEATURE_REGISTRY.register(Feature(
+    "BOLL", inputs=["close"], depends=[],
+    params=lambda config: {"periods": config["bollinger_periods"]},
+    warmup=lambda params: max(params["periods"]) - 1,
+    columns=lambda market, params: [c for p in params["periods"] for c in (f"bollinger_upper{p}", f"bollinger_middle{p}", f"bollinger_lower{p}")],
+    compute=_bbands,
+))
+# ---- (3) ATR (Average True Range) ----
+FEATURE_REGISTRY.register(Feature(
+    "ATR", inputs=["high", "low", "close"], depends=[],
+    params=lambda config: {"periods": config["atr_periods"]},
+    warmup=lambda params: max(params["periods"]),
+    columns=lambda market, params: [f"atr{p}" for p in params["periods"]],
+    compute=lambda market, ohlcv, deps, params, indicators: {
+        f"atr{p}": indicators.atr(p) for p in params["periods"]
+    },
+))
+# ---- (4) RSI (Relative Strength Index) ----
+FEATURE_REGISTRY.register(Feature(
+    "RSI", inputs=["close"], depends=[],
+    params=lambda config: {"period": config["rsi_period"]},
+    warmup=lambda params: params["period"],
+    columns=lambda market, params: ["RSI"],
+    compute=lambda market, ohlcv, deps, params, indicators: {"RSI": indicators.rsi(params["period"])},
+))
+# ---- (5) OBV (On-Balance Volume) ----
+FEATURE_REGISTRY.register(Feature(
+    "OBV", inputs=["close", "volume"], depends=[],
+    params=lambda config: {},
+    warmup=lambda params: 0,
+    columns=lambda market, params: ["OBV"],
+    compute=lambda market, ohlcv, deps, params, indicators: {"OBV": indicators.obv()},
+))
+# ---- (6) MACD ----
+FEATURE_REGISTRY.register(Feature(
+    "MACD", inputs=["close"], depends=[],
+    params=lambda config: {"fast": config["macd_fast"], "slow": config["macd_slow"], "signal": config["macd_signal"]},
+    warmup=lambda params: max(params["fast"], params["slow"]) - 1 + params["signal"] - 1,
+    columns=lambda market, params: ["MACD", "MACD_signal", "MACD_hist"],
+    compute=_macd,
+))
+# ---- (7) ストキャスティクス (Stochastic) ----
+FEATURE_REGISTRY.register(Feature(
+    "STOCH", inputs=["high", "low", "close"], depends=[],
+    params=lambda config: {},
+    warmup=lambda params: 8,  # fastk=5, slowk=3, slowd=3
+    columns=lambda market, params: ["STOCH_k", "STOCH_d"],
+    compute=_stoch,
+))
+FEATURE_REGISTRY.register(Feature(
+    "LAG", inputs=OHLCV, depends=[],
+    params=lambda config: {"lag_days": config["lag_days"]},
+    warmup=lambda params: params["lag_days"],
+    columns=lambda market, params: [f"{v}_{market}_lag{lag}" for lag in range(1, params["lag_days"] + 1) for v in OHLCV],
+    compute=_lag,
+))
@@ -0,0 +1,159 @@
+from importlib.util import find_spec
+import numpy as np
+
+INDICATOR_BACKENDS = ["talib", "numba"]
+
+
+def default_indicator_backend():
+    """ talib がインストールされていれば talib、無ければ numba (talib はネイティブライブラリが必要なため任意) """
+    return "talib" if find_spec("talib") is not None else "numba"
+
+
+class TalibIndicators:
+    """ talib で指標ごと・期間ごとに計算する """
+
+    def __init__(self, ohlcv, feature_config):
+        import talib  # ネイティブライブラリが必要なため、使う場合のみ import
+        self.talib = talib
+        self.ohlcv = ohlcv
+
+    def sma(self, period):
+        return self.talib.SMA(self.ohlcv["close"], timeperiod=period)
+
+    def bbands(self, period):
+        return self.talib.BBANDS(self.ohlcv["close"], timeperiod=period)
+
+    def atr(self, period):
+        return self.talib.ATR(self.ohlcv["high"], self.ohlcv["low"], self.ohlcv["close"], timeperiod=period)
+
+    def rsi(self, period):
+        return self.talib.RSI(self.ohlcv["close"], timeperiod=period)
+
+    def obv(self):
+        return self.talib.OBV(self.ohlcv["close"], self.ohlcv["volume"])
+
+    def macd(self, fast, slow, signal):
+        return self.talib.MACD(self.ohlcv["close"], fastperiod=fast, slowperiod=slow, signalperiod=signal)
+
+    def stoch(self):
+        return self.talib.STOCH(self.ohlcv["high"], self.ohlcv["low"], self.ohlcv["close"])
+
+
+class NumbaIndicators:
+    """
+    numba の融合カーネルで、設定された全期間の指標を2回の走査でまとめて計算する (talib と同じ値)
+    - 最初に使われた時点で close_pass / range_pass を実行し、以降は結果の列を返す
+    - 設定に無い期間・パラメータが要求された場合は、その期間だけカーネルを実行する
+    - talib と同様、先頭の NaN は読み飛ばす
+    """
+
+    def __init__(self, ohlcv, feature_config):
+        from models.features import numba_kernels  # 初回の JIT コンパイルを使う場合のみに限定
+        from models.features.feature_registry import ma_cross_periods
+        self.kernels = numba_kernels
+        self.ohlcv = {v: np.ascontiguousarray(values, dtype=np.float64) for v, values in ohlcv.items()}
+        self.sma_periods = list(dict.fromkeys(feature_config["sma_periods"] + ma_cross_periods(feature_config)))
+        self.bollinger_periods = list(feature_config["bollinger_periods"])
+        self.atr_periods = list(feature_config["atr_periods"])
+        self.rsi_period = feature_config["rsi_period"]
+        self.macd_params = (feature_config["macd_fast"], feature_config["macd_slow"], feature_config["macd_signal"])
+        self.close_results = {}
+        self.range_results = {}
+
+    def _first_valid(self, names):
+        """ 全ての入力が NaN でなくなる最初の行 """
+        valid = np.ones(len(self.ohlcv["close"]), dtype=bool)
+        for name in names:
+            valid &= ~np.isnan(self.ohlcv[name])
+        positions = np.flatnonzero(valid)
+        return positions[0] if positions.size else len(valid)
+
+    def _run_close_pass(self, sma_periods, bollinger_periods, rsi_period, macd_params):
+        periods = list(dict.fromkeys(sma_periods + bollinger_periods))
+        start = self._first_valid(["close", "volume"])
+        close, volume = self.ohlcv["close"][start:], self.ohlcv["volume"][start:]
+        mean, stddev, rsi, obv, macd, macd_signal, macd_hist = self.kernels.close_pass(
+            close, volume, np.array(periods, dtype=np.int64), np.array([p in bollinger_periods for p in periods], dtype=np.bool_),
+            rsi_period, *macd_params, 2.0,
+        )
+        pad = lambda values: self._pad(values, start)
+        return {
+            "mean": {p: pad(mean[:, i]) for i, p in enumerate(periods)},
+            "stddev": {p: pad(stddev[:, i]) for i, p in enumerate(periods) if p in bollinger_periods},
+            "rsi": {rsi_period: pad(rsi)},
+            "obv": pad(obv),
+            "macd": {macd_params: (pad(macd), pad(macd_signal), pad(macd_hist))},
+        }
+
+    def _run_range_pass(self, atr_periods):
+        start = self._first_valid(["high", "low", "close"])
+        high, low, close = (self.ohlcv[v][start:] for v in ["high", "low", "close"])
+        atr, slowk, slowd = self.kernels.range_pass(high, low, close, np.array(atr_periods, dtype=np.int64), 5, 3, 3)
+        return {
+            "atr": {p: self._pad(atr[:, i], start) for i, p in enumerate(atr_periods)},
+            "stoch": (self._pad(slowk, start), self._pad(slowd, start)),
+        }
+
+    def _pad(self, values, start):
+        if start == 0:
+            return values
+        out = np.full(len(self.ohlcv["close"]), np.nan)
+        out[start:] = values
+        return out
+
+    def _close(self):
+        if not self.close_results:
+            self.close_results = self._run_close_pass(self.sma_periods, self.bollinger_periods, self.rsi_period, self.macd_params)
+        return self.close_results
+
+    def _range(self):
+        if not self.range_results:
+            self.range_results = self._run_range_pass(self.atr_periods)
+        return self.range_results
+
+    def sma(self, period):
+        results = self._close()
+        if period not in results["mean"]:
+            results = self._run_close_pass([period], [], self.rsi_period, self.macd_params)
+        return results["mean"][period]
+
+    def bbands(self, period, nbdev=2.0):
+        results = self._close()
+        if period not in results["stddev"]:
+            results = self._run_close_pass([], [period], self.rsi_period, self.macd_params)
+        mean, stddev = results["mean"][period], results["stddev"][period]
+        return mean + nbdev * stddev, mean, mean - nbdev * stddev
+
+    def atr(self, period):
+        results = self._range()
+        if period not in results["atr"]:
+            results = self._run_range_pass([period])
+        return results["atr"][period]
+
+    def rsi(self, period):
+        results = self._close()
+        if period not in results["rsi"]:
+            results = self._run_close_pass([], [], period, self.macd_params)
+        return results["rsi"][period]
+
+    def obv(self):
+        return self._close()["obv"]
+
+    def macd(self, fast, slow, signal):
+        results = self._close()
+        if (fast, slow, signal) not in results["macd"]:
+            results = self._run_close_pass([], [], self.rsi_period, (fast, slow, signal))
+        return results["macd"][(fast, slow, signal)]
+
+    def stoch(self):
+        return self._range()["stoch"]
+
+
+def create_indicators(ohlcv, feature_config):
+    """ FEATURE_CONFIG["indicator_backend"] の指標計算を返す """
+    backend = feature_config.get("indicator_backend") or default_indicator_backend()
+    if backend == "talib":
+        return TalibIndicators(ohlcv, feature_config)
+    if backend == "numba":
+        return NumbaIndicators(ohlcv, feature_config)
+    raise ValueError(f"未対応の indicator_backend です: {backend} ({INDICATOR_BACKENDS})")
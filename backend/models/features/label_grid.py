@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+class LabelGrid:
+    """
+    複数の期間 (horizon) の将来の最大値/最小値を1回で計算し、任意の閾値の売買ラベルを切り出す
+    - 期間を昇順に1本ずつ伸ばしながら max/min を更新し、指定された期間の時点の値を保存する
+      (最大の期間 H に対して O(T × H)。期間ごとに窓を取り直さない)
+    - ラベルは保存した値と閾値の比較だけで作れるため、閾値・期間の組み合わせごとに特徴量を再計算しない
+    """
+
+    def __init__(self, close, horizons, index=None):
+        """
+        :param close: 終値の配列
+        :param horizons: 期間 (何本先までを見るか) のリスト
+        """
+        self.close = np.asarray(close, dtype=np.float64)
+        self.horizons = sorted(set(int(h) for h in horizons))
+        self.index = index if index is not None else pd.RangeIndex(len(self.close))
+        self.positions = {h: i for i, h in enumerate(self.horizons)}
+        self.max_close, self.min_close = self._forward_extremes()
+
+    def _forward_extremes(self):
+        """ 次の足から h 本先までの最大値/最小値 (T × 期間)。h 本先が無い行は NaN """
+        n = len(self.close)
+        max_close = np.full((n, len(self.horizons)), np.nan)
+        min_close = np.full((n, len(self.horizons)), np.nan)
+        if not self.horizons:
+            return max_close, min_close
+        running_max = np.full(n, -np.inf)
+        running_min = np.full(n, np.inf)
+        for h in range(1, self.horizons[-1] + 1):
+            if h >= n:
+                break
+            np.maximum(running_max[:-h], self.close[h:], out=running_max[:-h])
+            np.minimum(running_min[:-h], self.close[h:], out=running_min[:-h])
+            if h in self.positions:
+                i = self.positions[h]
+                max_close[:-h, i] = running_max[:-h]
+                min_close[:-h, i] = running_min[:-h]
+        return max_close, min_close
+
+    def labels(self, buy_term, buy_rate, sell_term, sell_rate):
+        """
+        FeatureDatasetModel._add_return_signals と同じ売買ラベル
+        Returns:
+            (buy_signal, sell_signal, valid): シグナルの int 配列と、将来の価格が揃っている行のマスク
+        """
+        max_close = self.max_close[:, self.positions[buy_term]]
+        min_close = self.min_close[:, self.positions[sell_term]]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            buy_signal = (max_close / self.close > (1+buy_rate)).astype(int)
+            sell_signal = (min_close / self.close < (1-sell_rate)).astype(int)
+        both = (buy_signal == 1) & (sell_signal == 1)
+        buy_signal[both] = 0
+        sell_signal[both] = 0
+
+        valid = ~np.isnan(max_close) & ~np.isnan(min_close)
+        return buy_signal, sell_signal, valid
+
+    def returns(self):
+        """ 将来の最大/最小リターンのテンソル (T × 期間 × [max, min]) """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.stack([self.max_close, self.min_close], axis=2) / self.close[:, np.newaxis, np.newaxis] - 1
+
+    def to_frame(self):
+        """ 縦持ちの表 (index, horizon, max_return, min_return)。将来の価格が揃わない行は除く """
+        returns = self.returns()
+        frame = pd.DataFrame({
+            self.index.name or "index": np.repeat(self.index, len(self.horizons)),
+            "horizon": np.tile(self.horizons, len(self.close)),
+            "max_return": returns[:, :, 0].ravel(),
+            "min_return": returns[:, :, 1].ravel(),
+        })
+        return frame.dropna(subset=["max_return", "min_return"]).reset_index(drop=True)
@@ -0,0 +1,185 @@
+"""
+talib と同じ式・同じ演算順序の指標計算 (numba)
+全期間の指標を時間方向の2回の走査で計算する
+- close_pass: SMA / BBANDS (全期間の累積和), RSI, OBV, MACD
+- range_pass: ATR (全期間), STOCH
+出力は (時間 × 期間) の C order 配列で、各時点の全期間の値が連続する
+"""
+import math
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def close_pass(close, volume, periods, with_stddev, rsi_period, fast, slow, signal, nbdev):
+    """
+    :param periods: SMA / BBANDS の期間 (int64 配列)
+    :param with_stddev: 期間ごとに標準偏差 (BBANDS) を計算するか (bool 配列)
+    Returns:
+        mean, stddev (時間 × 期間), rsi, obv, macd, macd_signal, macd_hist
+    """
+    n = close.shape[0]
+    m = periods.shape[0]
+    mean = np.full((n, m), np.nan)
+    stddev = np.full((n, m), np.nan)
+    rsi = np.full(n, np.nan)
+    obv = np.empty(n)
+    macd = np.full(n, np.nan)
+    macd_signal = np.full(n, np.nan)
+    macd_hist = np.full(n, np.nan)
+
+    total = np.zeros(m)
+    total_sq = np.zeros(m)
+
+    gain = 0.0
+    loss = 0.0
+
+    if fast > slow:
+        fast, slow = slow, fast
+    k_fast = 2.0 / (fast + 1)
+    k_slow = 2.0 / (slow + 1)
+    k_signal = 2.0 / (signal + 1)
+    ema_fast = 0.0
+    ema_slow = 0.0
+    ema_signal = 0.0
+
+    for t in range(n):
+        value = close[t]
+
+        # ---- SMA / BBANDS (加算 → 出力 → 末尾を減算) ----
+        for j in range(m):
+            period = periods[j]
+            total[j] += value
+            if with_stddev[j]:
+                total_sq[j] += value * value
+            if t >= period - 1:
+                average = total[j] / period
+                mean[t, j] = average
+                trailing = close[t - period + 1]
+                total[j] -= trailing
+                if with_stddev[j]:
+                    variance = total_sq[j] / period - average * average
+                    stddev[t, j] = math.sqrt(variance) if variance >= 1e-14 else 0.0
+                    total_sq[j] -= trailing * trailing
+
+        # ---- OBV ----
+        if t == 0:
+            obv[t] = volume[t]
+        elif value > close[t - 1]:
+            obv[t] = obv[t - 1] + volume[t]
+        elif value < close[t - 1]:
+            obv[t] = obv[t - 1] - volume[t]
+        else:
+            obv[t] = obv[t - 1]
+
+        # ---- RSI (最初の rsi_period 本の平均を初期値とし、以降は Wilder の平滑化) ----
+        if t >= 1:
+            diff = value - close[t - 1]
+            if t <= rsi_period:
+                if diff < 0:
+                    loss -= diff
+                else:
+                    gain += diff
+                if t == rsi_period:
+                    gain /= rsi_period
+                    loss /= rsi_period
+            else:
+                gain *= (rsi_period - 1)
+                loss *= (rsi_period - 1)
+                if diff < 0:
+                    loss -= diff
+                else:
+                    gain += diff
+                gain /= rsi_period
+                loss /= rsi_period
+            if t >= rsi_period:
+                avg = gain + loss
+                rsi[t] = 100.0 * (gain / avg) if abs(avg) >= 1e-14 else 0.0
+
+        # ---- MACD (fast/slow は slow-1 本目で同時に初期化、signal はそこから signal 本目で初期化) ----
+        if t < slow - 1:
+            ema_slow += value
+            if t >= slow - fast:
+                ema_fast += value
+            continue
+        if t == slow - 1:
+            ema_fast = (ema_fast + value) / fast
+            ema_slow = (ema_slow + value) / slow
+        else:
+            ema_fast = (value - ema_fast) * k_fast + ema_fast
+            ema_slow = (value - ema_slow) * k_slow + ema_slow
+        line = ema_fast - ema_slow
+        offset = t - (slow - 1)
+        if offset < signal - 1:
+            ema_signal += line
+            continue
+        if offset == signal - 1:
+            ema_signal = (ema_signal + line) / signal
+        else:
+            ema_signal = (line - ema_signal) * k_signal + ema_signal
+        macd[t] = line
+        macd_signal[t] = ema_signal
+        macd_hist[t] = line - ema_signal
+
+    return mean, stddev, rsi, obv, macd, macd_signal, macd_hist
+
+
+@njit(cache=True)
+def range_pass(high, low, close, periods, fastk_period, slowk_period, slowd_period):
+    """
+    :param periods: ATR の期間 (int64 配列)
+    Returns:
+        atr (時間 × 期間), slowk, slowd
+    """
+    n = close.shape[0]
+    m = periods.shape[0]
+    atr = np.full((n, m), np.nan)
+    tr_total = np.zeros(m)
+    slowk = np.full(n, np.nan)
+    slowd = np.full(n, np.nan)
+    fastk = np.full(n, np.nan)
+    slowk_all = np.full(n, np.nan)
+    slowk_total = 0.0
+    slowd_total = 0.0
+    slowk_start = fastk_period - 1
+    slowd_start = slowk_start + slowk_period - 1
+
+    for t in range(n):
+        # ---- ATR (最初の period 本の TR の平均を初期値とし、以降は Wilder の平滑化) ----
+        if t >= 1:
+            prev_close = close[t - 1]
+            true_range = max(high[t] - low[t], abs(prev_close - high[t]), abs(prev_close - low[t]))
+            for j in range(m):
+                period = periods[j]
+                if t < period:
+                    tr_total[j] += true_range
+                elif t == period:
+                    atr[t, j] = (tr_total[j] + true_range) / period
+                else:
+                    atr[t, j] = (atr[t - 1, j] * (period - 1) + true_range) / period
+
+        # ---- STOCH (slowk / slowd は SMA) ----
+        if t < slowk_start:
+            continue
+        highest = high[t]
+        lowest = low[t]
+        for i in range(t - fastk_period + 1, t):
+            highest = max(highest, high[i])
+            lowest = min(lowest, low[i])
+        diff = (highest - lowest) / 100.0
+        fastk[t] = (close[t] - lowest) / diff if diff != 0 else 0.0
+
+        slowk_total += fastk[t]
+        if t < slowd_start:
+            continue
+        slowk_all[t] = slowk_total / slowk_period
+        slowk_total -= fastk[t - slowk_period + 1]
+
+        slowd_total += slowk_all[t]
+        if t < slowd_start + slowd_period - 1:
+            continue
+        slowk[t] = slowk_all[t]
+        slowd[t] = slowd_total / slowd_period
+        slowd_total -= slowk_all[t - slowd_period + 1]
+
+    return atr, slowk, slowd
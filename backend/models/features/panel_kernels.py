@@ -0,0 +1,52 @@
+"""
+(時間 × 銘柄) の2次元配列に対する銘柄間の特徴量
+銘柄ごとの指標は FeatureRegistry (talib / numba の indicator_backends) で計算し、ここでは扱わない
+- 窓の集計は窓の幅だけずらしたスライスの加算で行い、(T × N × 窓) の一時配列を作らない
+"""
+import numpy as np
+
+
+def _full_like(x):
+    return np.full(x.shape, np.nan)
+
+
+def window_reduce(x, period, func=np.add):
+    """ 各時点で直近 period 本を func で集計 (先頭 period-1 本は NaN) """
+    out = _full_like(x)
+    n = x.shape[0] - period + 1
+    if n <= 0:
+        return out
+    acc = x[0:n].copy()
+    for k in range(1, period):
+        func(acc, x[k:k + n], out=acc)
+    out[period - 1:] = acc
+    return out
+
+
+def shift(x, periods):
+    out = _full_like(x)
+    if periods < x.shape[0]:
+        out[periods:] = x[:-periods]
+    return out
+
+
+def relative_strength(close, period):
+    """ period 本前からのリターンと、全銘柄の平均リターンとの差 """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = close / shift(close, period) - 1
+    return returns - returns.mean(axis=1, keepdims=True)
+
+
+def rolling_correlation(close, benchmark, window):
+    """ 対数リターンの、基準銘柄 (benchmark: (T,)) との直近 window 本の相関 """
+    benchmark = benchmark[:, np.newaxis]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = np.log(close / shift(close, 1))
+        b = np.broadcast_to(np.log(benchmark / shift(benchmark, 1)), r.shape)
+    sum_r, sum_b = window_reduce(r, window), window_reduce(b, window)
+    cov = window_reduce(r * b, window) - sum_r * sum_b / window
+    var_r = window_reduce(r * r, window) - sum_r * sum_r / window
+    var_b = window_reduce(b * b, window) - sum_b * sum_b / window
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / np.sqrt(var_r * var_b)
+    return np.clip(corr, -1.0, 1.0)
@@ -0,0 +1,412 @@
+import math
+from collections import deque
+import pandas as pd
+from utils.s3_helper import get_s3_helper
+from models.feature_dataset_model import FEATURE_CONFIG
+from models.features.feature_registry import FEATURE_REGISTRY, ma_cross_periods
+from config.config_manager import get_config_manager
+from config import constants
+
+NAN = float("nan")
+
+
+class _Indicator:
+    """ 1本ずつ更新する指標の基底クラス (状態は JSON に変換できる値のみで保持) """
+
+    def to_state(self):
+        state = {}
+        for name, value in self.__dict__.items():
+            if isinstance(value, deque):
+                value = {"deque": list(value), "maxlen": value.maxlen}
+            elif isinstance(value, _Indicator):
+                value = {"indicator": value.to_state()}
+            state[name] = value
+        return state
+
+    def load_state(self, state):
+        for name, value in state.items():
+            if isinstance(value, dict) and "deque" in value:
+                value = deque(value["deque"], maxlen=value["maxlen"])
+            elif isinstance(value, dict) and "indicator" in value:
+                getattr(self, name).load_state(value["indicator"])
+                continue
+            setattr(self, name, value)
+        return self
+
+
+class _SMA(_Indicator):
+    """ talib.SMA と同じ累積和 (加算 → 出力 → 末尾を減算) で計算 """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+
+    def update(self, value):
+        if math.isnan(value):
+            return NAN
+        self.total += value
+        self.window.append(value)
+        if len(self.window) < self.period:
+            return NAN
+        result = self.total / self.period
+        self.total -= self.window[0]
+        return result
+
+
+class _BBands(_Indicator):
+    """ talib.BBANDS (SMA, nbdev=2): 母分散 = 二乗平均 - 平均の二乗 """
+
+    def __init__(self, period, nbdev=2.0):
+        self.period = period
+        self.nbdev = nbdev
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, value):
+        if math.isnan(value):
+            return NAN, NAN, NAN
+        self.total += value
+        self.total_sq += value * value
+        self.window.append(value)
+        if len(self.window) < self.period:
+            return NAN, NAN, NAN
+        mean = self.total / self.period
+        variance = self.total_sq / self.period - mean * mean
+        stddev = math.sqrt(variance) if variance >= 1e-14 else 0.0
+        trailing = self.window[0]
+        self.total -= trailing
+        self.total_sq -= trailing * trailing
+        return mean + self.nbdev * stddev, mean, mean - self.nbdev * stddev
+
+
+class _ATR(_Indicator):
+    """ talib.ATR: 最初の period 本の TR の平均を初期値とし、以降は Wilder の平滑化 """
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.tr_total = 0.0
+        self.atr = None
+
+    def update(self, true_range):
+        if math.isnan(true_range):
+            return NAN
+        if self.atr is None:
+            self.count += 1
+            self.tr_total += true_range
+            if self.count < self.period:
+                return NAN
+            self.atr = self.tr_total / self.period
+            return self.atr
+        self.atr = (self.atr * (self.period - 1) + true_range) / self.period
+        return self.atr
+
+
+class _RSI(_Indicator):
+    """ talib.RSI: 最初の period 本の上昇/下落幅の平均を初期値とし、以降は Wilder の平滑化 """
+
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = None
+        self.count = 0
+        self.gain = 0.0
+        self.loss = 0.0
+
+    def update(self, close):
+        if self.prev_close is None:
+            self.prev_close = close
+            return NAN
+        diff = close - self.prev_close
+        self.prev_close = close
+        if self.count < self.period:
+            self.count += 1
+            if diff < 0:
+                self.loss -= diff
+            else:
+                self.gain += diff
+            if self.count < self.period:
+                return NAN
+            self.gain /= self.period
+            self.loss /= self.period
+        else:
+            self.gain *= (self.period - 1)
+            self.loss *= (self.period - 1)
+            if diff < 0:
+                self.loss -= diff
+            else:
+                self.gain += diff
+            self.gain /= self.period
+            self.loss /= self.period
+        total = self.gain + self.loss
+        return 100.0 * (self.gain / total) if abs(total) >= 1e-14 else 0.0
+
+
+class _OBV(_Indicator):
+    """ talib.OBV: 初期値は最初の出来高 """
+
+    def __init__(self):
+        self.prev_close = None
+        self.obv = 0.0
+
+    def update(self, close, volume):
+        if self.prev_close is None:
+            self.obv = volume
+        elif close > self.prev_close:
+            self.obv += volume
+        elif close < self.prev_close:
+            self.obv -= volume
+        self.prev_close = close
+        return self.obv
+
+
+class _EMA(_Indicator):
+    """ talib の EMA: 最初の period 本の単純平均を初期値とする """
+
+    def __init__(self, period, seed_offset=0):
+        self.k = 2.0 / (period + 1)
+        self.period = period
+        # 初期値の計算を開始するまでに読み飛ばす本数 (MACD で fast/slow の開始位置を揃えるため)
+        self.seed_offset = seed_offset
+        self.count = 0
+        self.total = 0.0
+        self.ema = None
+
+    def update(self, value):
+        if self.ema is not None:
+            self.ema = (value - self.ema) * self.k + self.ema
+            return self.ema
+        self.count += 1
+        if self.count <= self.seed_offset:
+            return NAN
+        self.total += value
+        if self.count - self.seed_offset < self.period:
+            return NAN
+        self.ema = self.total / self.period
+        return self.ema
+
+
+class _MACD(_Indicator):
+    """
+    talib.MACD: fast/slow の EMA は slow - 1 本目で同時に初期化され、
+    signal はその MACD 値から signal 本目で初期化される (出力はそこから)
+    """
+
+    def __init__(self, fast, slow, signal):
+        fast, slow = min(fast, slow), max(fast, slow)
+        self.fast = _EMA(fast, seed_offset=slow - fast)
+        self.slow = _EMA(slow)
+        self.signal = _EMA(signal)
+
+    def update(self, close):
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        if math.isnan(slow):
+            return NAN, NAN, NAN
+        macd = fast - slow
+        signal = self.signal.update(macd)
+        if math.isnan(signal):
+            return NAN, NAN, NAN
+        return macd, signal, macd - signal
+
+
+class _Stoch(_Indicator):
+    """ talib.STOCH (fastk=5, slowk=3 SMA, slowd=3 SMA) """
+
+    def __init__(self, fastk_period=5, slowk_period=3, slowd_period=3):
+        self.highs = deque(maxlen=fastk_period)
+        self.lows = deque(maxlen=fastk_period)
+        self.slowk = _SMA(slowk_period)
+        self.slowd = _SMA(slowd_period)
+
+    def update(self, high, low, close):
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) < self.highs.maxlen:
+            return NAN, NAN
+        highest = max(self.highs)
+        lowest = min(self.lows)
+        diff = (highest - lowest) / 100.0
+        fastk = (close - lowest) / diff if diff != 0 else 0.0
+        slowk = self.slowk.update(fastk)
+        if math.isnan(slowk):
+            return NAN, NAN
+        slowd = self.slowd.update(slowk)
+        if math.isnan(slowd):
+            return NAN, NAN
+        return slowk, slowd
+
+
+class StreamingIndicatorEngine:
+    """
+    FeatureDatasetModel の説明変数 (X) を1本ずつ O(1) で更新する
+    - 各指標は talib のバッチ計算と同じ式・同じ初期化で計算する
+    - 状態は JSON で S3 に保存し、次回は保存以降の足だけを反映する
+    - update() は全ての特徴量が揃った足から、feature_columns 順の1行を返す
+    """
+
+    def __init__(self, market=None, interval_min=None):
+        self.config_data = get_config_manager().get_config()
+        self.market = market or self.config_data.get("market_symbol")
+        self.interval_min = interval_min or self.config_data.get("training_timeframe")
+        self.s3 = get_s3_helper()
+        self.feature_columns = self._feature_columns()
+        self.reset()
+
+    def reset(self):
+        """ 全ての指標を初期状態に戻す """
+        self.last_timestamp = None
+        self.last_row = None
+        self.bars = deque(maxlen=FEATURE_CONFIG["lag_days"] + 1)
+        self.prev_sma = {}
+        self.indicators = {
+            **{f"sma_{p}": _SMA(p) for p in dict.fromkeys(FEATURE_CONFIG["sma_periods"] + ma_cross_periods(FEATURE_CONFIG))},
+            **{f"bollinger{p}": _BBands(p) for p in FEATURE_CONFIG["bollinger_periods"]},
+            **{f"atr{p}": _ATR(p) for p in FEATURE_CONFIG["atr_periods"]},
+            "RSI": _RSI(FEATURE_CONFIG["rsi_period"]),
+            "OBV": _OBV(),
+            "MACD": _MACD(FEATURE_CONFIG["macd_fast"], FEATURE_CONFIG["macd_slow"], FEATURE_CONFIG["macd_signal"]),
+            "STOCH": _Stoch(),
+        }
+
+    def _feature_columns(self):
+        """ FeatureDatasetModel.create_features の X と同じ列 (use_features の特徴量のみ、登録順) """
+        return FEATURE_REGISTRY.columns(FEATURE_CONFIG["use_features"], self.market, FEATURE_CONFIG)
+
+    def update(self, bar):
+        """
+        1本分の足を反映し、特徴量の1行を返す (全ての特徴量が揃うまでは None)
+        :param bar: timestamp と open_{market}, high_{market}, ... を持つ dict / Series
+        """
+        market = self.market
+        open_, high, low, close, volume = (float(bar[f"{v}_{market}"]) for v in ["open", "high", "low", "close", "volume"])
+        prev_close = self.bars[-1][3] if self.bars else None
+        self.bars.append((open_, high, low, close, volume))
+        self.last_timestamp = str(pd.Timestamp(bar["timestamp"]))
+
+        row = dict(zip([f"{v}_{market}" for v in ["open", "high", "low", "close", "volume"]], self.bars[-1]))
+
+        sma = {}
+        for p in dict.fromkeys(FEATURE_CONFIG["sma_periods"] + ma_cross_periods(FEATURE_CONFIG)):
+            sma[p] = self.indicators[f"sma_{p}"].update(close)
+        row.update({f"sma_{p}": sma[p] for p in FEATURE_CONFIG["sma_periods"]})
+        for p1 in ma_cross_periods(FEATURE_CONFIG):
+            for p2 in ma_cross_periods(FEATURE_CONFIG):
+                if p1 < p2:
+                    prev_1, prev_2 = self.prev_sma.get(str(p1), NAN), self.prev_sma.get(str(p2), NAN)
+                    row[f"ma_cross_up_{p1}_{p2}"] = int(sma[p1] > sma[p2] and prev_1 <= prev_2)
+                    row[f"ma_cross_down_{p1}_{p2}"] = int(sma[p1] < sma[p2] and prev_1 >= prev_2)
+        self.prev_sma = {str(p): v for p, v in sma.items()}
+
+        sma5 = sma.get(5, NAN)
+        row["candle_cross_up_5"] = int(close > open_ and close > sma5 and open_ <= sma5)
+        row["candle_cross_down_5"] = int(close < open_ and close < sma5 and open_ >= sma5)
+
+        for p in FEATURE_CONFIG["bollinger_periods"]:
+            upper, middle, lower = self.indicators[f"bollinger{p}"].update(close)
+            row[f"bollinger_upper{p}"], row[f"bollinger_middle{p}"], row[f"bollinger_lower{p}"] = upper, middle, lower
+
+        true_range = NAN if prev_close is None else max(high - low, abs(prev_close - high), abs(prev_close - low))
+        for p in FEATURE_CONFIG["atr_periods"]:
+            row[f"atr{p}"] = self.indicators[f"atr{p}"].update(true_range)
+
+        row["RSI"] = self.indicators["RSI"].update(close)
+        row["OBV"] = self.indicators["OBV"].update(close, volume)
+        row["MACD"], row["MACD_signal"], row["MACD_hist"] = self.indicators["MACD"].update(close)
+        row["STOCH_k"], row["STOCH_d"] = self.indicators["STOCH"].update(high, low, close)
+
+        lag_days = FEATURE_CONFIG["lag_days"]
+        for lag in range(1, lag_days + 1):
+            lagged = self.bars[-1 - lag] if len(self.bars) > lag else (NAN,) * 5
+            for v, value in zip(["open", "high", "low", "close", "volume"], lagged):
+                row[f"{v}_{market}_lag{lag}"] = value
+
+        values = [row[c] for c in self.feature_columns]
+        if any(isinstance(v, float) and math.isnan(v) for v in values):
+            self.last_row = None
+        else:
+            self.last_row = dict(zip(self.feature_columns, values))
+        return self.last_row
+
+    def peek(self, bar):
+        """ 状態を変更せずに bar を反映した場合の特徴量を返す (確定していない足用) """
+        # S3Helper (boto3 のクライアント) は複製できないため、指標の状態だけを新しいエンジンに写す
+        engine = StreamingIndicatorEngine(self.market, self.interval_min)
+        engine.load_state(self.to_state())
+        return engine.update(bar)
+
+    def update_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """ DataFrame の足を順に反映し、特徴量が揃った足の行を返す (index は df と同じ) """
+        rows, index = [], []
+        for i, bar in zip(df.index, df.to_dict("records")):
+            row = self.update(bar)
+            if row is not None:
+                rows.append(row)
+                index.append(i)
+        return pd.DataFrame(rows, index=index, columns=self.feature_columns)
+
+    def to_state(self):
+        return {
+            "market": self.market,
+            "interval_min": self.interval_min,
+            "feature_columns": self.feature_columns,
+            "last_timestamp": self.last_timestamp,
+            "last_row": self.last_row,
+            "bars": [list(bar) for bar in self.bars],
+            "prev_sma": self.prev_sma,
+            "indicators": {name: indicator.to_state() for name, indicator in self.indicators.items()},
+        }
+
+    def load_state(self, state):
+        if state.get("feature_columns") != self.feature_columns:
+            # FEATURE_CONFIG が変わった場合は状態を使わない (全期間から作り直す)
+            return False
+        self.last_timestamp = state["last_timestamp"]
+        self.last_row = state["last_row"]
+        self.bars = deque([tuple(bar) for bar in state["bars"]], maxlen=self.bars.maxlen)
+        self.prev_sma = state["prev_sma"]
+        for name, indicator_state in state["indicators"].items():
+            self.indicators[name].load_state(indicator_state)
+        return True
+
+    def get_s3_filename(self):
+        return f"{constants.S3_FOLDER_FEATURE}/indicator_state_{self.market}_{self.interval_min}m.json"
+
+    def save(self):
+        self.s3.save_json_to_s3(self.to_state(), self.get_s3_filename())
+
+    def load(self):
+        """ S3 から状態をロード。無い or 使えない場合は False """
+        state = self.s3.load_json_from_s3(self.get_s3_filename())
+        return bool(state) and self.load_state(state)
+
+    def _has_gap(self, df):
+        """ 保存済みの状態の次の足が df に含まれていない (読み込み期間より前の状態) """
+        next_bar = pd.Timestamp(self.last_timestamp) + pd.Timedelta(minutes=self.interval_min)
+        return df.empty or df["timestamp"].iloc[0] > next_bar
+
+    def latest_features(self, df: pd.DataFrame, bar_completed) -> pd.DataFrame:
+        """
+        df (timestamp 昇順の OHLCV) の最新足の特徴量を1行の DataFrame で返す
+        保存済みの状態以降の確定足だけを反映して状態を保存し、未確定の最新足は状態を変更せずに計算する
+        :param bar_completed: timestamp を受け取り、足が確定済みかを返す関数
+        """
+        if not self.load() or self.last_timestamp is None or self._has_gap(df):
+            self.reset()
+            new_bars = df
+        else:
+            new_bars = df[df["timestamp"] > pd.Timestamp(self.last_timestamp)]
+
+        latest, updated = self.last_row, False
+        for bar in new_bars.to_dict("records"):
+            if bar_completed(bar["timestamp"]):
+                latest = self.update(bar)
+                updated = True
+            else:
+                latest = self.peek(bar)
+        if updated:
+            self.save()
+        if latest is None:
+            return pd.DataFrame(columns=self.feature_columns)
+        return pd.DataFrame([latest], index=[df.index[-1]], columns=self.feature_columns)
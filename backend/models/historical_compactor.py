@@ -0,0 +1,102 @@
+import calendar
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from utils.s3_helper import get_s3_helper
+from utils.date_helper import get_first_day_of_month
+from models.crypto_training_dataset import CryptoTrainingDataset
+from models.partition_index import PartitionIndex
+from config.config_manager import get_config_manager
+from config.settings import settings
+from config import constants
+
+class HistoricalCompactor:
+    """
+    日次パーティション (1日1ファイル) を、確定済みの月ごとに1ファイルへ圧縮する
+    historical/BTC_USDT/daily_15m/*.parquet -> historical/BTC_USDT/monthly_15m/BTC_USDT_monthly_15m_2025-02.parquet
+    圧縮した月は manifest.json に記録し、CryptoTrainingDataset はその月を月次ファイルから読む
+    """
+
+    def __init__(self, interval_min=None):
+        self.config_data = get_config_manager().get_config()
+        self.interval_min = interval_min or self.config_data.get("training_timeframe")
+        self.s3 = get_s3_helper()
+        self.max_workers = settings.DATA_FETCH_MAX_WORKERS
+
+    def run(self, markets=None, months=None, delete_daily=False):
+        """
+        学習期間に含まれる確定済みの月 (当月を除く) のうち、未圧縮の月を圧縮する
+        :param markets: 対象マーケット (省略時は教師データのマーケット)
+        :param months: 遡る月数 (省略時は training_period_months + 1)
+        :param delete_daily: 圧縮後に日次ファイルを削除するか
+        """
+        markets = markets or constants.DATASET_MARKETS
+        months = months or self.config_data.get("training_period_months") + 1
+        current_month = get_first_day_of_month(datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0))
+
+        for symbol in markets:
+            manifest = self.load_manifest(symbol)
+            index = PartitionIndex(symbol, self.interval_min).load()
+            for i in range(months, 0, -1):
+                month_start = current_month - relativedelta(months=i)
+                if month_start.strftime("%Y-%m") in manifest["months"]:
+                    continue
+                self.compact_month(symbol, month_start, manifest, delete_daily, index)
+
+    def compact_month(self, symbol, month_start: datetime, manifest=None, delete_daily=False, index=None):
+        """
+        1か月分の日次ファイルを読み込み、timestamp 順に並べて zstd 圧縮の Parquet 1ファイルに保存
+        日次ファイルが欠けている月は圧縮しない (未取得の日は日次側で補完されるため)
+        :return: 圧縮した場合 True
+        """
+        manifest = manifest if manifest is not None else self.load_manifest(symbol)
+        index = index or PartitionIndex(symbol, self.interval_min).load()
+        month = month_start.strftime("%Y-%m")
+        days = calendar.monthrange(month_start.year, month_start.month)[1]
+        dates = [month_start + timedelta(days=d) for d in range(days)]
+        daily_keys = [CryptoTrainingDataset.historical_data_path(symbol, self.interval_min, date) for date in dates]
+
+        # インデックス上で欠けている日がある月は読み込まずにスキップ
+        indexed = sum(index.contains(date) for date in dates)
+        if indexed < days:
+            print(f"Skip compaction {symbol} {month}: {indexed}/{days} daily partitions")
+            return False
+
+        frames = self.s3.load_many_parquet(daily_keys, immutable=True, max_workers=self.max_workers)
+
+        frames = [df for df in frames if not df.empty]
+        if len(frames) < days:
+            print(f"Skip compaction {symbol} {month}: {len(frames)}/{days} daily partitions")
+            return False
+
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates(subset="timestamp", keep="last").sort_values("timestamp", ignore_index=True)
+        monthly_key = CryptoTrainingDataset.monthly_data_path(symbol, self.interval_min, month)
+        self.s3.save_parquet_to_s3(df, monthly_key, compression="zstd")
+
+        manifest["months"][month] = {
+            "key": monthly_key,
+            "rows": len(df),
+            "days": days,
+            "first": df["timestamp"].min().strftime("%Y-%m-%d %H:%M:%S"),
+            "last": df["timestamp"].max().strftime("%Y-%m-%d %H:%M:%S"),
+            "compacted_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.save_manifest(symbol, manifest)
+        print(f"Compacted {symbol} {month}: {days} files -> {monthly_key} ({len(df)} rows)")
+
+        if delete_daily:
+            self.s3.delete_s3_files(daily_keys)
+            index.remove(dates)
+            index.save()
+        return True
+
+    def load_manifest(self, symbol):
+        manifest = self.s3.load_json_from_s3(CryptoTrainingDataset.monthly_manifest_path(symbol, self.interval_min)) or {}
+        manifest.setdefault("symbol", symbol.replace("/", "_"))
+        manifest.setdefault("timeframe", f"{self.interval_min}m")
+        manifest.setdefault("months", {})
+        return manifest
+
+    def save_manifest(self, symbol, manifest):
+        self.s3.save_json_to_s3(manifest, CryptoTrainingDataset.monthly_manifest_path(symbol, self.interval_min))
@@ -1,4 +1,3 @@
-import optuna
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
@@ -32,6 +31,7 @@ class HyperparameterOptimizer:
 
     def optimize(self, n_trials=50):
         """Optuna で最適化を実行"""
+        import optuna  # 最適化を実行する場合のみ import
         study = optuna.create_study(direction="minimize")
         study.optimize(self.objective, n_trials=n_trials)
 
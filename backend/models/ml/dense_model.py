@@ -5,6 +5,7 @@ from tensorflow.keras.models import Sequential, load_model, save_model
 from tensorflow.keras.layers import Dense, Dropout, Input
 from tensorflow.keras.optimizers import Adam
 from .ml_model_base import MLModelBase
+from .keras_buffer import keras_to_bytes, keras_from_bytes, is_keras_archive
 
 
 class DenseModel(MLModelBase):
@@ -62,8 +63,28 @@ class DenseModel(MLModelBase):
         """モデルをロード"""
         self.model = load_model(path)
 
+    def set_thread_limit(self, threads):
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:
+            pass  # TF の初期化後は変更できない (環境変数 TF_NUM_INTRAOP_THREADS で設定済み)
+
+    def _export_bytes(self):
+        return keras_to_bytes(self.model)
+
+    def _import_bytes(self, data):
+        if is_keras_archive(data):
+            # 従来の .keras ファイル
+            super()._import_bytes(data, filename=self._get_legacy_model_filenames()[0])
+        else:
+            self.model = keras_from_bytes(data)
+
     def _get_model_filename(self):
-        return f"{self.model_type}_model.keras"
+        return f"{self.model_type}_model.npz"
+
+    def _get_legacy_model_filenames(self):
+        return [f"{self.model_type}_model.keras"]
 
     def suggest_hyperparams(self, trial):
         """Optuna でのハイパーパラメータ設定"""
@@ -0,0 +1,30 @@
+import zipfile
+from io import BytesIO
+import numpy as np
+from tensorflow.keras.models import model_from_json
+
+
+def keras_to_bytes(model) -> bytes:
+    """ Keras モデルを構成 (JSON) と重みの npz に変換 """
+    buffer = BytesIO()
+    np.savez(
+        buffer,
+        architecture=np.array(model.to_json()),
+        **{f"weight_{i}": w for i, w in enumerate(model.get_weights())},
+    )
+    return buffer.getvalue()
+
+
+def keras_from_bytes(data: bytes):
+    """ keras_to_bytes の npz からモデルを復元 (予測用のため compile はしない) """
+    with np.load(BytesIO(data)) as state:
+        model = model_from_json(str(state["architecture"]))
+        weight_names = sorted((name for name in state.files if name.startswith("weight_")), key=lambda n: int(n.split("_")[1]))
+        model.set_weights([state[name] for name in weight_names])
+    return model
+
+
+def is_keras_archive(data: bytes) -> bool:
+    """ 従来の .keras ファイル (zip に config.json を含む) か """
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        return "config.json" in archive.namelist()
@@ -1,7 +1,10 @@
-from lightgbm import LGBMClassifier
+from lightgbm import LGBMClassifier, Booster
 import pickle
+import numpy as np
 from .ml_model_base import MLModelBase
 
+PICKLE_MAGIC = b"\x80"  # 従来の保存形式 (pickle)
+
 class LgbmClassifierModel(MLModelBase):
     def __init__(self, **params):
         super().__init__()
@@ -62,17 +65,47 @@ class LgbmClassifierModel(MLModelBase):
 #            "min_samples_leaf": trial.suggest_int("min_samples_leaf", 1, 5),
         }
 
+    def set_thread_limit(self, threads):
+        self.model.set_params(n_jobs=threads)
+
     def set_hyperparams(self, params):
         """最適化されたハイパーパラメータを適用"""
         self.model.set_params(**params)
 
     def _export_model(self, path):
-        with open(path, "wb") as f:
-            pickle.dump(self.model, f)
+        self.model.booster_.save_model(path)
 
     def _import_model(self, path):
         with open(path, "rb") as f:
-            self.model = pickle.load(f)
+            self._import_bytes(f.read())
+
+    def _export_bytes(self):
+        """ モデルファイルと同じテキスト形式 (Booster.model_to_string) """
+        return self.model.booster_.model_to_string().encode("utf-8")
+
+    def _import_bytes(self, data):
+        if data.startswith(PICKLE_MAGIC):
+            # 従来の pickle で保存したモデル (同じファイル名)
+            self.model = pickle.loads(data)
+            return
+        self.model = self._classifier_from_booster(Booster(model_str=data.decode("utf-8")))
+
+    def _classifier_from_booster(self, booster):
+        """
+        Booster から学習済みの LGBMClassifier を復元する (predict_proba, SHAP, ONNX の変換にそのまま使える)
+        モデル文字列にはラベルが無いため、クラスは 0, 1, ... とする (buy_signal / sell_signal は 0/1)
+        """
+        from lightgbm.sklearn import _LGBMLabelEncoder
+        model = LGBMClassifier(**self.model.get_params())
+        n_classes = max(booster.num_model_per_iteration(), 2)
+        model._Booster = booster
+        model._le = _LGBMLabelEncoder().fit(np.arange(n_classes))
+        model._classes = model._le.classes_
+        model._n_classes = n_classes
+        model._objective = booster.params.get("objective", model.objective)
+        model._n_features = model._n_features_in = booster.num_feature()
+        model.fitted_ = True
+        return model
 
     def _get_model_filename(self):
         return f"{self.model_type}_model.txt"
@@ -30,6 +30,9 @@ class LightGBMModel(MLModelBase):
             "min_data_in_leaf": trial.suggest_int("min_data_in_leaf", 5, 50),
         }
 
+    def set_thread_limit(self, threads):
+        self.model.set_params(n_jobs=threads)
+
     def set_hyperparams(self, params):
         """最適化されたハイパーパラメータを適用"""
         self.model.set_params(**params)
@@ -42,6 +45,15 @@ class LightGBMModel(MLModelBase):
         self.model._Booster = Booster(model_file=path)
         self.is_booster_loaded = True
 
+    def _export_bytes(self):
+        """ モデルファイルと同じテキスト形式 """
+        return self.model.booster_.model_to_string().encode("utf-8")
+
+    def _import_bytes(self, data):
+        self.model = LGBMRegressor()
+        self.model._Booster = Booster(model_str=data.decode("utf-8"))
+        self.is_booster_loaded = True
+
     def _get_model_filename(self):
         return f"{self.model_type}_model.txt"
 
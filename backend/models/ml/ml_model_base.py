@@ -1,10 +1,10 @@
 import os
-import shap
+import tempfile
 import pandas as pd
+from io import BytesIO
 from abc import ABC, abstractmethod
 from config.settings import settings
 from utils.s3_helper import get_s3_helper
-from config import constants
 
 class MLModelBase(ABC):
     def __init__(self, sequence_model: bool = False):
@@ -37,6 +37,7 @@ class MLModelBase(ABC):
         pass
 
     def _get_shap_feature_importance(self, X_train):
+        import shap  # 重要度の計算時のみ使うため、ここで import
         explainer = shap.Explainer(self.model, X_train)
         shap_values = explainer(X_train)
 
@@ -47,21 +48,71 @@ class MLModelBase(ABC):
     def is_sequence_model(self):
         return self.sequence_model 
 
-    def save_to_s3(self, stage, y_name):
+    def set_thread_limit(self, threads: int):
+        """ 学習に使うスレッド数を制限する (並列学習のジョブごと。既定は何もしない) """
+        pass
+
+    def _export_bytes(self) -> bytes:
+        """ モデルをバイト列に変換 (既定は一時ファイル経由。メモリ上で変換できるモデルは上書きする) """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, self._get_model_filename())
+            self._export_model(path)
+            with open(path, "rb") as f:
+                return f.read()
+
+    def _import_bytes(self, data: bytes, filename=None):
+        """ バイト列からモデルを読み込む (既定は一時ファイル経由) """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, filename or self._get_model_filename())
+            with open(path, "wb") as f:
+                f.write(data)
+            self._import_model(path)
+
+    def save_to_s3(self, model_path, y_name):
         """
-        s3_folder/ml_models/staging/lstm_model.keras
+        s3_folder/ml_models/versions/20250301T120000Z/buy_signal/dense_model.npz
+        :param model_path: ModelRegistry.model_path で解決したプレフィックス
+        ファイルを介さずにメモリ上で変換して保存 (MODEL_COMPRESSION=zstd の場合は圧縮)
         """
-        filename = self._get_model_filename()
-        tmp_key = f"tmp/{filename}"
-        s3_key = f"{constants.S3_FOLDER_MODEL}/{stage}/{y_name}/{filename}"
-        self._export_model(tmp_key)
-        self.s3.upload_to_s3(tmp_key, s3_key, delete_local=True)
-
-    def load_from_s3(self, stage, y_name):
-        filename = self._get_model_filename()
-        tmp_key = f"tmp/{filename}"
-        s3_key = f"{constants.S3_FOLDER_MODEL}/{stage}/{y_name}/{filename}"
-        if self.s3.download_file( s3_key, tmp_key ):
-            self._import_model(tmp_key)
-            os.remove(tmp_key) 
+        data = compress_model_bytes(self._export_bytes())
+        self.s3.save_to_s3(BytesIO(data), self.get_s3_key(model_path, y_name))
+
+    def load_from_s3(self, model_path, y_name):
+        for s3_key in self.get_s3_keys(model_path, y_name):
+            data = self.s3.load_bytes_from_s3(s3_key)
+            if data is not None:
+                self.import_bytes(data)
+                return True
+        return False
+
+    def import_bytes(self, data: bytes):
+        """ S3 から取得したバイト列 (zstd 圧縮の有無は自動判定) からモデルを読み込む """
+        self._import_bytes(decompress_model_bytes(data))
+
+    def get_s3_key(self, model_path, y_name):
+        return f"{model_path}/{y_name}/{self._get_model_filename()}"
+
+    def get_s3_keys(self, model_path, y_name):
+        """ 読み込み時に探すキー (保存形式を変更したモデルは従来のファイル名も探す) """
+        filenames = [self._get_model_filename(), *self._get_legacy_model_filenames()]
+        return [f"{model_path}/{y_name}/{filename}" for filename in filenames]
+
+    def _get_legacy_model_filenames(self):
+        return []
+
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compress_model_bytes(data: bytes) -> bytes:
+    if settings.MODEL_COMPRESSION != "zstd":
+        return data
+    import zstandard  # 圧縮を有効にした場合のみ必要
+    return zstandard.ZstdCompressor(level=settings.MODEL_COMPRESSION_LEVEL).compress(data)
+
 
+def decompress_model_bytes(data: bytes) -> bytes:
+    if not data.startswith(ZSTD_MAGIC):
+        return data
+    import zstandard
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
@@ -26,6 +26,12 @@ class RandomForestModel(MLModelBase):
         with open(path, "rb") as f:
             self.model = pickle.load(f)
 
+    def _export_bytes(self):
+        return pickle.dumps(self.model)
+
+    def _import_bytes(self, data):
+        self.model = pickle.loads(data)
+
     def _get_model_filename(self):
         return f"{self.model_type}_model.pkl"
 
@@ -38,6 +44,9 @@ class RandomForestModel(MLModelBase):
             "min_samples_leaf": trial.suggest_int("min_samples_leaf", 1, 5),
         }
 
+    def set_thread_limit(self, threads):
+        self.model.set_params(n_jobs=threads)
+
     def set_hyperparams(self, params):
         """最適化されたハイパーパラメータを適用"""
         self.model.set_params(**params)
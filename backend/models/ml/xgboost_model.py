@@ -1,5 +1,4 @@
 from xgboost import XGBRegressor
-import optuna
 from .ml_model_base import MLModelBase
 
 class XGBoostModel(MLModelBase):
@@ -20,6 +19,13 @@ class XGBoostModel(MLModelBase):
     def _import_model(self, path):
         self.model.load_model(path)
 
+    def _export_bytes(self):
+        """ モデルファイルと同じ JSON 形式 """
+        return bytes(self.model.get_booster().save_raw(raw_format="json"))
+
+    def _import_bytes(self, data):
+        self.model.load_model(bytearray(data))
+
     def _get_model_filename(self):
         return f"{self.model_type}_model.json"
 
@@ -35,6 +41,9 @@ class XGBoostModel(MLModelBase):
             "subsample": trial.suggest_float("subsample", 0.5, 1.0),
         }
 
+    def set_thread_limit(self, threads):
+        self.model.set_params(n_jobs=threads)
+
     def set_hyperparams(self, params):
         """最適化されたハイパーパラメータを適用"""
         self.model.set_params(**params)
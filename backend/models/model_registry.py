@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+from utils.s3_helper import get_s3_helper
+from config import constants
+
+class ModelRegistry:
+    """
+    バージョンごとのモデルディレクトリと、ステージごとの current ポインタを管理する
+    ml_models/versions/20250301T120000Z/buy_signal/dense_model.npz
+    ml_models/versions/20250301T120000Z/log_z_scaler.pkl
+    ml_models/production/current.json  -> {"version": ..., "previous": ..., "updated_at": ...}
+    昇格/ロールバックはポインタの PUT 1回で切り替わり、ローダーはポインタを1回だけ解決する
+    ポインタの無いステージは従来の ml_models/{stage}/ を参照する
+    """
+
+    def __init__(self):
+        self.s3 = get_s3_helper()
+
+    def create_version(self):
+        """ 新しいバージョン ID (UTC 日時) を発行 """
+        return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    def model_path(self, stage, version=None):
+        """ モデルの保存先プレフィックス (バージョン指定 → ステージのポインタ → 従来のステージフォルダ) """
+        version = version or self.current_version(stage)
+        if version:
+            return self.version_path(version)
+        return f"{constants.S3_FOLDER_MODEL}/{stage}"
+
+    def current_version(self, stage):
+        pointer = self.load_pointer(stage)
+        return pointer.get("version") if pointer else None
+
+    def publish(self, stage, version):
+        """ ステージのポインタを version に切り替え (直前のバージョンを previous に保持) """
+        pointer = {
+            "version": version,
+            "previous": self.current_version(stage),
+            "updated_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.s3.save_json_to_s3(pointer, self.pointer_path(stage))
+        print(f"Published {stage}: {pointer['previous']} -> {version}")
+        return pointer
+
+    def promote(self, src_stage="staging", dst_stage="production"):
+        """ src_stage のバージョンを dst_stage に適用。直前のバージョンはそのまま残りアーカイブとなる """
+        version = self.current_version(src_stage)
+        if version is None:
+            # ポインタ導入前のモデルは一度だけバージョンとして取り込む
+            version = self.create_version()
+            self.s3.copy_s3_folder_recursive(f"{constants.S3_FOLDER_MODEL}/{src_stage}/", f"{self.version_path(version)}/")
+            self.publish(src_stage, version)
+        return self.publish(dst_stage, version)
+
+    def fork_version(self, src_version, exclude=("onnx/",)):
+        """
+        src_version の成果物を複製した新しいバージョンを作成 (一部の成果物だけを更新する場合に使う)
+        ONNX は複製元のモデル・スケーラーから変換したものなので複製せず、昇格時に変換し直す
+        """
+        version = self.create_version()
+        if version == src_version:
+            raise ValueError(f"バージョン {version} は既に存在します")
+        self.s3.copy_s3_folder_recursive(f"{self.version_path(src_version)}/", f"{self.version_path(version)}/", exclude=exclude)
+        return version
+
+    def rollback(self, stage="production"):
+        """ ステージを直前のバージョンに戻す """
+        pointer = self.load_pointer(stage)
+        if not pointer or not pointer.get("previous"):
+            raise ValueError(f"{stage} にロールバック可能なバージョンがありません")
+        return self.publish(stage, pointer["previous"])
+
+    def artifact_version(self, model_path, s3_key):
+        """
+        成果物の内容を識別する値 (ArtifactCache のキー)
+        バージョンのディレクトリは上書きされないためバージョン ID、従来のステージフォルダは ETag
+        """
+        prefix = f"{constants.S3_FOLDER_MODEL}/versions/"
+        if model_path.startswith(prefix):
+            return model_path[len(prefix):]
+        return self.s3.get_etag(s3_key)
+
+    def load_pointer(self, stage):
+        return self.s3.load_json_from_s3(self.pointer_path(stage))
+
+    @staticmethod
+    def version_path(version):
+        return f"{constants.S3_FOLDER_MODEL}/versions/{version}"
+
+    @staticmethod
+    def pointer_path(stage):
+        return f"{constants.S3_FOLDER_MODEL}/{stage}/current.json"
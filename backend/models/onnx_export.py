@@ -0,0 +1,154 @@
+import logging
+from io import BytesIO
+import numpy as np
+from models.ensemble_model import EnsembleModel
+from models.scalers.log_z_scaler_processor import LogZScalerProcessor
+from models.model_registry import ModelRegistry
+from utils.s3_helper import get_s3_helper
+
+ONNX_OPSET = 15
+INPUT_NAME = "input"
+
+
+def lgbm_to_onnx(model, n_features):
+    """ LGBMClassifier → ONNX (出力 probabilities の1列目が買い/売りの確率) """
+    from onnxmltools import convert_lightgbm
+    from onnxmltools.convert.common.data_types import FloatTensorType
+    onnx_model = convert_lightgbm(
+        model, initial_types=[(INPUT_NAME, FloatTensorType([None, n_features]))], zipmap=False, target_opset=ONNX_OPSET,
+    )
+    return onnx_model.SerializeToString(), {"output": "probabilities", "column": 1}
+
+
+# Keras の活性化関数 → ONNX の演算 (linear は何もしない)
+KERAS_ACTIVATIONS = {"relu": "Relu", "sigmoid": "Sigmoid", "tanh": "Tanh", "linear": None}
+# 推論時は入力をそのまま返す層
+KERAS_PASSTHROUGH_LAYERS = ("InputLayer", "Dropout")
+
+
+def keras_to_onnx(model, n_features):
+    """
+    Keras (Dense) → ONNX (出力は sigmoid の1列)
+    tf2onnx は Keras 3 / protobuf 5 に対応しないため、Dense の重みから直接グラフを作る
+    """
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in KERAS_PASSTHROUGH_LAYERS:
+            continue
+        activation = layer.get_config().get("activation") if kind == "Dense" else None
+        if kind != "Dense" or activation not in KERAS_ACTIVATIONS:
+            raise ValueError(f"ONNX に変換できない層があります: {layer.name} ({kind}, activation={activation})")
+        weights = layer.get_weights()
+        bias = weights[1] if len(weights) > 1 else np.zeros(weights[0].shape[1])
+        layers.append((weights[0], bias, activation))
+    return dense_to_onnx(layers, n_features), {"output": "output", "column": 0}
+
+
+def dense_to_onnx(layers, n_features):
+    """ 全結合層 [(kernel, bias, activation)] を順に適用するグラフ (MatMul → Add → 活性化関数) """
+    from onnx import TensorProto, helper, numpy_helper
+    nodes, initializer = [], []
+    hidden = INPUT_NAME
+    for i, (kernel, bias, activation) in enumerate(layers):
+        initializer += [
+            numpy_helper.from_array(np.asarray(kernel, dtype=np.float32), f"kernel{i}"),
+            numpy_helper.from_array(np.asarray(bias, dtype=np.float32), f"bias{i}"),
+        ]
+        output = "output" if i == len(layers) - 1 else f"hidden{i}"
+        op = KERAS_ACTIVATIONS[activation]
+        nodes.append(helper.make_node("MatMul", [hidden, f"kernel{i}"], [f"matmul{i}"]))
+        nodes.append(helper.make_node("Add", [f"matmul{i}", f"bias{i}"], [f"dense{i}" if op else output]))
+        if op:
+            nodes.append(helper.make_node(op, [f"dense{i}"], [output]))
+        hidden = output
+    graph = helper.make_graph(
+        nodes, "dense",
+        [helper.make_tensor_value_info(INPUT_NAME, TensorProto.FLOAT, [None, n_features])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, [None, np.shape(layers[-1][0])[1]])],
+        initializer=initializer,
+    )
+    onnx_model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", ONNX_OPSET)])
+    return onnx_model.SerializeToString()
+
+
+def scaler_to_onnx(mean, scale):
+    """ LogZScalerProcessor.transform と同じ変換 (log(1 + max(x, 0)) → 標準化) のグラフ """
+    from onnx import TensorProto, helper, numpy_helper
+    n_features = len(mean)
+    constants = {
+        "zero": np.zeros(1, dtype=np.float32),
+        "one": np.ones(1, dtype=np.float32),
+        "mean": np.asarray(mean, dtype=np.float32),
+        "scale": np.asarray(scale, dtype=np.float32),
+    }
+    nodes = [
+        helper.make_node("Max", [INPUT_NAME, "zero"], ["clipped"]),
+        helper.make_node("Add", ["clipped", "one"], ["shifted"]),
+        helper.make_node("Log", ["shifted"], ["logged"]),
+        helper.make_node("Sub", ["logged", "mean"], ["centered"]),
+        helper.make_node("Div", ["centered", "scale"], ["scaled"]),
+    ]
+    graph = helper.make_graph(
+        nodes, "log_z_scaler",
+        [helper.make_tensor_value_info(INPUT_NAME, TensorProto.FLOAT, [None, n_features])],
+        [helper.make_tensor_value_info("scaled", TensorProto.FLOAT, [None, n_features])],
+        initializer=[numpy_helper.from_array(value, name) for name, value in constants.items()],
+    )
+    onnx_model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", ONNX_OPSET)])
+    return onnx_model.SerializeToString()
+
+
+# モデルの種類ごとの変換 (ここに無いモデルを含むアンサンブルは変換しない)
+CONVERTERS = {
+    "lgbm_classifier": lambda model: lgbm_to_onnx(model.model, model.model.n_features_in_),
+    "dense": lambda model: keras_to_onnx(model.model, model.model.input_shape[-1]),
+}
+
+
+class OnnxExporter:
+    """
+    バージョンのスケーラーとアンサンブルを ONNX に変換し、同じバージョンのディレクトリに保存する
+    ml_models/versions/20250301T120000Z/onnx/manifest.json
+    ml_models/versions/20250301T120000Z/onnx/log_z_scaler.onnx
+    ml_models/versions/20250301T120000Z/onnx/buy_signal/dense.onnx
+    """
+
+    def __init__(self):
+        self.registry = ModelRegistry()
+        self.s3 = get_s3_helper()
+
+    def export(self, version, targets=("buy_signal", "sell_signal")):
+        onnx_path = self.onnx_path(self.registry.version_path(version))
+        scaler = LogZScalerProcessor(version=version)
+        scaler.load()
+        items = [(scaler_to_onnx(scaler.scaler_X.mean_, scaler.scaler_X.scale_), f"{onnx_path}/log_z_scaler.onnx")]
+        manifest = {
+            "version": version,
+            "n_features": len(scaler.scaler_X.mean_),
+            # inverse_transform 用 (ONNX のグラフは transform のみ)
+            "scaler": {"mean": scaler.scaler_X.mean_.tolist(), "scale": scaler.scaler_X.scale_.tolist()},
+            "targets": {},
+        }
+
+        for y_name in targets:
+            ensemble = EnsembleModel(version=version)
+            ensemble.load_model(y_name)
+            unsupported = [name for name in ensemble.models if name not in CONVERTERS]
+            if unsupported:
+                raise ValueError(f"ONNX に変換できないモデルがあります: {unsupported}")
+            members = {}
+            for name, model in ensemble.models.items():
+                data, output = CONVERTERS[name](model)
+                items.append((data, f"{onnx_path}/{y_name}/{name}.onnx"))
+                members[name] = output
+            manifest["targets"][y_name] = members
+
+        self.s3.save_many([(BytesIO(data), key) for data, key in items])
+        self.s3.save_json_to_s3(manifest, f"{onnx_path}/manifest.json")
+        logging.info(f"ONNX に変換しました: {onnx_path}")
+        return manifest
+
+    @staticmethod
+    def onnx_path(model_path):
+        return f"{model_path}/onnx"
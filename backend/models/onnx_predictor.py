@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from models.artifact_cache import get_artifact_cache
+from models.model_registry import ModelRegistry
+from models.onnx_export import OnnxExporter, INPUT_NAME
+from utils.s3_helper import get_s3_helper
+
+
+def _create_session(data):
+    import onnxruntime  # 推論時は onnxruntime のみを使う (TensorFlow / LightGBM は不要)
+    return onnxruntime.InferenceSession(data, providers=["CPUExecutionProvider"])
+
+
+def _to_input(X):
+    values = X.to_numpy() if isinstance(X, (pd.DataFrame, pd.Series)) else X
+    return np.ascontiguousarray(values, dtype=np.float32)
+
+
+class OnnxEnsemblePredictor:
+    """
+    OnnxExporter で変換したスケーラーとアンサンブルで予測する (onnxruntime のみ)
+    LogZScalerProcessor.transform / inverse_transform と EnsembleModel.load_model / predict と同じ使い方ができる
+    """
+
+    def __init__(self, stage="production", version=None):
+        self.stage = stage
+        self.version = version
+        self.registry = ModelRegistry()
+        self.s3 = get_s3_helper()
+        self.onnx_path = None
+        self.manifest = None
+        self.scaler = None
+        self.members = {}
+
+    @classmethod
+    def from_bytes(cls, members, scaler=None):
+        """
+        S3 を介さずに作成 (テスト用)
+        :param members: { モデル名: (ONNX のバイト列, {"output": 出力名, "column": 列}) }
+        """
+        predictor = cls()
+        predictor.members = {name: (_create_session(data), output) for name, (data, output) in members.items()}
+        predictor.scaler = _create_session(scaler) if scaler is not None else None
+        return predictor
+
+    def get_onnx_path(self):
+        if self.onnx_path is None:
+            self.onnx_path = OnnxExporter.onnx_path(self.registry.model_path(self.stage, self.version))
+        return self.onnx_path
+
+    def load_manifest(self):
+        if self.manifest is None:
+            self.manifest = self.s3.load_json_from_s3(f"{self.get_onnx_path()}/manifest.json")
+            if self.manifest is None:
+                raise FileNotFoundError(f"ONNX のモデルがありません: {self.get_onnx_path()}")
+        return self.manifest
+
+    def _load_session(self, s3_key):
+        """ バージョン (manifest) ごとにプロセス内でセッションを共有する """
+        key = (self.stage, "onnx", s3_key, self.load_manifest()["version"])
+        def load():
+            data = self.s3.load_bytes_from_s3(s3_key)
+            if data is None:
+                raise FileNotFoundError(f"S3に {s3_key} が見つかりません")
+            return _create_session(data)
+        return get_artifact_cache().get_or_load(key, load)
+
+    def load_model(self, y_name):
+        members = self.load_manifest()["targets"][y_name]
+        self.members = {
+            name: (self._load_session(f"{self.get_onnx_path()}/{y_name}/{name}.onnx"), output)
+            for name, output in members.items()
+        }
+
+    def transform(self, X):
+        """ LogZScalerProcessor.transform と同じ変換 """
+        if self.scaler is None:
+            self.scaler = self._load_session(f"{self.get_onnx_path()}/log_z_scaler.onnx")
+        scaled = self.scaler.run(None, {INPUT_NAME: _to_input(X)})[0]
+        if isinstance(X, pd.DataFrame):
+            return pd.DataFrame(scaled, columns=X.columns, index=X.index)
+        return scaled
+
+    def inverse_transform(self, X):
+        """ LogZScalerProcessor.inverse_transform と同じ変換 (manifest の平均・標準偏差を使う) """
+        scaler = self.load_manifest()["scaler"]
+        values = X.to_numpy() if isinstance(X, (pd.DataFrame, pd.Series)) else np.asarray(X)
+        reverted = np.expm1(values * np.asarray(scaler["scale"]) + np.asarray(scaler["mean"]))
+        if isinstance(X, pd.DataFrame):
+            return pd.DataFrame(reverted, columns=X.columns, index=X.index)
+        return reverted
+
+    def predict(self, X_test):
+        """各モデルの予測結果を統合（平均）。EnsembleModel.predict と同じ"""
+        inputs = {INPUT_NAME: _to_input(X_test)}
+        predictions = []
+        for name, (session, output) in self.members.items():
+            result = session.run([output["output"]], inputs)[0]
+            predictions.append(np.asarray(result).reshape(len(inputs[INPUT_NAME]), -1)[:, output["column"]])
+        return np.mean(np.array(predictions), axis=0).tolist()
@@ -0,0 +1,90 @@
+import re
+import numpy as np
+import pandas as pd
+from models.feature_dataset_model import FeatureDatasetModel, FEATURE_CONFIG
+from models.features.feature_matrix_builder import FeatureMatrixBuilder
+from models.features.feature_registry import FEATURE_REGISTRY
+from models.features import panel_kernels as kernels
+from config.config_manager import get_config_manager
+
+PANEL_FEATURE_CONFIG = {
+    "features": ["SMA", "BOLL", "ATR", "RSI", "OBV", "MACD", "STOCH"],  # 銘柄ごとの指標 (FEATURE_REGISTRY の名前)
+    "relative_strength_periods": [5, 20],  # 全銘柄の平均に対する相対リターン
+    "correlation_window": 20,              # 基準銘柄 (market_symbol) とのリターンの相関
+}
+
+class PanelFeatureModel:
+    """
+    複数銘柄の特徴量を作成する
+    - 銘柄ごとの指標は FeatureDatasetModel と同じ FEATURE_REGISTRY / indicator_backend で計算
+    - 銘柄間の特徴量として相対リターン (relative strength) と基準銘柄との相関を (時間 × 銘柄) の配列で一括計算
+    列名は "{指標}_{銘柄}" (例: sma_5_eth_jpy, RSI_btc_usdt)
+    """
+
+    def __init__(self):
+        self.config_data = get_config_manager().get_config()
+        self.feature_columns = []
+
+    def create_features(self, df, symbols=None):
+        """
+        説明変数 X と、market_symbol の目的変数 Y を作成
+        :param symbols: 対象銘柄 (省略時は df の close_* 列から検出)
+        """
+        symbols = symbols or self.detect_symbols(df)
+        market = self.config_data.get("market_symbol")
+        if market not in symbols:
+            # 目的変数は market_symbol の close から作るため、対象銘柄に含まれている必要がある
+            raise ValueError(f"market_symbol {market} が対象銘柄 {symbols} にありません")
+        features = PANEL_FEATURE_CONFIG["features"]
+        cross = self._compute_cross_features(df, symbols)
+
+        self.feature_columns = [
+            f"{column}_{symbol}" for symbol in symbols for column in FEATURE_REGISTRY.columns(features, symbol, FEATURE_CONFIG)
+        ] + [f"{name}_{symbol}" for name in cross for symbol in symbols]
+        builder = FeatureMatrixBuilder(df.index, self.feature_columns, dtype=np.dtype(FEATURE_CONFIG["dtype"]))
+        for symbol in symbols:
+            ohlcv = {v: np.asarray(df[f"{v}_{symbol}"], dtype=np.float64) for v in ["open", "high", "low", "close", "volume"]}
+            FEATURE_REGISTRY.compute(features, symbol, ohlcv, FEATURE_CONFIG, _SymbolColumns(builder, symbol))
+        for name, values in cross.items():
+            for i, symbol in enumerate(symbols):
+                builder[f"{name}_{symbol}"] = values[:, i]
+
+        # 相関は基準銘柄自身の列が常に 1 のため除く
+        corr_self = f"corr{PANEL_FEATURE_CONFIG['correlation_window']}_{market}"
+        buy_signal, sell_signal, target_valid = FeatureDatasetModel()._add_return_signals(
+            np.asarray(df[f"close_{market}"], dtype=np.float64)
+        )
+        valid = builder.valid_rows() & target_valid & df.notna().all(axis=1).to_numpy()
+        rows = builder.to_row_selector(valid)
+
+        X = builder.to_frame(rows).drop(columns=[corr_self], errors="ignore")
+        self.feature_columns = list(X.columns)
+        Y = pd.DataFrame({"buy_signal": buy_signal[rows], "sell_signal": sell_signal[rows]}, index=X.index)
+        return X, Y
+
+    @staticmethod
+    def detect_symbols(df):
+        """ close_{symbol} 列から銘柄を検出 (列の順) """
+        return [m.group(1) for m in (re.fullmatch(r"close_(.+)", str(c)) for c in df.columns) if m]
+
+    def _compute_cross_features(self, df, symbols):
+        close = df[[f"close_{s}" for s in symbols]].to_numpy(dtype=np.float64)
+        blocks = {}
+        for period in PANEL_FEATURE_CONFIG["relative_strength_periods"]:
+            blocks[f"rel_strength{period}"] = kernels.relative_strength(close, period)
+        market = self.config_data.get("market_symbol")
+        if market in symbols:
+            window = PANEL_FEATURE_CONFIG["correlation_window"]
+            blocks[f"corr{window}"] = kernels.rolling_correlation(close, close[:, symbols.index(market)], window)
+        return blocks
+
+
+class _SymbolColumns:
+    """ FEATURE_REGISTRY.compute の列 (sma_5 など) を、builder の "{列}_{銘柄}" に書き込む """
+
+    def __init__(self, builder, symbol):
+        self.builder = builder
+        self.symbol = symbol
+
+    def __setitem__(self, column, values):
+        self.builder[f"{column}_{self.symbol}"] = values
@@ -0,0 +1,113 @@
+import re
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from utils.s3_helper import get_s3_helper
+from config import constants
+
+class PartitionIndex:
+    """
+    symbol/timeframe ごとの日次パーティションの一覧
+    s3_folder/BTC_USDT/daily_15m/_index.json
+    - 初回はプレフィックスを list_objects_v2 (ページネーション) で1回走査して作成
+    - パーティションを保存したら add() で追記し、save() で書き戻す
+    ローダーはこの一覧で読むべき日と取得 (バックフィル) すべき日を決め、存在確認の GET を行わない
+    パイプライン・評価・圧縮ジョブが同時に書き込むため、save() は最新の一覧に自分の追加・削除だけを
+    反映して ETag の条件付き書き込みを行い、競合したら読み直してやり直す
+    """
+    DATE_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})\.parquet$")
+    MAX_RETRIES = 5
+
+    def __init__(self, symbol: str, interval_min: int):
+        self.symbol = symbol.replace("/", "_")
+        self.interval_min = interval_min
+        self.s3 = get_s3_helper()
+        self.dates = set()
+        self.added = set()    # save() していない追加
+        self.removed = set()  # save() していない削除
+        self.lock = threading.Lock()
+
+    @property
+    def dirty(self):
+        return bool(self.added or self.removed)
+
+    def load(self):
+        """ S3 から一覧をロード (無い場合はプレフィックスを走査して作成) """
+        index = self.s3.load_json_from_s3(self.index_path())
+        if index is None:
+            return self.rebuild()
+        self.dates = set(index.get("dates", []))
+        return self
+
+    def rebuild(self):
+        """ list_objects_v2 で日次パーティションを走査して一覧を作り直す """
+        dates = set()
+        for key in self.s3.get_s3_files(self.prefix()):
+            match = self.DATE_PATTERN.search(key)
+            if match:
+                dates.add(match.group(1))
+        self.dates = set()
+        self.add(dates)
+        self.save()
+        return self
+
+    def save(self):
+        """ 変更があった場合のみ、S3 の最新の一覧に追加・削除を反映して書き戻す """
+        with self.lock:
+            if not self.dirty:
+                return
+            added, removed = set(self.added), set(self.removed)
+
+        for attempt in range(self.MAX_RETRIES):
+            current, etag = self.s3.load_json_with_etag(self.index_path())
+            dates = (set(current.get("dates", [])) if current else set()) - removed | added
+            index = {
+                "symbol": self.symbol,
+                "timeframe": f"{self.interval_min}m",
+                "updated_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                "dates": sorted(dates),
+            }
+            if self.s3.save_json_if_match(index, self.index_path(), etag):
+                with self.lock:
+                    # 保存中に add/remove された分は次の save() で反映する
+                    self.added -= added
+                    self.removed -= removed
+                    self.dates = (dates - self.removed) | self.added
+                return
+            print(f"Partition index conflict ({self.index_path()}), retrying {attempt + 1}/{self.MAX_RETRIES}")
+            time.sleep(random.uniform(0.1, 0.5) * (attempt + 1))
+        raise RuntimeError(f"パーティション一覧を保存できません (競合が続いています): {self.index_path()}")
+
+    def contains(self, date) -> bool:
+        return self._to_str(date) in self.dates
+
+    def add(self, dates):
+        with self.lock:
+            for date in dates:
+                date = self._to_str(date)
+                self.removed.discard(date)
+                if date not in self.dates:
+                    self.dates.add(date)
+                    self.added.add(date)
+
+    def remove(self, dates):
+        with self.lock:
+            for date in dates:
+                date = self._to_str(date)
+                self.added.discard(date)
+                self.dates.discard(date)
+                # 読み込んだ後に他の書き込みで追加された日も消すよう、一覧に無くても記録する
+                self.removed.add(date)
+
+    def prefix(self):
+        return f"{constants.S3_FOLDER_HIST}/{self.symbol}/daily_{self.interval_min}m/"
+
+    def index_path(self):
+        return f"{self.prefix()}_index.json"
+
+    @staticmethod
+    def _to_str(date):
+        if isinstance(date, datetime):
+            return date.strftime("%Y-%m-%d")
+        return date
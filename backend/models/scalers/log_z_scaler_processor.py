@@ -1,27 +1,78 @@
+import copy
 import pickle
+from io import BytesIO
 from sklearn.preprocessing import StandardScaler
 import pandas as pd
 import numpy as np
 from config.settings import settings
 from utils.s3_helper import get_s3_helper
-from config import constants
+from models.model_registry import ModelRegistry
+from models.artifact_cache import get_artifact_cache
+from models.scalers.online_standard_scaler import OnlineStandardScaler
 
 class LogZScalerProcessor:
-    def __init__(self, stage="staging"):
-        self.scaler_X = StandardScaler()
+    def __init__(self, stage="staging", version=None, incremental=None):
+        """
+        :param incremental: 逐次更新できるスケーラー (OnlineStandardScaler, npz で保存) を使う
+            省略時は SCALER_INCREMENTAL。読み込み時は保存されている形式を使う
+        """
+        self.incremental = settings.SCALER_INCREMENTAL if incremental is None else incremental
+        self.scaler_X = OnlineStandardScaler() if self.incremental else StandardScaler()
         self.is_fitted = False
         self.stage = stage
+        self.version = version
+        self.model_path = None
+        self.registry = ModelRegistry()
         self.s3 = get_s3_helper()
 
     def fit_transform(self, X):
         X_transformed = self._log_transform(X)
-        X_scaled = self.scaler_X.fit_transform(self._convert_to_numpy(X_transformed))
+        if self.incremental:
+            X_scaled = self.scaler_X.fit_transform(X_transformed, chunk_size=settings.SCALER_CHUNK_SIZE)
+        else:
+            X_scaled = self.scaler_X.fit_transform(self._convert_to_numpy(X_transformed))
 
         self.is_fitted = True
         self.save()
 
         return self._convert_back(X, X_scaled)
 
+    def fit_chunks(self, chunks):
+        """ チャンク (DataFrame など) の iterable から当てはめて保存する (全期間をメモリに載せない) """
+        self.incremental = True
+        self.scaler_X = OnlineStandardScaler().fit_chunks(self._log_transform(X) for X in chunks)
+        self.is_fitted = True
+        self.save()
+
+    def partial_update(self, X, publish=True):
+        """
+        新しい足を統計量に反映し、新しいバージョンに保存する
+        バージョンのディレクトリは上書きしないため、元のバージョンを ModelRegistry.fork_version で複製して
+        スケーラーだけを差し替える (ONNX は複製せず、昇格時に変換し直す)
+        :param publish: stage のポインタを新しいバージョンに切り替える (production は昇格でのみ切り替える)
+        :return: 新しいバージョン
+        """
+        if publish and self.stage == "production":
+            raise ValueError("production のスケーラーは直接更新できません (staging を更新して昇格してください)")
+        source = self.version or self.registry.current_version(self.stage)
+        if source is None:
+            raise ValueError(f"{self.stage} にバージョンがありません (従来のステージフォルダは更新できません)")
+        self.version, self.model_path = source, None
+        if not self.is_fitted:
+            self.load()
+
+        # キャッシュで共有しているインスタンスは書き換えない
+        scaler = copy.deepcopy(self.scaler_X)
+        scaler.partial_fit(self._log_transform(X))
+
+        # 元の形式のスケーラーが残ると読み込み時に選ばれることがあるため、スケーラーも複製しない
+        self.version, self.model_path = self.registry.fork_version(source, exclude=("onnx/", "log_z_scaler.")), None
+        self.scaler_X = scaler
+        self.save()
+        if publish:
+            self.registry.publish(self.stage, self.version)
+        return self.version
+
     def transform(self, X):
         if not self.is_fitted:
             self.load()
@@ -40,16 +91,49 @@ class LogZScalerProcessor:
 
         return self._convert_back(X, X_reverted)
 
-    def get_s3_filename(self):
-        return f"{constants.S3_FOLDER_MODEL}/{self.stage}/log_z_scaler.pkl"
+    def get_s3_filename(self, incremental=None):
+        if self.model_path is None:
+            self.model_path = self.registry.model_path(self.stage, self.version)
+        incremental = self.incremental if incremental is None else incremental
+        return f"{self.model_path}/log_z_scaler.npz" if incremental else f"{self.model_path}/log_z_scaler.pkl"
 
     def save(self):
-        self.s3.save_pkl_to_s3(self.scaler_X, self.get_s3_filename())
+        if self.version is None:
+            # 公開中のバージョンを上書きしないよう、新しいバージョンに保存する
+            self.version = self.registry.create_version()
+            self.model_path = None
+        if isinstance(self.scaler_X, OnlineStandardScaler):
+            self.s3.save_to_s3(BytesIO(self.scaler_X.to_bytes()), self.get_s3_filename(incremental=True))
+        else:
+            self.s3.save_pkl_to_s3(self.scaler_X, self.get_s3_filename(incremental=False))
 
     def load(self):
-        self.scaler_X = self.s3.load_pkl_from_s3(self.get_s3_filename())
+        """
+        保存されているスケーラーを読み込む (プロセス内のキャッシュ ArtifactCache を共有)
+        キャッシュのキーはバージョン (従来のステージフォルダは ETag)
+        """
+        cache = get_artifact_cache()
+        # 設定の形式を先に探し、無ければもう一方の形式を読む (学習時と設定が異なる場合)
+        for incremental in [self.incremental, not self.incremental]:
+            s3_key = self.get_s3_filename(incremental=incremental)
+            version = self.registry.artifact_version(self.model_path, s3_key)
+            if version is None:
+                continue
+            key = (self.stage, "scaler", s3_key, version)
+            scaler = cache.get_or_load(key, lambda: self._load_scaler(s3_key, incremental))
+            if scaler is not None:
+                self.scaler_X = scaler
+                break
+        self.incremental = isinstance(self.scaler_X, OnlineStandardScaler)
         self.is_fitted = True
 
+    def _load_scaler(self, s3_key, incremental):
+        if incremental:
+            data = self.s3.load_bytes_from_s3(s3_key)
+            return OnlineStandardScaler.from_bytes(data) if data is not None else None
+        scaler = self.s3.load_pkl_from_s3(s3_key)
+        return None if isinstance(scaler, pd.DataFrame) else scaler  # 無い場合は空の DataFrame
+
     def _log_transform(self, data):
         """ log(1 + x) 変換を適用（負の値の処理を考慮） """
         return np.log1p(np.maximum(self._convert_to_numpy(data), 0))
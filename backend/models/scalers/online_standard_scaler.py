@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+
+class OnlineStandardScaler:
+    """
+    平均・分散を逐次更新する標準化 (StandardScaler と同じ変換)
+    - partial_fit: 新しいデータのまとまりの統計量を、Chan の式で既存の統計量に統合する
+    - merge: 別々に計算した統計量を統合する (チャンクごとの並列計算に使用)
+    - 状態は件数・平均・偏差平方和 (M2) だけで、npz として保存する
+    """
+
+    def __init__(self):
+        self.n_samples_seen_ = 0
+        self.mean_ = None
+        self.m2_ = None
+
+    @property
+    def var_(self):
+        return self.m2_ / self.n_samples_seen_
+
+    @property
+    def scale_(self):
+        # StandardScaler と同様、分散が 0 の列は 1 で割る
+        scale = np.sqrt(self.var_)
+        scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+        return scale
+
+    @classmethod
+    def from_stats(cls, n, mean, m2):
+        scaler = cls()
+        scaler.n_samples_seen_ = int(n)
+        scaler.mean_ = np.asarray(mean, dtype=np.float64)
+        scaler.m2_ = np.asarray(m2, dtype=np.float64)
+        return scaler
+
+    @classmethod
+    def from_array(cls, X):
+        """ 1つのまとまりの統計量 """
+        X = np.asarray(X, dtype=np.float64)
+        mean = X.mean(axis=0)
+        return cls.from_stats(len(X), mean, ((X - mean) ** 2).sum(axis=0))
+
+    def merge(self, other):
+        """ 統計量を統合する (Chan et al. の並列アルゴリズム) """
+        if other.n_samples_seen_ == 0:
+            return self
+        if self.n_samples_seen_ == 0:
+            self.n_samples_seen_, self.mean_, self.m2_ = other.n_samples_seen_, other.mean_.copy(), other.m2_.copy()
+            return self
+        n_a, n_b = self.n_samples_seen_, other.n_samples_seen_
+        n = n_a + n_b
+        delta = other.mean_ - self.mean_
+        self.mean_ = self.mean_ + delta * (n_b / n)
+        self.m2_ = self.m2_ + other.m2_ + delta ** 2 * (n_a * n_b / n)
+        self.n_samples_seen_ = n
+        return self
+
+    def partial_fit(self, X):
+        if len(X):
+            self.merge(self.from_array(X))
+        return self
+
+    def fit(self, X, chunk_size=None, max_workers=None):
+        """
+        全体を当てはめ直す
+        :param chunk_size: 指定した場合、チャンクごとの統計量を並列に計算して統合する
+        """
+        self.__init__()
+        X = np.asarray(X, dtype=np.float64)
+        if not chunk_size or len(X) <= chunk_size:
+            return self.partial_fit(X)
+        chunks = [X[i:i + chunk_size] for i in range(0, len(X), chunk_size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for stats in executor.map(self.from_array, chunks):
+                self.merge(stats)
+        return self
+
+    def fit_chunks(self, chunks):
+        """ チャンクの iterable から当てはめる (全体をメモリに載せない) """
+        self.__init__()
+        for X in chunks:
+            self.partial_fit(X)
+        return self
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+    def fit_transform(self, X, chunk_size=None, max_workers=None):
+        return self.fit(X, chunk_size, max_workers).transform(X)
+
+    def inverse_transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.mean_
+
+    def to_bytes(self):
+        buffer = BytesIO()
+        np.savez(buffer, n_samples_seen=self.n_samples_seen_, mean=self.mean_, m2=self.m2_)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(BytesIO(data)) as state:
+            return cls.from_stats(state["n_samples_seen"], state["mean"], state["m2"])
@@ -22,3 +22,12 @@ def promote_model():
         return {"message": "新しいモデルが本番環境に適用されました"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/rollback_model")
+def rollback_model():
+    """本番環境のモデルを直前のバージョンに戻す"""
+    try:
+        MlEvaluteService().rollback_model()
+        return {"message": "本番環境のモデルを直前のバージョンに戻しました"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -5,8 +5,11 @@ import json
 from datetime import datetime, timedelta, timezone
 from models.crypto_training_dataset import CryptoTrainingDataset
 from models.feature_dataset_model import FeatureDatasetModel
+from models.features.streaming_indicator_engine import StreamingIndicatorEngine
 from models.scalers.log_z_scaler_processor import LogZScalerProcessor
 from models.ensemble_model import EnsembleModel
+from models.onnx_predictor import OnnxEnsemblePredictor
+from models.model_registry import ModelRegistry
 from models.exchanges.coincheck_api import CoinCheckAPI
 from config.config_manager import get_config_manager
 from config.settings import settings
@@ -24,8 +27,10 @@ class AutoTradeService:
     def run(self):
         self.crypto_data = CryptoTrainingDataset()
         self.feature_model = FeatureDatasetModel()
-        self.scaler = LogZScalerProcessor(stage="production")
-        self.ensemble_model = EnsembleModel(stage="production")
+        # 昇格中でもスケーラーとモデルが同じバージョンになるよう、ポインタは1回だけ解決する
+        version = ModelRegistry().current_version("production")
+        self.ensemble_model = self._create_ensemble_model(version)
+        self.scaler = self._create_scaler(version)
         self.coincheck = CoinCheckAPI()
 
         predict = self._predict()
@@ -37,11 +42,25 @@ class AutoTradeService:
         self._notify_slack(result)
         self._save_trade(result)
 
+    def _create_ensemble_model(self, version):
+        if settings.INFERENCE_BACKEND == "onnx":
+            # 昇格時に変換した ONNX を onnxruntime で推論 (TensorFlow / LightGBM を読み込まない)
+            return OnnxEnsemblePredictor(stage="production", version=version)
+        return EnsembleModel(stage="production", version=version)
+
+    def _create_scaler(self, version):
+        if settings.INFERENCE_BACKEND == "onnx":
+            # 同じバージョンの ONNX に変換したスケーラーを使う
+            return self.ensemble_model
+        return LogZScalerProcessor(stage="production", version=version)
+
     def _predict(self):
-        raw_data = self.crypto_data.get_data()
+        # 学習期間全体ではなく、特徴量の計算に必要な直近の足だけを読み込む
+        raw_data = self.crypto_data.get_inference_data(self.feature_model.required_lookback())
 #        feature_data = self.feature_model.create_features(raw_data)
 #        X, _ = self.feature_model.select_features(feature_data)
-        X, _  = self.feature_model.create_features(raw_data)
+        # 全期間の特徴量は作らず、保存済みの指標の状態に新しい足だけを反映して最新の1行を得る
+        X = StreamingIndicatorEngine(self.market, self.crypto_data.interval_min).latest_features(raw_data, self._is_bar_completed)
         X, _ = self.scaler.transform(X)
 
         self.ensemble_model.load_model('buy_signal')
@@ -64,6 +83,11 @@ class AutoTradeService:
         }
         return result
 
+    def _is_bar_completed(self, timestamp):
+        """ 足が確定済みか (timestamp は足の開始時刻, naive UTC) """
+        bar_end = pd.Timestamp(timestamp) + timedelta(minutes=self.crypto_data.interval_min)
+        return bar_end <= pd.Timestamp(datetime.now(timezone.utc)).tz_localize(None)
+
     def _determine_trade_action(self, predict):
         predicted_price = predict["predicted_price"]
         execution_price = predict["execution_price"]
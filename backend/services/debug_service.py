@@ -9,16 +9,11 @@ from models.crypto_training_dataset import CryptoTrainingDataset
 from models.feature_dataset_model import FeatureDatasetModel
 from models.scalers.log_z_scaler_processor import LogZScalerProcessor
 from models.ensemble_model import EnsembleModel
-from models.ml.lgbm_classifier_model import LgbmClassifierModel
-from models.ml.lstm_model import LSTMModel
 from models.evaluator import Evaluator
 from config.config_manager import get_config_manager
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from utils.s3_helper import get_s3_helper
-from tensorflow.keras.models import Sequential, load_model, save_model
-from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
-from tensorflow.keras.optimizers import Adam
 from utils.data_processing import generate_sequences
 from config import constants
 
@@ -1,7 +1,6 @@
 import numpy as np
 import pandas as pd
 from fastapi.encoders import jsonable_encoder
-from scipy.signal import find_peaks
 from datetime import datetime, timedelta
 from models.feature_dataset_model import FeatureDatasetModel
 from models.crypto_training_dataset import CryptoTrainingDataset
@@ -28,9 +27,7 @@ class EdaService:
         }
 
         # ohlcv chart
-        for symbol in ['VITE/USDT', 'BTC/USDT']:
-            data = self.fetcher.fetch_ohlcv(symbol, "1d", 60, 30)
-            result[symbol] = data
+        result.update(self.fetcher.fetch_ohlcv_many(['VITE/USDT', 'BTC/USDT'], "1d", 60, 30))
 
         return result
 
@@ -174,6 +171,7 @@ class EdaService:
         df['is_high_volume'] = (df['volume'] > threshold) & (cv > cv_threshold)
 
     def _detect_peak_points(self, df):
+        from scipy.signal import find_peaks  # scipy.signal は import が重いため、使う時に読み込む
         # 高値（ピーク）と安値（トラフ）の検出
         tolerance = 0.01 # 2%の許容範囲 
 
@@ -8,7 +8,10 @@ from models.crypto_training_dataset import CryptoTrainingDataset
 from models.feature_dataset_model import FeatureDatasetModel
 from models.scalers.log_z_scaler_processor import LogZScalerProcessor
 from models.ensemble_model import EnsembleModel
+from models.model_registry import ModelRegistry
+from models.onnx_export import OnnxExporter
 from config.config_manager import get_config_manager
+from config.settings import settings
 from utils.s3_helper import get_s3_helper
 from config import constants
 
@@ -32,16 +35,21 @@ class MlEvaluteService:
 #            X, _ = self.feature_model.select_features(feature_data)
             X, y  = self.feature_model.create_features(raw_data)
 
+            # 各ステージのバージョンは最初に1回だけ解決する
+            registry = ModelRegistry()
+            version_stg = registry.current_version("staging")
+            version_prd = registry.current_version("production")
+
             # 予測結果(Staging)
-            scaler_stg = LogZScalerProcessor()
-            y_pred_buy_stg = self._predict(scaler_stg, EnsembleModel(), X, "buy_signal")
-            y_pred_sell_stg = self._predict(scaler_stg, EnsembleModel(), X, "sell_signal")
+            scaler_stg = LogZScalerProcessor(version=version_stg)
+            y_pred_buy_stg = self._predict(scaler_stg, EnsembleModel(version=version_stg), X, "buy_signal")
+            y_pred_sell_stg = self._predict(scaler_stg, EnsembleModel(version=version_stg), X, "sell_signal")
 
             # 予測結果(Production)        
             try:
-                scaler_prd = LogZScalerProcessor(stage="production")
-                y_pred_buy_prd = self._predict(scaler_prd, EnsembleModel(stage="production"), X, "buy_signal")
-                y_pred_sell_prd = self._predict(scaler_prd, EnsembleModel(stage="production"), X, "sell_signal")
+                scaler_prd = LogZScalerProcessor(stage="production", version=version_prd)
+                y_pred_buy_prd = self._predict(scaler_prd, EnsembleModel(stage="production", version=version_prd), X, "buy_signal")
+                y_pred_sell_prd = self._predict(scaler_prd, EnsembleModel(stage="production", version=version_prd), X, "sell_signal")
             except Exception as e:
                 y_pred_buy_prd = y_pred_buy_stg
                 y_pred_sell_prd = y_pred_sell_stg
@@ -69,20 +77,48 @@ class MlEvaluteService:
             raise e
 
     def promote_model(self):
-        """新しいモデルを本番環境に適用"""
+        """新しいモデルを本番環境に適用 (production のポインタを staging のバージョンに切り替え)"""
         try:
-            s3 = get_s3_helper()
+            registry = ModelRegistry()
+            if settings.INFERENCE_BACKEND == "onnx":
+                # 本番の推論は ONNX を読むため、変換できたバージョンだけを本番に切り替える
+                version = registry.current_version("staging")
+                self._export_onnx(version, required=True)
+                registry.publish("production", version)
+                return True
+            if settings.ONNX_EXPORT_ON_PROMOTE:
+                # 本番に切り替わる前に、同じバージョンの ONNX を用意しておく
+                self._export_onnx(registry.current_version("staging"))
+            registry.promote("staging", "production")
+            return True
+        except Exception as e:
+            print(f"Model promotion failed: {e}")
+            raise e
 
-            fld_stg = f"{constants.S3_FOLDER_MODEL}/staging"
-            fld_prd = f"{constants.S3_FOLDER_MODEL}/production"
-            arc_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            fld_arc = f"{constants.S3_FOLDER_MODEL}/archived/{arc_date}"
+    def _export_onnx(self, version, required=False):
+        """
+        ONNX に変換する
+        required=False (INFERENCE_BACKEND=native) では失敗しても昇格は続ける。True では例外を投げて昇格を中止する
+        """
+        if version is None:
+            if required:
+                raise ValueError("staging にバージョンが無いため ONNX に変換できません")
+            print("Warning: ONNX export skipped (staging has no version)")
+            return
+        try:
+            OnnxExporter().export(version)
+        except Exception as e:
+            if required:
+                raise
+            print(f"Warning: ONNX export failed: {e}")
 
-            s3.copy_s3_folder_recursive(fld_prd, fld_arc)
-            s3.copy_s3_folder_recursive(fld_stg, fld_prd)
+    def rollback_model(self):
+        """本番環境のモデルを直前のバージョンに戻す"""
+        try:
+            ModelRegistry().rollback("production")
             return True
         except Exception as e:
-            print(f"Model promotion failed: {e}")
+            print(f"Model rollback failed: {e}")
             raise e
         
     def _predict(self, scaler, ensemble_model, X, type):
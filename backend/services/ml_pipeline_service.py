@@ -4,16 +4,16 @@ from models.crypto_training_dataset import CryptoTrainingDataset
 from models.feature_dataset_model import FeatureDatasetModel
 from models.scalers.log_z_scaler_processor import LogZScalerProcessor
 from models.ensemble_model import EnsembleModel
+from models.ensemble_trainer import ParallelEnsembleTrainer
 from models.evaluator import Evaluator
+from models.model_registry import ModelRegistry
 from sklearn.metrics import accuracy_score, roc_auc_score, confusion_matrix
 from sklearn.model_selection import train_test_split
-from config.config_manager import get_config_manager
 
 class MlPipelineService:
 
     def __init__(self):
         self.training_status = {"progress": 0, "status": "Not started", "result": None}
-        self.config_data = get_config_manager().get_config()
 
     def run_pipeline(self):
         """データ取得 → 特徴量作成 → 学習 → 評価 のパイプライン"""
@@ -21,7 +21,10 @@ class MlPipelineService:
             self.crypto_data = CryptoTrainingDataset()
             self.feature_model = FeatureDatasetModel()
             self.evaluator = Evaluator()
-            self.scaler = LogZScalerProcessor()
+            # スケーラーと全ターゲットのモデルを1つのバージョンに保存し、最後に staging のポインタを切り替える
+            registry = ModelRegistry()
+            version = registry.create_version()
+            self.scaler = LogZScalerProcessor(version=version)
             result = []
 
             # step 1: 市場のトレーニングデータ取得/集計
@@ -35,21 +38,23 @@ class MlPipelineService:
             X, Y_vals = self.feature_model.create_features(raw_data)
             X = self.scaler.fit_transform(X)
             num_targets = len(Y_vals.columns)
-            
-            for i, y_name in enumerate(Y_vals.columns):
-                y = Y_vals[[y_name]]#.rename(columns={y_name: 'target'})
 
-                # step 3: アンサンブル学習 + 自動チューニング（ハイパーパラメータ最適化 Optuna）
+            # step 3: アンサンブル学習 (全ターゲット × 全モデルをプロセスプールで並列に学習し、最後にまとめて保存)
+            targets, test_sets = {}, {}
+            for y_name in Y_vals.columns:
+                y = Y_vals[[y_name]]#.rename(columns={y_name: 'target'})
                 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=0, shuffle=True)
+                targets[y_name] = (EnsembleModel(version=version), X_train, y_train.values.ravel())
+                test_sets[y_name] = (X_test, y_test.values.ravel())
+            self.training_status = {"progress": 30, "status": f"Training ensemble models for {', '.join(targets)}...", "result": None}
+            ParallelEnsembleTrainer().train(targets, on_progress=self._on_training_progress)
 
-                y_train = y_train.values.ravel()
-                y_test  = y_test.values.ravel()
-                self.training_status = {"progress": 20+20//num_targets*(i*4+2), "status": f"Training ensemble model for {y_name}...", "result": None}
-                self.ensemble_model = EnsembleModel()
-                self.ensemble_model.train(X_train, y_train, y_name)
+            for i, y_name in enumerate(Y_vals.columns):
+                self.ensemble_model = targets[y_name][0]
+                X_test, y_test = test_sets[y_name]
 
                 # step 4: モデルの評価
-                self.training_status = {"progress": 20+20//num_targets*(i*4+3), "status": f"Evaluating model for {y_name}...", "result": None}
+                self.training_status = {"progress": 70+25*i//num_targets, "status": f"Evaluating model for {y_name}...", "result": None}
                 y_pred = self.ensemble_model.predict(X_test)
                 y_pred_soft = (np.array(y_pred) > 0.5).astype(int)
                 importance = self.ensemble_model.get_feature_importance(X_test)
@@ -67,6 +72,7 @@ class MlPipelineService:
     #            for metric, value in eval_results.items():
     #                print(f"{metric}: {value:.4f}")
 
+            registry.publish("staging", version)
             self.training_status = {"progress": 100, "status": f"Completed", "result": result}
 
         except Exception as e:
@@ -74,3 +80,9 @@ class MlPipelineService:
             self.training_status = {"progress": 100, "status": "Failed", "result": str(e), }
             raise e
 
+    def _on_training_progress(self, done, total, y_name, name):
+        """学習の進捗 (30% 〜 70%) をジョブの完了ごとに反映"""
+        model = f"{name} for {y_name}" if name else y_name
+        print(f"Trained {model} ({done}/{total})")
+        self.training_status = {"progress": 30+40*done//total, "status": f"Trained {model} ({done}/{total})...", "result": None}
+
@@ -19,7 +19,7 @@ class TradeHistoryService:
         # 取引履歴を取得
         market = self.config_data.get("market_symbol")
         prefix = f"{constants.S3_FOLDER_TRADE}/{market}_"
-        trade_df = pd.DataFrame(list(map(lambda x: self.s3.load_json_from_s3(x), self.s3.get_s3_files(prefix))))
+        trade_df = pd.DataFrame(self.s3.load_many_json(self.s3.get_s3_files(prefix)))
         trade_df["timestamp"] = pd.to_datetime(trade_df["execution_date"]).dt.floor("D")
         #aggregations = {
         #    "execution_price": "sum",
@@ -33,7 +33,7 @@ class TradeHistoryService:
         dataset.start_date = datetime.now(timezone.utc) - timedelta(days=60)
         dataset.end_date = datetime.now(timezone.utc)
         dataset.interval_min = 60 * 24
-        ohlcv_df = dataset.get_data()
+        ohlcv_df = dataset.load_columns([f"close_{market}"])
 
         # 出力データ加工
         merged_df = ohlcv_df.merge(trade_df, on="timestamp", how="left")
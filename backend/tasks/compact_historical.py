@@ -0,0 +1,4 @@
+import os
+from models.historical_compactor import HistoricalCompactor
+
+HistoricalCompactor().run(delete_daily=os.getenv("COMPACT_DELETE_DAILY", "false").lower() == "true")
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import config.config_manager as config_manager
+from config.config_manager import DEFAULT_CONFIG
+
+
+@pytest.fixture
+def default_config(monkeypatch):
+    """ S3 の設定を読まず、DEFAULT_CONFIG の ConfigManager を使う """
+    monkeypatch.setattr(config_manager.ConfigManager, "load_config", lambda self: setattr(self, "config_data", dict(DEFAULT_CONFIG)))
+    config_manager.get_config_manager.cache_clear()
+    yield DEFAULT_CONFIG
+    config_manager.get_config_manager.cache_clear()
+
+
+def make_market_bars(n=400, market="btc_jpy", interval_min=1440, seed=0):
+    """ timestamp と open_{market}, high_{market}, ... の足 """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.005, n))
+    bars = {
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n)),
+        "low": np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n)),
+        "close": close,
+        "volume": rng.uniform(1, 100, n),
+    }
+    df = pd.DataFrame({f"{name}_{market}": values for name, values in bars.items()})
+    df.insert(0, "timestamp", pd.date_range("2024-01-01", periods=n, freq=f"{interval_min}min"))
+    return df
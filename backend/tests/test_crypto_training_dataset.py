@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+import models.crypto_training_dataset as crypto_training_dataset
+import models.partition_index as partition_index
+from utils.s3_helper import S3Helper
+from models.crypto_training_dataset import CryptoTrainingDataset
+from models.partition_index import PartitionIndex
+
+SYMBOL = "BTC/JPY"
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.reads = {}  # key -> filters
+
+    def load_json_from_s3(self, key):
+        return self.objects.get(key)
+
+    def load_many_parquet(self, keys, immutable=False, max_workers=None, columns=None, filters=None):
+        frames = []
+        for key in keys:
+            self.reads[key] = filters
+            df = self.objects.get(key, pd.DataFrame())
+            for column, op, value in filters or []:
+                df = df[df[column] >= value] if op == ">=" else df[df[column] < value]
+            frames.append(df.reset_index(drop=True))
+        return frames
+
+    timestamp_filters = staticmethod(S3Helper.timestamp_filters)
+
+
+@pytest.fixture
+def dataset(monkeypatch, default_config):
+    s3 = FakeS3()
+    monkeypatch.setattr(crypto_training_dataset, "get_s3_helper", lambda: s3)
+    monkeypatch.setattr(partition_index, "get_s3_helper", lambda: s3)
+    monkeypatch.setattr(crypto_training_dataset, "BinanceFetcher", lambda: None)
+    dataset = CryptoTrainingDataset()
+    dataset.interval_min = 1440
+    dataset.created_at = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    return dataset, s3
+
+
+def test_partial_months_are_filtered_on_read(dataset):
+    dataset, s3 = dataset
+    months = ["2024-01", "2024-02", "2024-03"]
+    s3.objects[PartitionIndex(SYMBOL, 1440).index_path()] = {"dates": []}
+    s3.objects[dataset.monthly_manifest_path(SYMBOL, 1440)] = {"months": {month: {} for month in months}}
+    for month in months:
+        timestamps = pd.date_range(f"{month}-01", pd.Timestamp(f"{month}-01") + pd.offsets.MonthEnd(0), freq="1D")
+        s3.objects[dataset.monthly_data_path(SYMBOL, 1440, month)] = pd.DataFrame({"timestamp": timestamps, "close": 1.0})
+
+    result = dataset.fetch_partitions([SYMBOL], datetime(2024, 1, 15, tzinfo=timezone.utc), datetime(2024, 3, 10, tzinfo=timezone.utc))
+
+    paths = [dataset.monthly_data_path(SYMBOL, 1440, month) for month in months]
+    assert s3.reads[paths[0]] == [("timestamp", ">=", pd.Timestamp("2024-01-15")), ("timestamp", "<", pd.Timestamp("2024-02-01"))]
+    assert s3.reads[paths[1]] is None  # 月全体はそのまま読む
+    assert s3.reads[paths[2]] == [("timestamp", ">=", pd.Timestamp("2024-03-01")), ("timestamp", "<", pd.Timestamp("2024-03-11"))]
+    assert list(result[SYMBOL]["timestamp"]) == list(pd.date_range("2024-01-15", "2024-03-10", freq="1D"))
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+import models.ensemble_trainer as ensemble_trainer
+from models.ensemble_model import create_model
+from models.ensemble_trainer import THREAD_ENV_VARS, ParallelEnsembleTrainer, _thread_env, _train_member
+
+
+def read_thread_env():
+    return {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+
+
+def test_spawned_workers_start_with_thread_limit(monkeypatch):
+    monkeypatch.setenv("OMP_NUM_THREADS", "8")
+    monkeypatch.delenv("MKL_NUM_THREADS", raising=False)
+
+    with _thread_env(2), ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        env = executor.submit(read_thread_env).result()
+
+    assert env == {name: "2" for name in THREAD_ENV_VARS}
+    # 親プロセスの環境変数は元に戻す
+    assert os.environ["OMP_NUM_THREADS"] == "8"
+    assert "MKL_NUM_THREADS" not in os.environ
+
+
+class FakeModel:
+    created = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        FakeModel.created.append(self)
+
+    def set_thread_limit(self, threads):
+        self.threads = threads
+
+    def train(self, X_train, y_train):
+        self.trained = len(X_train)
+
+    def _export_bytes(self):
+        return b"model"
+
+
+def test_train_member_uses_constructor_kwargs(monkeypatch):
+    monkeypatch.setattr(ensemble_trainer, "create_model", lambda name, **kwargs: FakeModel(**kwargs))
+    X = np.zeros((10, 3))
+
+    assert _train_member("lstm", {"sequence_length": 5}, X, np.zeros(10), 2) == b"model"
+    model = FakeModel.created[-1]
+    assert model.kwargs == {"sequence_length": 5}
+    assert model.threads == 2 and model.trained == 10
+
+
+class FakeEnsemble:
+    def __init__(self, names):
+        self.models = {name: create_model(name) for name in names}
+        self.model_kwargs = {}
+        self.trained = []
+
+    def prepare_version(self):
+        pass
+
+    def get_model_path(self):
+        return "ml_models/versions/v1"
+
+    def train(self, X_train, y_train, y_name):
+        self.trained.append(y_name)
+
+
+class FakeS3:
+    def __init__(self):
+        self.saved = []
+
+    def save_many(self, items, max_workers=None):
+        self.saved += [key for _, key in items]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_progress_is_reported_per_job(monkeypatch, max_workers):
+    pytest.importorskip("lightgbm")
+    monkeypatch.setattr(ensemble_trainer, "get_s3_helper", FakeS3)
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(200, 4)), rng.integers(0, 2, 200)
+    targets = {y_name: (FakeEnsemble(["lgbm_classifier"]), X, y) for y_name in ["buy_signal", "sell_signal"]}
+    progress = []
+
+    ParallelEnsembleTrainer(max_workers=max_workers, threads_per_job=1).train(targets, on_progress=lambda *args: progress.append(args))
+
+    assert [(done, total) for done, total, _, _ in progress] == [(1, 2), (2, 2)]
+    assert sorted(y_name for _, _, y_name, _ in progress) == ["buy_signal", "sell_signal"]
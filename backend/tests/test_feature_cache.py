@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import models.features.feature_cache as feature_cache
+from conftest import make_market_bars
+from config.config_manager import DEFAULT_CONFIG
+from models.feature_dataset_model import FEATURE_CONFIG, FEATURE_CODE_VERSION
+from models.features.feature_cache import FeatureCache
+
+
+class FakeS3:
+    def __init__(self):
+        self.modified = {}  # key -> LastModified
+
+    def get_s3_files_modified_before(self, prefix, before):
+        return [key for key, modified in self.modified.items() if key.startswith(prefix) and modified < before]
+
+    def delete_s3_files(self, keys):
+        for key in keys:
+            self.modified.pop(key, None)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(feature_cache, "get_s3_helper", lambda: fake)
+    return fake
+
+
+def make_key(df, config=None, feature_config=None, code_version=FEATURE_CODE_VERSION):
+    cache = FeatureCache({**DEFAULT_CONFIG, **(config or {})}, {**FEATURE_CONFIG, **(feature_config or {})}, code_version)
+    return cache.make_key(df)
+
+
+@pytest.mark.parametrize("config, feature_config, code_version", [
+    ({"market_symbol": "eth_jpy"}, None, FEATURE_CODE_VERSION),
+    ({"target_buy_rate": 0.05}, None, FEATURE_CODE_VERSION),
+    ({"target_sell_term": 20}, None, FEATURE_CODE_VERSION),
+    (None, {"sma_periods": [5, 10]}, FEATURE_CODE_VERSION),
+    (None, {"indicator_backend": "numba"}, FEATURE_CODE_VERSION),
+    (None, None, FEATURE_CODE_VERSION + 1),
+])
+def test_key_changes_with_settings(s3, config, feature_config, code_version):
+    df = make_market_bars(n=50)
+
+    assert make_key(df) == make_key(df.copy())
+    assert make_key(df, config, feature_config, code_version) != make_key(df)
+
+
+def test_key_changes_with_input(s3):
+    df = make_market_bars(n=50)
+    changed = df.copy()
+    changed.loc[10, "close_btc_jpy"] += 1
+
+    assert make_key(changed) != make_key(df)
+    assert make_key(df.iloc[1:]) != make_key(df)
+
+
+def test_evict_deletes_only_expired_entries(s3):
+    now = datetime.now(timezone.utc)
+    s3.modified = {
+        FeatureCache.get_s3_filename("old"): now - timedelta(days=8),
+        FeatureCache.get_s3_filename("new"): now - timedelta(days=1),
+        "features/indicator_state_btc_jpy_1440m.json": now - timedelta(days=30),
+    }
+    cache = FeatureCache(DEFAULT_CONFIG, FEATURE_CONFIG, FEATURE_CODE_VERSION)
+
+    assert cache.evict(ttl_days=7) == [FeatureCache.get_s3_filename("old")]
+    assert sorted(s3.modified) == sorted([FeatureCache.get_s3_filename("new"), "features/indicator_state_btc_jpy_1440m.json"])
+    assert cache.evict(ttl_days=0) == []
@@ -0,0 +1,10 @@
+import models.features.indicator_backends as indicator_backends
+from models.feature_dataset_model import FEATURE_CONFIG
+from models.features.indicator_backends import NumbaIndicators, create_indicators, default_indicator_backend
+
+
+def test_default_backend_is_numba_without_talib(monkeypatch):
+    monkeypatch.setattr(indicator_backends, "find_spec", lambda name: None)
+
+    assert default_indicator_backend() == "numba"
+    assert isinstance(create_indicators({}, {**FEATURE_CONFIG, "indicator_backend": None}), NumbaIndicators)
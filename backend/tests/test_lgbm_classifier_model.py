@@ -0,0 +1,42 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("lightgbm")
+
+from models.ml.lgbm_classifier_model import LgbmClassifierModel
+
+
+def make_dataset(n=300, n_features=5, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, n_features)), columns=[f"f{i}" for i in range(n_features)])
+    y = (X["f0"] + rng.normal(0, 0.5, n) > 0).astype(int)
+    return X, y
+
+
+def test_model_string_round_trip():
+    X, y = make_dataset()
+    model = LgbmClassifierModel()
+    model.train(X, y)
+    data = model._export_bytes()
+
+    assert data.startswith(b"tree\n")
+    loaded = LgbmClassifierModel()
+    loaded._import_bytes(data)
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X), rtol=1e-12)
+    np.testing.assert_allclose(loaded.model.predict_proba(X), model.model.predict_proba(X), rtol=1e-12)
+    assert list(loaded.model.classes_) == [0, 1]
+    assert loaded.model.n_features_in_ == X.shape[1]
+    assert list(loaded.model.feature_name_) == list(X.columns)
+
+
+def test_legacy_pickle_is_still_loaded():
+    X, y = make_dataset(seed=1)
+    model = LgbmClassifierModel()
+    model.train(X, y)
+
+    loaded = LgbmClassifierModel()
+    loaded._import_bytes(pickle.dumps(model.model))
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X))
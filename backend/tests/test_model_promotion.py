@@ -0,0 +1,48 @@
+import pytest
+
+import services.ml_evaluate_service as ml_evaluate_service
+from config.settings import settings
+from services.ml_evaluate_service import MlEvaluteService
+
+
+class FakeRegistry:
+    pointers = {}
+
+    def current_version(self, stage):
+        return self.pointers.get(stage)
+
+    def publish(self, stage, version):
+        self.pointers[stage] = version
+        return version
+
+    def promote(self, src_stage="staging", dst_stage="production"):
+        return self.publish(dst_stage, self.pointers[src_stage])
+
+
+class FailingExporter:
+    def export(self, version):
+        raise RuntimeError("tf2onnx is not installed")
+
+
+@pytest.fixture
+def registry(monkeypatch, default_config):
+    FakeRegistry.pointers = {"staging": "v2", "production": "v1"}
+    monkeypatch.setattr(ml_evaluate_service, "ModelRegistry", FakeRegistry)
+    monkeypatch.setattr(ml_evaluate_service, "OnnxExporter", FailingExporter)
+    return FakeRegistry.pointers
+
+
+def test_failed_export_aborts_promotion_with_onnx_backend(monkeypatch, registry):
+    monkeypatch.setattr(settings, "INFERENCE_BACKEND", "onnx")
+
+    with pytest.raises(RuntimeError):
+        MlEvaluteService().promote_model()
+    assert registry["production"] == "v1"
+
+
+def test_failed_export_keeps_promotion_with_native_backend(monkeypatch, registry):
+    monkeypatch.setattr(settings, "INFERENCE_BACKEND", "native")
+    monkeypatch.setattr(settings, "ONNX_EXPORT_ON_PROMOTE", True)
+
+    assert MlEvaluteService().promote_model()
+    assert registry["production"] == "v2"
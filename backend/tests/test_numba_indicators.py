@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+talib = pytest.importorskip("talib")
+pytest.importorskip("numba")
+
+from models.features.indicator_backends import NumbaIndicators, TalibIndicators
+
+FEATURE_CONFIG = {
+    "sma_periods": [5, 10, 15, 20, 50],
+    "ma_cross_periods": None,
+    "bollinger_periods": [10, 15, 20],
+    "atr_periods": [5, 10, 15, 20],
+    "rsi_period": 14,
+    "macd_fast": 12,
+    "macd_slow": 26,
+    "macd_signal": 9,
+}
+
+
+def make_ohlcv(n=2000, seed=0, leading_nan=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    close[n // 2:n // 2 + 20] = close[n // 2 - 1]  # 値動きの無い区間
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n))
+    volume = rng.uniform(1, 100, n)
+    ohlcv = {"open": open_, "high": high, "low": low, "close": close, "volume": volume}
+    for values in ohlcv.values():
+        values[:leading_nan] = np.nan
+    return ohlcv
+
+
+def assert_same(actual, expected):
+    for a, e in zip(np.atleast_2d(actual), np.atleast_2d(expected)):
+        np.testing.assert_array_equal(np.isnan(a), np.isnan(e))
+        np.testing.assert_allclose(a, e, rtol=1e-10, atol=1e-10, equal_nan=True)
+
+
+@pytest.mark.parametrize("leading_nan", [0, 7])
+def test_numba_matches_talib(leading_nan):
+    ohlcv = make_ohlcv(leading_nan=leading_nan)
+    expected = TalibIndicators(ohlcv, FEATURE_CONFIG)
+    actual = NumbaIndicators(ohlcv, FEATURE_CONFIG)
+
+    for period in FEATURE_CONFIG["sma_periods"] + [7]:
+        assert_same(actual.sma(period), expected.sma(period))
+    for period in FEATURE_CONFIG["bollinger_periods"] + [30]:
+        assert_same(actual.bbands(period), expected.bbands(period))
+    for period in FEATURE_CONFIG["atr_periods"] + [14]:
+        assert_same(actual.atr(period), expected.atr(period))
+    for period in [14, 21]:
+        assert_same(actual.rsi(period), expected.rsi(period))
+    assert_same(actual.obv(), expected.obv())
+    for params in [(12, 26, 9), (26, 12, 9), (5, 35, 5)]:
+        assert_same(actual.macd(*params), expected.macd(*params))
+    assert_same(actual.stoch(), expected.stoch())
+
+
+def test_short_series():
+    ohlcv = make_ohlcv(n=30)
+    expected = TalibIndicators(ohlcv, FEATURE_CONFIG)
+    actual = NumbaIndicators(ohlcv, FEATURE_CONFIG)
+    assert_same(actual.sma(50), expected.sma(50))
+    assert_same(actual.macd(12, 26, 9), expected.macd(12, 26, 9))
+    assert_same(actual.atr(20), expected.atr(20))
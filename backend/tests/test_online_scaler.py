@@ -0,0 +1,122 @@
+import itertools
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+import models.model_registry as model_registry
+import models.scalers.log_z_scaler_processor as log_z_scaler_processor
+from models.artifact_cache import get_artifact_cache
+from models.model_registry import ModelRegistry
+from models.scalers.log_z_scaler_processor import LogZScalerProcessor
+from models.scalers.online_standard_scaler import OnlineStandardScaler
+
+
+def make_matrix(n=1000, n_features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.lognormal(rng.uniform(-2, 5, n_features), rng.uniform(0.1, 2, n_features), (n, n_features))
+
+
+def assert_matches_sklearn(scaler, X):
+    expected = StandardScaler().fit(X)
+    assert scaler.n_samples_seen_ == expected.n_samples_seen_
+    np.testing.assert_allclose(scaler.mean_, expected.mean_, rtol=1e-12)
+    np.testing.assert_allclose(scaler.var_, expected.var_, rtol=1e-10)
+    np.testing.assert_allclose(scaler.transform(X), expected.transform(X), atol=1e-9)
+
+
+def test_chunked_fit_matches_standard_scaler():
+    X = make_matrix()
+    assert_matches_sklearn(OnlineStandardScaler().fit(X, chunk_size=97, max_workers=4), X)
+    assert_matches_sklearn(OnlineStandardScaler().fit_chunks(X[i:i + 150] for i in range(0, len(X), 150)), X)
+
+
+def test_merge_and_partial_fit_match_standard_scaler():
+    X = make_matrix(seed=1)
+    a, b, c = X[:10], X[10:600], X[600:]
+    merged = OnlineStandardScaler.from_array(a).merge(OnlineStandardScaler.from_array(b)).merge(OnlineStandardScaler())
+    merged.merge(OnlineStandardScaler.from_array(c))
+    assert_matches_sklearn(merged, X)
+
+    updated = OnlineStandardScaler().partial_fit(a).partial_fit(X[:0]).partial_fit(b).partial_fit(c)
+    assert_matches_sklearn(updated, X)
+    assert_matches_sklearn(OnlineStandardScaler.from_bytes(updated.to_bytes()), X)
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def save_to_s3(self, buffer, key):
+        self.objects[key] = buffer.getvalue()
+
+    def load_bytes_from_s3(self, key, immutable=False):
+        return self.objects.get(key)
+
+    def save_pkl_to_s3(self, obj, key):
+        self.objects[key] = pickle.dumps(obj)
+
+    def load_pkl_from_s3(self, key, immutable=False):
+        return pickle.loads(self.objects[key]) if key in self.objects else pd.DataFrame()
+
+    def get_etag(self, key):
+        return str(hash(self.objects[key])) if key in self.objects else None
+
+    def save_json_to_s3(self, data, key):
+        self.objects[key] = data
+
+    def load_json_from_s3(self, key):
+        return self.objects.get(key)
+
+    def copy_s3_folder_recursive(self, src_folder, dest_folder, exclude=()):
+        for key in [k for k in self.objects if k.startswith(src_folder)]:
+            if not any(key[len(src_folder):].startswith(prefix) for prefix in exclude):
+                self.objects[dest_folder + key[len(src_folder):]] = self.objects[key]
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    fake = FakeS3()
+    versions = itertools.count(1)
+    monkeypatch.setattr(model_registry, "get_s3_helper", lambda: fake)
+    monkeypatch.setattr(log_z_scaler_processor, "get_s3_helper", lambda: fake)
+    monkeypatch.setattr(ModelRegistry, "create_version", lambda self: f"v{next(versions)}")
+    get_artifact_cache().clear()
+    yield fake
+    get_artifact_cache().clear()
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+def test_partial_update_writes_a_new_version(s3, incremental):
+    X = make_matrix(seed=2)
+    trained = LogZScalerProcessor(incremental=incremental)
+    trained.fit_transform(X[:700])
+    registry = ModelRegistry()
+    registry.publish("staging", trained.version)
+    source_files = {k: v for k, v in s3.objects.items() if k.startswith(registry.version_path(trained.version))}
+    s3.objects[f"{registry.version_path(trained.version)}/onnx/log_z_scaler.onnx"] = b"old"
+    s3.objects[f"{registry.version_path(trained.version)}/buy_signal/dense_model.npz"] = b"model"
+
+    version = LogZScalerProcessor(stage="staging").partial_update(X[700:])
+
+    assert version != trained.version
+    assert registry.current_version("staging") == version
+    # 元のバージョンは書き換えない
+    for key, value in source_files.items():
+        assert s3.objects[key] == value
+    new_path = registry.version_path(version)
+    assert s3.objects[f"{new_path}/buy_signal/dense_model.npz"] == b"model"
+    assert f"{new_path}/onnx/log_z_scaler.onnx" not in s3.objects
+
+    loaded = LogZScalerProcessor(stage="staging")
+    loaded.load()
+    expected = StandardScaler().fit(np.log1p(X))
+    np.testing.assert_allclose(loaded.scaler_X.mean_, expected.mean_, rtol=1e-12)
+    np.testing.assert_allclose(loaded.transform(X), expected.transform(np.log1p(X)), atol=1e-9)
+
+
+def test_partial_update_refuses_production(s3):
+    with pytest.raises(ValueError):
+        LogZScalerProcessor(stage="production").partial_update(make_matrix(n=10))
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from models.onnx_export import scaler_to_onnx
+from models.onnx_predictor import OnnxEnsemblePredictor
+
+# ONNX は float32 で計算するため、float64 のネイティブ実装とは丸め誤差の分だけずれる
+ATOL = 1e-5
+
+
+def make_dataset(n=500, n_features=8, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.lognormal(0, 1, (n, n_features)), columns=[f"f{i}" for i in range(n_features)])
+    X.iloc[::7, 0] = -1.0  # 負の値は 0 に丸める
+    y = (X["f1"] + rng.normal(0, 0.5, n) > X["f1"].median()).astype(int)
+    return X, y
+
+
+def test_scaler_matches_log_z_scaler():
+    from sklearn.preprocessing import StandardScaler
+    X, _ = make_dataset()
+    logged = np.log1p(np.maximum(X.to_numpy(), 0))
+    scaler = StandardScaler().fit(logged)
+
+    predictor = OnnxEnsemblePredictor.from_bytes({}, scaler=scaler_to_onnx(scaler.mean_, scaler.scale_))
+    actual = predictor.transform(X)
+
+    assert list(actual.columns) == list(X.columns)
+    np.testing.assert_allclose(actual.to_numpy(), scaler.transform(logged), atol=ATOL)
+
+    predictor.manifest = {"version": "v1", "scaler": {"mean": scaler.mean_.tolist(), "scale": scaler.scale_.tolist()}}
+    np.testing.assert_allclose(predictor.inverse_transform(actual).to_numpy(), np.maximum(X.to_numpy(), 0), rtol=1e-4, atol=ATOL)
+
+
+def test_lgbm_classifier_matches_native():
+    pytest.importorskip("lightgbm")
+    pytest.importorskip("onnxmltools")
+    from models.ml.lgbm_classifier_model import LgbmClassifierModel
+    from models.onnx_export import CONVERTERS
+    X, y = make_dataset()
+    model = LgbmClassifierModel()
+    model.train(X, y)
+
+    # 昇格時は S3 から読み込んだ (モデル文字列から復元した) モデルを変換する
+    loaded = LgbmClassifierModel()
+    loaded.import_bytes(model._export_bytes())
+    predictor = OnnxEnsemblePredictor.from_bytes({"lgbm_classifier": CONVERTERS["lgbm_classifier"](loaded)})
+
+    np.testing.assert_allclose(predictor.predict(X), model.predict(X), atol=ATOL)
+
+
+def test_dense_graph_matches_numpy():
+    """ Dense の変換 (重み → グラフ) は TensorFlow なしで確認する """
+    from models.onnx_export import dense_to_onnx
+    X, _ = make_dataset()
+    rng = np.random.default_rng(1)
+    shapes = [(X.shape[1], 16, "relu"), (16, 8, "tanh"), (8, 4, "linear"), (4, 1, "sigmoid")]
+    layers = [(rng.normal(0, 0.5, (n_in, n_out)), rng.normal(0, 0.1, n_out), activation) for n_in, n_out, activation in shapes]
+
+    expected = X.to_numpy()
+    activations = {"relu": lambda v: np.maximum(v, 0), "tanh": np.tanh, "linear": lambda v: v, "sigmoid": lambda v: 1 / (1 + np.exp(-v))}
+    for kernel, bias, activation in layers:
+        expected = activations[activation](expected @ kernel + bias)
+
+    predictor = OnnxEnsemblePredictor.from_bytes({"dense": (dense_to_onnx(layers, X.shape[1]), {"output": "output", "column": 0})})
+
+    np.testing.assert_allclose(predictor.predict(X), expected[:, 0], atol=ATOL)
+
+
+def test_dense_matches_native():
+    pytest.importorskip("tensorflow")
+    from models.ml.dense_model import DenseModel
+    from models.onnx_export import CONVERTERS
+    X, y = make_dataset()
+    model = DenseModel()
+    model.train(X.to_numpy(np.float32), y.to_numpy(), epochs=2)
+
+    predictor = OnnxEnsemblePredictor.from_bytes({"dense": CONVERTERS["dense"](model)})
+
+    np.testing.assert_allclose(predictor.predict(X), model.predict(X.to_numpy(np.float32)), atol=ATOL)
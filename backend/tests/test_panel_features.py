@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+talib = pytest.importorskip("talib")
+
+from conftest import make_market_bars
+from models.feature_dataset_model import FEATURE_CONFIG
+from models.panel_feature_model import PanelFeatureModel, PANEL_FEATURE_CONFIG
+
+SYMBOLS = ["btc_jpy", "eth_jpy", "xrp_jpy"]
+
+
+def make_panel(n=300):
+    frames = [make_market_bars(n=n, market=symbol, seed=i) for i, symbol in enumerate(SYMBOLS)]
+    return pd.concat([frames[0]] + [frame.drop(columns="timestamp") for frame in frames[1:]], axis=1)
+
+
+def talib_columns(df, symbol):
+    """ 1銘柄の talib の計算結果 { 列名: 配列 } """
+    high, low, close, volume = (df[f"{v}_{symbol}"].to_numpy(dtype=np.float64) for v in ["high", "low", "close", "volume"])
+    columns = {f"sma_{p}": talib.SMA(close, timeperiod=p) for p in FEATURE_CONFIG["sma_periods"]}
+    for p in FEATURE_CONFIG["bollinger_periods"]:
+        upper, middle, lower = talib.BBANDS(close, timeperiod=p)
+        columns.update({f"bollinger_upper{p}": upper, f"bollinger_middle{p}": middle, f"bollinger_lower{p}": lower})
+    columns.update({f"atr{p}": talib.ATR(high, low, close, timeperiod=p) for p in FEATURE_CONFIG["atr_periods"]})
+    columns["RSI"] = talib.RSI(close, timeperiod=FEATURE_CONFIG["rsi_period"])
+    columns["OBV"] = talib.OBV(close, volume)
+    columns["MACD"], columns["MACD_signal"], columns["MACD_hist"] = talib.MACD(
+        close, fastperiod=FEATURE_CONFIG["macd_fast"], slowperiod=FEATURE_CONFIG["macd_slow"], signalperiod=FEATURE_CONFIG["macd_signal"]
+    )
+    columns["STOCH_k"], columns["STOCH_d"] = talib.STOCH(high, low, close)
+    return columns
+
+
+@pytest.mark.parametrize("backend", ["talib", "numba"])
+@pytest.mark.parametrize("symbol", SYMBOLS)
+def test_indicators_match_talib_per_symbol(default_config, monkeypatch, backend, symbol):
+    if backend == "numba":
+        pytest.importorskip("numba")
+    monkeypatch.setitem(FEATURE_CONFIG, "indicator_backend", backend)
+    df = make_panel()
+    X, _ = PanelFeatureModel().create_features(df)
+
+    assert len(X) > 200
+    positions = df.index.get_indexer(X.index)
+    for column, expected in talib_columns(df, symbol).items():
+        np.testing.assert_allclose(X[f"{column}_{symbol}"].to_numpy(), expected[positions], rtol=1e-10, atol=1e-8, err_msg=column)
+
+
+def test_relative_strength_and_correlation(default_config):
+    df = make_panel()
+    X, _ = PanelFeatureModel().create_features(df)
+    close = pd.DataFrame({symbol: df[f"close_{symbol}"] for symbol in SYMBOLS})
+
+    for period in PANEL_FEATURE_CONFIG["relative_strength_periods"]:
+        returns = close / close.shift(period) - 1
+        expected = returns.sub(returns.mean(axis=1), axis=0).loc[X.index]
+        actual = X[[f"rel_strength{period}_{symbol}" for symbol in SYMBOLS]]
+        np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), atol=1e-12)
+        np.testing.assert_allclose(actual.sum(axis=1), 0.0, atol=1e-12)
+
+    window = PANEL_FEATURE_CONFIG["correlation_window"]
+    market = default_config["market_symbol"]
+    log_returns = np.log(close / close.shift(1))
+    assert f"corr{window}_{market}" not in X.columns
+    for symbol in SYMBOLS:
+        if symbol == market:
+            continue
+        expected = log_returns[symbol].rolling(window).corr(log_returns[market]).loc[X.index]
+        np.testing.assert_allclose(X[f"corr{window}_{symbol}"].to_numpy(), expected.to_numpy(), atol=1e-8)
+
+
+def test_market_symbol_must_be_in_symbols(default_config):
+    df = make_panel()
+    with pytest.raises(ValueError, match=default_config["market_symbol"]):
+        PanelFeatureModel().create_features(df, symbols=["eth_jpy", "xrp_jpy"])
@@ -0,0 +1,76 @@
+import json
+import hashlib
+
+import pytest
+
+import models.partition_index as partition_index
+from models.partition_index import PartitionIndex
+
+
+class FakeS3:
+    """ ETag による条件付き書き込みだけを再現する S3 """
+
+    def __init__(self):
+        self.objects = {}
+        self.before_write = None  # 読み込みと書き込みの間に割り込む処理 (競合の再現)
+
+    def load_json_from_s3(self, key):
+        return json.loads(self.objects[key]) if key in self.objects else None
+
+    def load_json_with_etag(self, key):
+        if key not in self.objects:
+            return None, None
+        return json.loads(self.objects[key]), hashlib.md5(self.objects[key]).hexdigest()
+
+    def save_json_if_match(self, data, key, etag=None):
+        if self.before_write:
+            before_write, self.before_write = self.before_write, None
+            before_write()
+        current = hashlib.md5(self.objects[key]).hexdigest() if key in self.objects else None
+        if current != etag:
+            return False
+        self.objects[key] = json.dumps(data).encode("utf-8")
+        return True
+
+    def get_s3_files(self, prefix):
+        return []
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(partition_index, "get_s3_helper", lambda: fake)
+    monkeypatch.setattr(partition_index.time, "sleep", lambda seconds: None)
+    return fake
+
+
+def saved_dates(s3, index):
+    return json.loads(s3.objects[index.index_path()])["dates"]
+
+
+def test_concurrent_writers_keep_each_others_partitions(s3):
+    pipeline = PartitionIndex("BTC/JPY", 15).load()
+    compactor = PartitionIndex("BTC/JPY", 15).load()
+
+    pipeline.add(["2025-01-01", "2025-01-02"])
+    pipeline.save()
+    # compactor は pipeline の保存前の一覧を読み込んでいる
+    compactor.remove(["2025-01-01"])
+    compactor.add(["2025-01-03"])
+    compactor.save()
+
+    assert saved_dates(s3, pipeline) == ["2025-01-02", "2025-01-03"]
+    assert compactor.dates == {"2025-01-02", "2025-01-03"}
+
+
+def test_save_retries_when_written_between_read_and_write(s3):
+    index = PartitionIndex("BTC/JPY", 15).load()
+    other = PartitionIndex("BTC/JPY", 15).load()
+    other.add(["2025-01-01"])
+    s3.before_write = other.save
+
+    index.add(["2025-01-02"])
+    index.save()
+
+    assert saved_dates(s3, index) == ["2025-01-01", "2025-01-02"]
+    assert not index.dirty
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# 起動時 (API・Lambda のコールドスタート) に読み込まない重いライブラリ
+HEAVY_MODULES = [
+    "tensorflow", "keras", "shap", "optuna", "xgboost", "lightgbm",
+    "talib", "numba", "yfinance", "onnxruntime", "scipy.signal",
+]
+
+
+def import_times(module):
+    """ python -X importtime でモジュールを import し、{モジュール名: 累積時間 (µs)} を返す """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        pytest.fail(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self | cumulative | name" (name のインデントは import の階層)
+        _, cumulative, name = line.split("|")
+        times.setdefault(name.strip(), int(cumulative))
+    return times
+
+
+def report(module, times, top=15):
+    """ 累積時間の大きい順に表示 (起動時間の推移を追うため) """
+    print(f"\n=== import {module}: {times.get(module, 0) / 1e6:.3f}s ===")
+    for name, cumulative in sorted(times.items(), key=lambda item: -item[1])[:top]:
+        print(f"{cumulative / 1e3:10.1f} ms  {name}")
+
+
+def test_main_does_not_import_heavy_libraries():
+    times = import_times("main")
+    report("main", times)
+
+    assert [name for name in HEAVY_MODULES if name in times] == []
+
+
+@pytest.mark.parametrize("module", [
+    "models.ensemble_model",
+    "services.auto_trade_service",
+    "services.ml_pipeline_service",
+])
+def test_module_defers_heavy_libraries(module):
+    times = import_times(module)
+    report(module, times)
+
+    assert [name for name in HEAVY_MODULES if name in times] == []
@@ -0,0 +1,113 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("talib")
+
+from conftest import make_market_bars
+from models.feature_dataset_model import FeatureDatasetModel
+import models.features.streaming_indicator_engine as streaming_indicator_engine
+from models.features.streaming_indicator_engine import StreamingIndicatorEngine, _BBands, _SMA
+
+
+def batch_features(raw):
+    X, _ = FeatureDatasetModel().create_features(raw, use_cache=False)
+    return X
+
+
+def stream_features(raw, restore_at=None):
+    """ 1本ずつ反映する。restore_at で状態を JSON に保存し、新しいエンジンに読み込んで続ける """
+    engine = StreamingIndicatorEngine()
+    rows = {}
+    for i, bar in zip(raw.index, raw.to_dict("records")):
+        if i == restore_at:
+            state = json.loads(json.dumps(engine.to_state()))
+            engine = StreamingIndicatorEngine()
+            assert engine.load_state(state)
+        row = engine.update(bar)
+        if row is not None:
+            rows[i] = row
+    return rows
+
+
+def assert_rows_equal(X, rows, columns=None):
+    columns = columns or list(X.columns)
+    # X はラベルを作れない末尾の足を含まないため、ストリーミングの行は X の先頭から始まり X を全て含む
+    assert min(rows) == X.index[0] and set(X.index) <= set(rows)
+    streamed = np.array([[rows[i][c] for c in columns] for i in X.index], dtype=float)
+    np.testing.assert_allclose(streamed, X[columns].to_numpy(dtype=float), rtol=1e-12, atol=1e-9)
+
+
+def test_streaming_matches_talib_batch(default_config):
+    raw = make_market_bars()
+    X = batch_features(raw)
+    rows = stream_features(raw)
+
+    assert list(next(iter(rows.values()))) == list(X.columns)
+    assert_rows_equal(X, rows)
+
+
+def test_streaming_state_round_trip(default_config):
+    raw = make_market_bars(seed=1)
+    X = batch_features(raw)
+
+    assert_rows_equal(X, stream_features(raw, restore_at=raw.index[len(raw) // 2]))
+
+
+def test_obv_drifts_by_a_constant_after_reset(default_config):
+    """ リセット後は読み込み期間の先頭から計算し直すため、OBV だけが全期間の値と一定の差になる """
+    raw = make_market_bars(seed=2)
+    start = 150
+    window = raw.iloc[start:]
+    rows = stream_features(window)
+
+    # 同じ期間のバッチ計算 (推論時の get_inference_data と同じ) とは全ての列が一致する
+    assert_rows_equal(batch_features(window), rows)
+
+    full = batch_features(raw)
+    common = [i for i in full.index if i in rows]
+    drift = np.array([rows[i]["OBV"] for i in common]) - full.loc[common, "OBV"].to_numpy()
+    np.testing.assert_allclose(drift, drift[0], rtol=0, atol=1e-6)
+    assert drift[0] != 0
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.lock = threading.Lock()  # S3Helper と同じく複製できない
+
+    def save_json_to_s3(self, data, key):
+        self.objects[key] = json.loads(json.dumps(data))
+
+    def load_json_from_s3(self, key):
+        return self.objects.get(key)
+
+
+def test_latest_features_with_uncompleted_bar(default_config, monkeypatch):
+    s3 = FakeS3()
+    monkeypatch.setattr(streaming_indicator_engine, "get_s3_helper", lambda: s3)
+    raw = make_market_bars(seed=3)
+    expected = stream_features(raw)
+    last = raw["timestamp"].iloc[-1]
+
+    for df in [raw.iloc[:-1], raw]:
+        X = StreamingIndicatorEngine().latest_features(df, lambda timestamp: timestamp < last)
+        assert list(X.index) == [df.index[-1]]
+        assert X.iloc[0].to_dict() == pytest.approx(expected[df.index[-1]], rel=1e-12)
+
+    # 未確定の足は状態に反映しない
+    state = next(iter(s3.objects.values()))
+    assert pd.Timestamp(state["last_timestamp"]) == raw["timestamp"].iloc[-2]
+
+
+def test_bbands_skips_nan_like_sma():
+    closes = [float(v) for v in range(1, 30)]
+    closes[12] = float("nan")
+    bbands, sma = _BBands(5), _SMA(5)
+    for close in closes:
+        upper, middle, lower = bbands.update(close)
+        np.testing.assert_equal(middle, sma.update(close))
+    assert not np.isnan(middle) and upper > middle > lower
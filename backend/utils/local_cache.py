@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+class LocalCache:
+    """
+    S3 オブジェクトのローカルディスクキャッシュ
+    - S3 キーごとに ETag と本体を保存し、ETag で鮮度を判定する
+    - 合計サイズが max_bytes を超えたら最も使われていないものから削除 (LRU)
+    インデックスはメモリに保持し、起動時にディスク上のメタデータから復元する
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index = OrderedDict()  # s3_key -> {"etag": str, "size": int}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def get(self, s3_key: str) -> Optional[Tuple[str, bytes]]:
+        """キャッシュ済みの (ETag, 本体) を取得。無い場合は None"""
+        with self.lock:
+            entry = self.index.get(s3_key)
+            if entry is None:
+                return None
+            self.index.move_to_end(s3_key)
+        path = self._data_path(s3_key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.invalidate(s3_key)
+            return None
+        return entry["etag"], data
+
+    def contains(self, s3_key: str) -> bool:
+        with self.lock:
+            return s3_key in self.index
+
+    def put(self, s3_key: str, etag: str, data: bytes):
+        """本体を保存し、上限を超えた分を LRU で削除"""
+        if len(data) > self.max_bytes:
+            # 保存できない場合も、以前の本体が返らないよう既存のエントリは削除する
+            self.invalidate(s3_key)
+            return
+        self._write_atomic(self._data_path(s3_key), data)
+        self._write_atomic(self._meta_path(s3_key), json.dumps({"key": s3_key, "etag": etag, "size": len(data)}).encode("utf-8"))
+        with self.lock:
+            previous = self.index.pop(s3_key, None)
+            if previous:
+                self.total_bytes -= previous["size"]
+            self.index[s3_key] = {"etag": etag, "size": len(data)}
+            self.total_bytes += len(data)
+            evicted = self._evict()
+        for key in evicted:
+            self._remove_files(key)
+
+    def invalidate(self, s3_key: str):
+        with self.lock:
+            entry = self.index.pop(s3_key, None)
+            if entry:
+                self.total_bytes -= entry["size"]
+        self._remove_files(s3_key)
+
+    def _evict(self):
+        evicted = []
+        while self.total_bytes > self.max_bytes and self.index:
+            key, entry = self.index.popitem(last=False)
+            self.total_bytes -= entry["size"]
+            evicted.append(key)
+        return evicted
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.cache_dir, name)
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                mtime = os.path.getmtime(self._data_path(meta["key"]))
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"ローカルキャッシュのメタデータを読み込めません: {meta_path} {e}")
+                continue
+            entries.append((mtime, meta))
+
+        for _, meta in sorted(entries, key=lambda x: x[0]):
+            self.index[meta["key"]] = {"etag": meta["etag"], "size": meta["size"]}
+            self.total_bytes += meta["size"]
+        for key in self._evict():
+            self._remove_files(key)
+
+    def _remove_files(self, s3_key: str):
+        for path in (self._data_path(s3_key), self._meta_path(s3_key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _data_path(self, s3_key: str):
+        return os.path.join(self.cache_dir, f"{self._digest(s3_key)}.bin")
+
+    def _meta_path(self, s3_key: str):
+        return os.path.join(self.cache_dir, f"{self._digest(s3_key)}.json")
+
+    @staticmethod
+    def _digest(s3_key: str):
+        return hashlib.sha256(s3_key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -4,25 +4,41 @@ import logging
 import boto3
 import pandas as pd
 import pickle
+import pyarrow.parquet as pq
 from typing import Any
 from io import BytesIO
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from config.settings import settings
 from functools import lru_cache
+from utils.local_cache import LocalCache
 
 class S3Helper:
     def __init__(self):
         """S3 クライアントの初期化（シングルトン）"""
         session = boto3.Session(region_name=settings.AWS_REGION)
-        self.s3 = session.client("s3")
+        # 一括取得/保存で同時に多数のリクエストを投げるため、コネクションプールとリトライを調整
+        client_config = Config(
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": settings.S3_MAX_RETRIES, "mode": "adaptive"},
+        )
+        self.s3 = session.client("s3", config=client_config)
+        self.max_concurrency = settings.S3_MAX_CONCURRENCY
         self.s3_resource = boto3.resource("s3")
         self.bucket_name = settings.S3_BUCKET
+        # ローカルディスクキャッシュ (S3 キー + ETag)。S3_CACHE_MAX_BYTES=0 で無効
+        self.cache = LocalCache(settings.S3_CACHE_DIR, settings.S3_CACHE_MAX_BYTES) if settings.S3_CACHE_MAX_BYTES > 0 else None
+        # 列・期間を指定した Parquet の読み込みに使う pyarrow の S3 ファイルシステム (初回使用時に生成)
+        self._arrow_fs = None
 
     def upload_to_s3(self, file_path: str, s3_key: str, delete_local: bool = True):
         """ローカルファイルを S3 にアップロード"""
         try:
             self.s3.upload_file(file_path, self.bucket_name, s3_key)
+            if self.cache:
+                self.cache.invalidate(s3_key)
             if delete_local:
                 os.remove(file_path)
         except ClientError as e:
@@ -32,12 +48,14 @@ class S3Helper:
     def save_to_s3(self, buffer: BytesIO, s3_path: str):
         """バイナリデータを S3 に保存"""
         try:
-            self.s3.put_object(
+            body = buffer.getvalue()
+            response = self.s3.put_object(
                 Bucket=self.bucket_name,
                 Key=s3_path,
-                Body=buffer.getvalue(),
+                Body=body,
                 ContentType="application/octet-stream"
             )
+            self._cache_written(s3_path, response, body)
         except ClientError as e:
             logging.error(f"S3への保存エラー: {e}")
             raise
@@ -45,12 +63,14 @@ class S3Helper:
     def save_json_to_s3(self, json_data: dict, file_key: str):
         """JSON データを S3 に保存"""
         try:
-            self.s3.put_object(
+            body = json.dumps(json_data).encode("utf-8")
+            response = self.s3.put_object(
                 Bucket=self.bucket_name,
                 Key=file_key,
-                Body=json.dumps(json_data),
+                Body=body,
                 ContentType="application/json"
             )
+            self._cache_written(file_key, response, body)
         except ClientError as e:
             logging.error(f"S3へのJSON保存エラー: {e}")
             raise
@@ -58,8 +78,7 @@ class S3Helper:
     def load_json_from_s3(self, file_key: str):
         """S3 から JSON データを読み込み"""
         try:
-            response = self.s3.get_object(Bucket=self.bucket_name, Key=file_key)
-            return json.loads(response['Body'].read().decode("utf-8"))
+            return json.loads(self._get_object_bytes(file_key).decode("utf-8"))
         except self.s3.exceptions.NoSuchKey:
             logging.warning(f"S3に {file_key} が見つかりません")
             return None
@@ -67,22 +86,63 @@ class S3Helper:
             logging.error(f"S3からJSON取得エラー: {e}")
             raise
 
-    def save_parquet_to_s3(self, df: pd.DataFrame, file_key: str):
-        """DataFrame を Parquet に変換し、S3 に保存"""
+    def load_json_with_etag(self, file_key: str):
+        """JSON と ETag を取得 (無い場合は (None, None))。条件付き書き込みの前に読むため、キャッシュを使わない"""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=file_key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                return None, None
+            raise
+        return json.loads(response["Body"].read().decode("utf-8")), response["ETag"]
+
+    def save_json_if_match(self, json_data: dict, file_key: str, etag: str = None) -> bool:
+        """
+        ETag が一致する場合のみ JSON を保存 (etag=None はオブジェクトが無い場合のみ)
+        他の書き込みと競合した場合は False を返す
+        """
+        body = json.dumps(json_data).encode("utf-8")
+        condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        try:
+            response = self.s3.put_object(
+                Bucket=self.bucket_name, Key=file_key, Body=body, ContentType="application/json", **condition
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict", "412", "409"):
+                return False
+            raise
+        self._cache_written(file_key, response, body)
+        return True
+
+    def save_parquet_to_s3(self, df: pd.DataFrame, file_key: str, compression: str = "snappy", row_group_size: int = None):
+        """
+        DataFrame を Parquet に変換し、S3 に保存
+        :param row_group_size: row group の行数 (統計情報による読み飛ばしの単位。省略時は PARQUET_ROW_GROUP_SIZE)
+        """
         try:
             buffer = BytesIO()
-            df.to_parquet(buffer, index=False)
+            df.to_parquet(
+                buffer, index=False, compression=compression,
+                row_group_size=row_group_size or settings.PARQUET_ROW_GROUP_SIZE,
+            )
             buffer.seek(0)
             self.save_to_s3(buffer, file_key)
         except Exception as e:
             logging.error(f"S3へのParquet保存エラー: {e}")
             raise
 
-    def load_parquet_from_s3(self, s3_key: str) -> pd.DataFrame:
-        """S3 から Parquet ファイルをロード"""
+    def load_parquet_from_s3(self, s3_key: str, immutable: bool = False, columns=None, filters=None) -> pd.DataFrame:
+        """
+        S3 から Parquet ファイルをロード
+        :param immutable: 更新されないオブジェクト (過去データなど) はキャッシュがあれば S3 に問い合わせない
+        :param columns: 読み込む列 (省略時は全列)
+        :param filters: pyarrow の行フィルタ (例: S3Helper.timestamp_filters(start, end))
+            columns/filters を指定し、ローカルキャッシュに無い場合は必要な列・row group だけを範囲 GET で読む
+        """
+        if (columns or filters) and not (self.cache and self.cache.contains(s3_key)):
+            return self._read_parquet_ranges(s3_key, columns, filters)
         try:
-            obj = self.s3.get_object(Bucket=self.bucket_name, Key=s3_key)
-            return pd.read_parquet(BytesIO(obj["Body"].read()))
+            return pd.read_parquet(BytesIO(self._get_object_bytes(s3_key, immutable)), columns=columns, filters=filters)
         except ClientError as e:
             if e.response["Error"]["Code"] == "NoSuchKey":
                 logging.warning(f"S3に {s3_key} が見つかりません")
@@ -93,15 +153,15 @@ class S3Helper:
     def save_pkl_to_s3(self, obj, file_key: str):
         try:
             serialized = pickle.dumps(obj)
-            self.s3.put_object(Bucket=self.bucket_name, Key=file_key, Body=serialized)
+            response = self.s3.put_object(Bucket=self.bucket_name, Key=file_key, Body=serialized)
+            self._cache_written(file_key, response, serialized)
         except Exception as e:
             logging.error(f"S3へのpickle保存エラー: {e}")
             raise
 
-    def load_pkl_from_s3(self, s3_key: str) -> Any:
+    def load_pkl_from_s3(self, s3_key: str, immutable: bool = False) -> Any:
         try:
-            response = self.s3.get_object(Bucket=self.bucket_name, Key=s3_key)
-            serialized = response['Body'].read()
+            serialized = self._get_object_bytes(s3_key, immutable)
             return pickle.loads(serialized)
         except ClientError as e:
             if e.response["Error"]["Code"] == "NoSuchKey":
@@ -110,9 +170,30 @@ class S3Helper:
             logging.error(f"S3からpickle取得エラー: {e}")
             raise
 
-    def download_file(self, s3_key: str, file_key: str) -> bool:
+    def get_etag(self, s3_key: str):
+        """オブジェクトの ETag (無い場合は None)"""
+        try:
+            return self.s3.head_object(Bucket=self.bucket_name, Key=s3_key)["ETag"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def load_bytes_from_s3(self, s3_key: str, immutable: bool = False):
+        """バイナリデータを S3 から読み込み (無い場合は None)"""
+        try:
+            return self._get_object_bytes(s3_key, immutable)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                logging.warning(f"S3に {s3_key} が見つかりません")
+                return None
+            raise
+
+    def download_file(self, s3_key: str, file_key: str, immutable: bool = False) -> bool:
         try:
-            self.s3.download_file(self.bucket_name, s3_key, file_key)
+            data = self._get_object_bytes(s3_key, immutable)
+            with open(file_key, "wb") as f:
+                f.write(data)
             return True
         except ClientError as e:
             if e.response["Error"]["Code"] == "NoSuchKey":
@@ -120,23 +201,156 @@ class S3Helper:
                 return False
             raise
 
+    def load_many_parquet(self, s3_keys, immutable: bool = False, max_workers: int = None, columns=None, filters=None):
+        """複数の Parquet を並列にロード (入力順。無いキーは空の DataFrame)"""
+        return self._map(lambda key: self.load_parquet_from_s3(key, immutable, columns, filters), s3_keys, max_workers)
 
-    def copy_s3_folder_recursive(self, src_folder, dest_folder):
+    def _read_parquet_ranges(self, s3_key: str, columns=None, filters=None) -> pd.DataFrame:
+        """フッターを読み、必要な列・row group のみを範囲 GET で取得 (キャッシュには保存しない)"""
+        try:
+            table = pq.read_table(f"{self.bucket_name}/{s3_key}", filesystem=self._get_arrow_fs(), columns=columns, filters=filters)
+        except FileNotFoundError:
+            logging.warning(f"S3に {s3_key} が見つかりません")
+            return pd.DataFrame()
+        return table.to_pandas()
+
+    def _get_arrow_fs(self):
+        if self._arrow_fs is None:
+            from pyarrow.fs import S3FileSystem
+            self._arrow_fs = S3FileSystem(region=settings.AWS_REGION)
+        return self._arrow_fs
+
+    @staticmethod
+    def timestamp_filters(start=None, end=None, column: str = "timestamp"):
+        """
+        [start, end) の期間で絞り込む pyarrow の行フィルタを生成
+        tz 付きの日時は UTC (naive) に変換する (OHLCV の timestamp 列は naive UTC)
+        """
+        filters = []
+        for op, value in ((">=", start), ("<", end)):
+            if value is None:
+                continue
+            value = pd.Timestamp(value)
+            if value.tzinfo is not None:
+                value = value.tz_convert("UTC").tz_localize(None)
+            filters.append((column, op, value))
+        return filters or None
+
+    def load_many_json(self, file_keys, max_workers: int = None):
+        """複数の JSON を並列にロード (入力順。無いキーは None)"""
+        return self._map(self.load_json_from_s3, file_keys, max_workers)
+
+    def load_many_bytes(self, s3_keys, immutable: bool = False, max_workers: int = None):
+        """複数のオブジェクトを並列にメモリへ読み込み (入力順。無いキーは None)"""
+        return self._map(lambda key: self.load_bytes_from_s3(key, immutable), s3_keys, max_workers)
+
+    def download_many(self, items, immutable: bool = False, max_workers: int = None):
+        """
+        複数のオブジェクトを並列にローカルファイルへダウンロード
+        :param items: [(s3_key, file_key), ...]
+        :return: 入力順の成否のリスト
+        """
+        return self._map(lambda item: self.download_file(*item, immutable=immutable), items, max_workers)
+
+    def save_many(self, items, max_workers: int = None):
+        """
+        複数のオブジェクトを並列に保存
+        :param items: [(データ, s3_key), ...]
+            DataFrame は Parquet、BytesIO はバイナリ、それ以外は JSON として保存
+        """
+        def save(item):
+            data, s3_key = item
+            if isinstance(data, pd.DataFrame):
+                self.save_parquet_to_s3(data, s3_key)
+            elif isinstance(data, BytesIO):
+                self.save_to_s3(data, s3_key)
+            else:
+                self.save_json_to_s3(data, s3_key)
+        self._map(save, items, max_workers)
+
+    def _map(self, func, items, max_workers: int = None):
+        """スレッドプールで func を並列実行し、入力順に結果を返す"""
+        items = list(items)
+        if not items:
+            return []
+        max_workers = min(max_workers or self.max_concurrency, len(items))
+        if max_workers <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, items))
+
+    def _get_object_bytes(self, s3_key: str, immutable: bool = False) -> bytes:
+        """
+        オブジェクト本体を取得 (ローカルキャッシュ → S3)
+        - immutable: キャッシュがあればそのまま返す
+        - それ以外: キャッシュの ETag で条件付き GET (If-None-Match) を行い、304 ならキャッシュを返す
+        """
+        cached = self.cache.get(s3_key) if self.cache else None
+        if cached and immutable:
+            return cached[1]
+
+        params = {"IfNoneMatch": cached[0]} if cached else {}
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=s3_key, **params)
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if cached and code in ("304", "NotModified"):
+                return cached[1]
+            if cached and code == "NoSuchKey":
+                self.cache.invalidate(s3_key)
+            raise
+
+        data = response["Body"].read()
+        if self.cache:
+            self.cache.put(s3_key, response["ETag"], data)
+        return data
+
+    def _cache_written(self, s3_key: str, response: dict, body: bytes):
+        """書き込んだ内容をそのままキャッシュ (write-through)"""
+        if self.cache:
+            self.cache.put(s3_key, response["ETag"], body)
+
+    def copy_s3_folder_recursive(self, src_folder, dest_folder, exclude=()):
+        """:param exclude: コピーしないサブフォルダ (src_folder からの相対パス)"""
         bucket = self.s3_resource.Bucket(self.bucket_name)
         for obj in bucket.objects.filter(Prefix=src_folder):
             src_key = obj.key
+            if any(src_key[len(src_folder):].startswith(prefix) for prefix in exclude):
+                continue
             new_key = src_key.replace(src_folder, dest_folder, 1)
 
             print(f"Copying {src_folder} {dest_folder} =>  /{src_key} -> /{new_key}")
             self.s3_resource.Object(self.bucket_name, new_key).copy_from(CopySource=f"{self.bucket_name}/{src_key}")
 
+    def delete_s3_files(self, keys):
+        """複数のオブジェクトを削除 (delete_objects は1回あたり最大1000件)"""
+        keys = list(keys)
+        if self.cache:
+            for key in keys:
+                self.cache.invalidate(key)
+        for i in range(0, len(keys), 1000):
+            chunk = keys[i:i + 1000]
+            try:
+                self.s3.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True}
+                )
+            except ClientError as e:
+                logging.error(f"S3の削除エラー: {e}")
+                raise
+
     def get_s3_files(self, prefix):
-        files = []
-        response = self.s3.list_objects_v2(Bucket=self.bucket_name, Prefix=prefix)
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                files.append(obj['Key'])
-        return files
+        return [obj['Key'] for obj in self._list_objects(prefix)]
+
+    def get_s3_files_modified_before(self, prefix, before: datetime):
+        """プレフィックス以下で、最終更新日時が before (tz 付き) より前のオブジェクトのキー"""
+        return [obj['Key'] for obj in self._list_objects(prefix) if obj['LastModified'] < before]
+
+    def _list_objects(self, prefix):
+        """list_objects_v2 をページネーションして全オブジェクトを返す (1回あたり最大1000件)"""
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            yield from page.get('Contents', [])
 
     def get_s3_files_after_date(self, prefix, date_str):
         """
@@ -150,21 +364,18 @@ class S3Helper:
 
         files = []
         base_date = datetime.strptime(date_str, "%Y-%m-%d")
-        response = self.s3.list_objects_v2(Bucket=self.bucket_name, Prefix=prefix)
-
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                key = obj['Key']
-                try:
-                    file_name = key[len(prefix):]
-                    file_date = datetime.strptime(file_name[:10], "%Y-%m-%d")
-                    if file_date >= base_date:
-                        files.append((file_date, key))
+        for obj in self._list_objects(prefix):
+            key = obj['Key']
+            try:
+                file_name = key[len(prefix):]
+                file_date = datetime.strptime(file_name[:10], "%Y-%m-%d")
+                if file_date >= base_date:
+                    files.append((file_date, key))
 
-                except ValueError as e:
-                    print(e)
+            except ValueError as e:
+                print(e)
 
-                    continue
+                continue
         return files
 
 